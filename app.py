@@ -1,54 +1,61 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for
+from flask import Blueprint, Flask, current_app, request, jsonify, render_template, redirect, url_for, make_response
+from flask.cli import with_appcontext
 from flask_cors import CORS
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from datetime import datetime, timezone
+import click
+import hashlib
 import os
+import time
 
-app = Flask(__name__, template_folder="templates", static_folder="static")
-CORS(app)
+from cache import cache
+from config import Config, libpq_dsn
+from extensions import db, login_manager, pool
+from pages import register_blueprints
+import compression
+import instrumentation
+import migrations
+import passwords
+import static_assets
+
+# API do software de licenças (usuarios, manuais) + portal web (pages/), no
+# mesmo app. Nada aqui abre conexão no import: o schema é criado/atualizado
+# pelo comando "flask --app app:create_app migrate" (migrations.py, uma vez
+# por deploy), e os workers do gunicorn --preload herdam o app já importado
+# e montado.
+bp = Blueprint("api", __name__)
 
 # 🔐 Variáveis de ambiente
-DATABASE_URL = os.environ.get("DATABASE_URL")
 API_KEY_ESPERADA = os.environ.get("API_KEY_ESPERADA", "SUA_API_KEY_AQUI")
 
-# 🔌 Conexão com PostgreSQL
-def get_conn():
-    return psycopg2.connect(DATABASE_URL)
-
-# 🧱 Criação das tabelas (Mantendo as existentes e adicionando a de Manuais)
+# 🧱 Tabelas: migrations.py (usuarios, manuais e as do portal)
 def init_db():
-    conn = get_conn()
-    cursor = conn.cursor()
-    # Tabela de usuários original
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS usuarios (
-        id SERIAL PRIMARY KEY,
-        nome TEXT NOT NULL,
-        email TEXT NOT NULL UNIQUE,
-        empresa TEXT,
-        plano TEXT,
-        senha TEXT,
-        status TEXT DEFAULT 'pendente',
-        id_maquina TEXT,
-        logado INTEGER DEFAULT 0
-    )
-    """)
-    # Tabela de manuais para a Malha Fiscal
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS manuais (
-        id SERIAL PRIMARY KEY,
-        titulo TEXT NOT NULL,
-        descricao TEXT,
-        url_gif TEXT,
-        url_pdf TEXT,
-        categoria TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
-    print("✅ Banco de dados sincronizado!")
+    """Cria/atualiza as tabelas da API (migrações "api" pendentes)."""
+    return migrations.upgrade(pool=pool)
+
+
+@click.command("migrate")
+@click.option("--status", "show_status", is_flag=True, help="Só lista as migrações e quando foram aplicadas.")
+@with_appcontext
+def migrate_command(show_status):
+    """Aplica as migrações pendentes do portal e da API (migrations.py)."""
+    if show_status:
+        for m, applied_at in migrations.status(db.engine, pool):
+            click.echo(f"{m.version:4d} {m.target:6} {applied_at or 'pendente'}  {m.name}")
+        return
+    if not pool.dsn:
+        click.echo("DATABASE_URL não é PostgreSQL: tabelas da API (usuarios, manuais) ignoradas.")
+    applied = migrations.upgrade(db.engine, pool)
+    for m in applied:
+        click.echo(f"  {m.version:4d} {m.target:6} {m.name}")
+    click.echo(f"✅ Banco de dados sincronizado! ({len(applied)} migração(ões) aplicada(s))")
 
-init_db()
+
+@click.command("init-db")
+@click.pass_context
+def init_db_command(ctx):
+    """O mesmo que "migrate" (nome antigo)."""
+    ctx.invoke(migrate_command)
 
 # 🔐 Validação de token
 def validar_token(req):
@@ -57,40 +64,199 @@ def validar_token(req):
 
 # ========== ROTAS DE API (PARA O SOFTWARE) ==========
 
-@app.route("/usuarios", methods=["GET"])
+USUARIOS_CAMPOS = (
+    "id", "nome", "email", "empresa", "plano", "status", "senha", "id_maquina", "logado",
+    "revisao", "atualizado_em",
+)
+USUARIOS_CAMPOS_PADRAO = ("id", "nome", "email", "empresa", "plano", "status", "id_maquina")
+USUARIOS_LIMITE_MAXIMO = 1000
+
+def campos_usuarios(args):
+    """Colunas pedidas em ?campos=a,b (sempre com o id). Devolve (campos, erro)."""
+    campos = [c.strip() for c in args.get("campos", "").split(",") if c.strip()] or list(USUARIOS_CAMPOS_PADRAO)
+    invalidos = [c for c in campos if c not in USUARIOS_CAMPOS]
+    if invalidos:
+        return None, "Campos inválidos: " + ", ".join(invalidos)
+    if "id" not in campos:
+        campos.insert(0, "id")
+    return campos, None
+
+# Versão da tabela para o ETag: a maior revisão (linhas, lápides e TRUNCATE,
+# tudo pelos índices de revisao) e a revisão "segura" (migração 8). Revisões
+# são ids de transação: uma escrita que começou antes e termina depois da
+# maior não muda o máximo, mas muda a segura, que até o commit dela fica abaixo.
+SQL_USUARIOS_VERSAO = """
+SELECT v.versao, LEAST(v.versao, usuarios_revisao_segura()) AS segura
+FROM (
+    SELECT GREATEST(
+        (SELECT versao FROM usuarios_versao WHERE id = 1),
+        (SELECT max(revisao) FROM usuarios),
+        (SELECT max(revisao) FROM usuarios_excluidos)
+    ) AS versao
+) v
+"""
+
+# GET /usuarios?limit=100&after=<id>&status=aprovado&empresa=X&sem_maquina=1&campos=id,nome
+# Paginação por id (a próxima página vem no cabeçalho Link) e ETag pela versão
+# da tabela: se nada mudou, If-None-Match devolve 304 sem consultar usuarios.
+# A senha só é enviada quando pedida explicitamente em "campos".
+@bp.route("/usuarios", methods=["GET"])
 def listar_usuarios():
     if not validar_token(request):
         return jsonify({"erro": "não autorizado"}), 403
-    conn = get_conn()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute("SELECT id, nome, email, empresa, plano, status, senha, id_maquina FROM usuarios")
-    usuarios = cursor.fetchall()
-    conn.close()
-    return jsonify(usuarios)
-
-@app.route("/aprovar", methods=["POST"])
+    args = request.args
+
+    campos, erro = campos_usuarios(args)
+    if erro:
+        return jsonify({"erro": erro}), 400
+
+    try:
+        limite = int(args["limit"]) if "limit" in args else None
+        after = int(args["after"]) if "after" in args else None
+    except ValueError:
+        return jsonify({"erro": "limit e after devem ser números inteiros."}), 400
+    if limite is not None and not 1 <= limite <= USUARIOS_LIMITE_MAXIMO:
+        return jsonify({"erro": f"limit deve estar entre 1 e {USUARIOS_LIMITE_MAXIMO}."}), 400
+
+    filtros, params = [], []
+    if after is not None:
+        filtros.append("id > %s")
+        params.append(after)
+    if args.get("status"):
+        filtros.append("status = %s")
+        params.append(args["status"])
+    if args.get("empresa"):
+        filtros.append("empresa = %s")
+        params.append(args["empresa"])
+    if args.get("sem_maquina") in ("1", "true"):
+        filtros.append("id_maquina IS NULL")
+    elif args.get("sem_maquina") in ("0", "false"):
+        filtros.append("id_maquina IS NOT NULL")
+
+    sql = f"SELECT {', '.join(campos)} FROM usuarios"
+    if filtros:
+        sql += " WHERE " + " AND ".join(filtros)
+    sql += " ORDER BY id"
+    if limite is not None:
+        sql += " LIMIT %s"
+        params.append(limite + 1)
+
+    with pool.connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(SQL_USUARIOS_VERSAO)
+        versao = cursor.fetchone()
+        etag = hashlib.sha1(
+            f"{versao['versao']}|{versao['segura']}|{sorted(args.items(multi=True))}".encode()
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            resp = current_app.response_class(status=304)
+        else:
+            cursor.execute(sql, params)
+            usuarios = cursor.fetchall()
+            resp = None
+        conn.rollback()
+
+    if resp is None:
+        proximo = None
+        if limite is not None and len(usuarios) > limite:
+            usuarios = usuarios[:limite]
+            proximo = url_for("api.listar_usuarios", _external=True, **{**args.to_dict(), "after": usuarios[-1]["id"]})
+        resp = jsonify(usuarios)
+        if proximo:
+            resp.headers["Link"] = f'<{proximo}>; rel="next"'
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+# GET /usuarios/changes?since=<revisao>&limit=500
+# Só o que mudou depois da revisão informada: linhas alteradas (com a revisão
+# atual de cada uma) e ids excluídos. Sem "since" devolve todas as linhas, para
+# a carga inicial da réplica local. Guarde o "revisao" da resposta e use-o no
+# próximo ?since=; enquanto "mais" vier true, chame de novo imediatamente.
+# Só saem revisões até usuarios_revisao_segura(): uma escrita ainda em
+# andamento segura as posteriores a ela até o commit (migração 8). Uma
+# revisão (transação) nunca é dividida entre duas respostas.
+@bp.route("/usuarios/changes", methods=["GET"])
+def alteracoes_usuarios():
+    if not validar_token(request):
+        return jsonify({"erro": "não autorizado"}), 403
+    args = request.args
+
+    campos, erro = campos_usuarios(args)
+    if erro:
+        return jsonify({"erro": erro}), 400
+    if "revisao" not in campos:
+        campos.append("revisao")
+
+    try:
+        since = int(args["since"]) if "since" in args else None
+        limite = int(args.get("limit", 500))
+    except ValueError:
+        return jsonify({"erro": "since e limit devem ser números inteiros."}), 400
+    if not 1 <= limite <= USUARIOS_LIMITE_MAXIMO:
+        return jsonify({"erro": f"limit deve estar entre 1 e {USUARIOS_LIMITE_MAXIMO}."}), 400
+
+    inicio = since if since is not None else -1
+    with pool.connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        # mesmo retrato para a revisão segura e para as linhas
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("SELECT usuarios_revisao_segura() AS segura")
+        segura = cursor.fetchone()["segura"]
+        sql_alterados = f"SELECT {', '.join(campos)} FROM usuarios WHERE revisao > %s AND revisao <= %s"
+        sql_excluidos = "SELECT id, revisao FROM usuarios_excluidos WHERE revisao > %s AND revisao <= %s"
+
+        def eventos_entre(de, ate, limite=None):
+            ordem = " ORDER BY revisao, id" + (f" LIMIT {int(limite)}" if limite else "")
+            cursor.execute(sql_alterados + ordem, (de, ate))
+            eventos = [(u["revisao"], False, u) for u in cursor.fetchall()]
+            if since is not None:
+                cursor.execute(sql_excluidos + ordem, (de, ate))
+                eventos += [(e["revisao"], True, e) for e in cursor.fetchall()]
+            # as duas listas em ordem de revisão
+            return sorted(eventos, key=lambda ev: ev[0])
+
+        eventos = eventos_entre(inicio, segura, limite + 1)
+        versao = max(segura, inicio)
+        mais = len(eventos) > limite
+        if mais:
+            # corta antes da revisão que não coube inteira; se nem a primeira
+            # coube, ela sai inteira mesmo passando do limite
+            corte = eventos[limite][0]
+            eventos = [ev for ev in eventos if ev[0] < corte]
+            if not eventos:
+                eventos = eventos_entre(corte - 1, corte)
+            versao = eventos[-1][0]
+        conn.rollback()
+
+    return jsonify({
+        "revisao": versao,
+        "mais": mais,
+        "alterados": [dados for _, excluido, dados in eventos if not excluido],
+        "excluidos": [dados["id"] for _, excluido, dados in eventos if excluido],
+    })
+
+@bp.route("/aprovar", methods=["POST"])
 def aprovar():
     if not validar_token(request): return jsonify({"erro": "não autorizado"}), 403
     user_id = request.json.get("id")
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE usuarios SET status='aprovado' WHERE id=%s", (user_id,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET status='aprovado' WHERE id=%s", (user_id,))
+        conn.commit()
     return jsonify({"msg": "aprovado"})
 
-@app.route("/rejeitar", methods=["POST"])
+@bp.route("/rejeitar", methods=["POST"])
 def rejeitar():
     if not validar_token(request): return jsonify({"erro": "não autorizado"}), 403
     user_id = request.json.get("id")
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE usuarios SET status='rejeitado' WHERE id=%s", (user_id,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET status='rejeitado' WHERE id=%s", (user_id,))
+        conn.commit()
     return jsonify({"msg": "rejeitado"})
 
-@app.route("/reset_senha", methods=["POST"])
+@bp.route("/reset_senha", methods=["POST"])
 def reset_senha():
     if not validar_token(request): return jsonify({"erro": "não autorizado"}), 403
     user_id = request.json.get("id")
@@ -98,164 +264,367 @@ def reset_senha():
     # No seu código original você apenas retornava a senha, aqui mantemos a lógica
     return jsonify({"nova_senha": nova_senha})
 
-@app.route("/excluir", methods=["POST"])
+@bp.route("/excluir", methods=["POST"])
 def excluir():
     if not validar_token(request): return jsonify({"erro": "não autorizado"}), 403
     user_id = request.json.get("id")
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM usuarios WHERE id=%s", (user_id,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM usuarios WHERE id=%s", (user_id,))
+        conn.commit()
     return jsonify({"msg": "usuário excluído"})
 
-@app.route("/desvincular", methods=["POST"])
+@bp.route("/desvincular", methods=["POST"])
 def desvincular():
     if not validar_token(request): return jsonify({"erro": "não autorizado"}), 403
     user_id = request.json.get("id")
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE usuarios SET id_maquina = NULL, logado = 0 WHERE id=%s", (user_id,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET id_maquina = NULL, logado = 0 WHERE id=%s", (user_id,))
+        conn.commit()
     return jsonify({"msg": "ID da máquina desvinculado com sucesso"})
 
-@app.route("/cadastrar", methods=["POST"])
+# 📦 Ações em lote: um único comando (WHERE id = ANY) numa única transação
+ACOES_LOTE = {
+    "aprovar": "UPDATE usuarios SET status='aprovado' WHERE id = ANY(%s) RETURNING id",
+    "rejeitar": "UPDATE usuarios SET status='rejeitado' WHERE id = ANY(%s) RETURNING id",
+    "excluir": "DELETE FROM usuarios WHERE id = ANY(%s) RETURNING id",
+    "desvincular": "UPDATE usuarios SET id_maquina = NULL, logado = 0 WHERE id = ANY(%s) RETURNING id",
+}
+LOTE_MAXIMO = 5000
+
+def executar_lote(acao, ids):
+    """Aplica a ação a todos os ids e devolve o conjunto dos que existiam."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(ACOES_LOTE[acao], (ids,))
+        afetados = {row[0] for row in cursor.fetchall()}
+        conn.commit()
+    return afetados
+
+@bp.route("/<any(aprovar, rejeitar, excluir, desvincular):acao>/lote", methods=["POST"])
+def acao_lote(acao):
+    if not validar_token(request): return jsonify({"erro": "não autorizado"}), 403
+    ids = (request.json or {}).get("ids")
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({"erro": "Informe \"ids\" como uma lista de números."}), 400
+    if len(ids) > LOTE_MAXIMO:
+        return jsonify({"erro": f"No máximo {LOTE_MAXIMO} ids por lote."}), 400
+    ids = list(dict.fromkeys(ids))
+    afetados = executar_lote(acao, ids)
+    return jsonify({
+        "msg": f"{len(afetados)} de {len(ids)} usuário(s) processado(s)",
+        "resultados": [
+            {"id": i, "ok": True} if i in afetados else {"id": i, "ok": False, "erro": "usuário não encontrado"}
+            for i in ids
+        ],
+    })
+
+@bp.route("/cadastrar", methods=["POST"])
 def cadastrar():
     dados = request.json
     nome, email, empresa = dados.get("nome"), dados.get("email"), dados.get("empresa", "")
     plano, senha = dados.get("plano", "mensal"), dados.get("senha")
     if not nome or not email or not senha:
         return jsonify({"erro": "Nome, email e senha são obrigatórios."}), 400
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM usuarios WHERE email = %s", (email,))
-    if cursor.fetchone():
-        conn.close()
-        return jsonify({"erro": "E-mail já cadastrado."}), 409
-    cursor.execute("""
-        INSERT INTO usuarios (nome, email, empresa, plano, senha, status)
-        VALUES (%s, %s, %s, %s, %s, 'pendente')
-    """, (nome, email, empresa, plano, senha))
-    conn.commit()
-    conn.close()
+    try:
+        senha_hash = passwords.hash_password(senha)
+    except passwords.PasswordBusy:
+        return hash_ocupado()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM usuarios WHERE email = %s", (email,))
+        if cursor.fetchone():
+            return jsonify({"erro": "E-mail já cadastrado."}), 409
+        cursor.execute("""
+            INSERT INTO usuarios (nome, email, empresa, plano, senha, status)
+            VALUES (%s, %s, %s, %s, %s, 'pendente')
+        """, (nome, email, empresa, plano, senha_hash))
+        conn.commit()
     return jsonify({"msg": "Cadastro enviado com sucesso."})
 
-@app.route("/login", methods=["POST"])
+# 🔑 Resultados do /login: o software pode tratar pelo "codigo" em vez da mensagem
+LOGIN_ERROS = {
+    "DADOS_OBRIGATORIOS": ("Email, senha e ID da máquina são obrigatórios.", 400),
+    "USUARIO_NAO_ENCONTRADO": ("Usuário não encontrado.", 404),
+    "SENHA_INCORRETA": ("Senha incorreta.", 401),
+    "AGUARDANDO_APROVACAO": ("Acesso não autorizado. Aguarde aprovação.", 403),
+    "OUTRO_DISPOSITIVO": ("Este usuário está vinculado a outro dispositivo.", 403),
+    "JA_LOGADO": ("Usuário já está logado em outro dispositivo.", 403),
+}
+
+def erro_login(codigo):
+    mensagem, status = LOGIN_ERROS[codigo]
+    return jsonify({"erro": mensagem, "codigo": codigo}), status
+
+# pool de hash de senhas cheio (passwords.PasswordBusy)
+def hash_ocupado():
+    return jsonify({"erro": "Servidor ocupado. Tente novamente em instantes.", "codigo": "SERVIDOR_OCUPADO"}), 503
+
+# Login em dois passos: lê o hash e confere a senha fora da transação (o KDF é
+# caro e roda no pool de passwords, sem segurar conexão do banco); depois
+# vincula a máquina e marca o login num único UPDATE condicional. As condições
+# são reavaliadas sobre a versão mais nova da linha, então entre logins
+# simultâneos só um consegue passar de logado = 0 para 1. "senha = lida"
+# garante que a senha não mudou entre os dois passos.
+SQL_LOGIN_BUSCA = """
+SELECT id, nome, senha, status, id_maquina, logado
+FROM usuarios
+WHERE email = %(email)s
+"""
+
+SQL_LOGIN_ESTADO = """
+SELECT id, nome, senha, status, id_maquina, logado
+FROM usuarios
+WHERE id = %(id)s
+"""
+
+SQL_LOGIN_REHASH = """
+UPDATE usuarios SET senha = %(senha_nova)s
+WHERE id = %(id)s AND senha = %(senha_lida)s
+"""
+
+SQL_LOGIN_REIVINDICA = """
+UPDATE usuarios
+SET id_maquina = COALESCE(id_maquina, %(id_maquina)s), logado = 1
+WHERE id = %(id)s
+  AND senha = %(senha_lida)s
+  AND status = 'aprovado'
+  AND (id_maquina IS NULL OR id_maquina = %(id_maquina)s)
+  AND logado IS DISTINCT FROM 1
+RETURNING id
+"""
+
+@bp.route("/login", methods=["POST"])
 def login():
     dados = request.json
     email, senha, id_maquina = dados.get("email"), dados.get("senha"), dados.get("id_maquina")
     if not email or not senha or not id_maquina:
-        return jsonify({"erro": "Email, senha e ID da máquina são obrigatórios."}), 400
-    conn = get_conn()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute("SELECT * FROM usuarios WHERE email = %s", (email,))
-    user = cursor.fetchone()
+        return erro_login("DADOS_OBRIGATORIOS")
+    with pool.connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(SQL_LOGIN_BUSCA, {"email": email})
+        user = cursor.fetchone()
     if not user:
-        conn.close()
-        return jsonify({"erro": "Usuário não encontrado."}), 404
-    if senha != user['senha']:
-        conn.close()
-        return jsonify({"erro": "Senha incorreta."}), 401
-    if user['status'] != "aprovado":
-        conn.close()
-        return jsonify({"erro": "Acesso não autorizado. Aguarde aprovação."}), 403
-    if user['id_maquina'] is None:
-        cursor.execute("UPDATE usuarios SET id_maquina = %s WHERE id = %s", (id_maquina, user['id']))
-    elif id_maquina != user['id_maquina']:
-        conn.close()
-        return jsonify({"erro": "Este usuário está vinculado a outro dispositivo."}), 403
-    if user['logado'] == 1:
-        conn.close()
-        return jsonify({"erro": "Usuário já está logado em outro dispositivo."}), 403
-    cursor.execute("UPDATE usuarios SET logado = 1 WHERE id = %s", (user['id'],))
-    conn.commit()
-    conn.close()
-    return jsonify({"msg": "Login autorizado", "id": user['id'], "nome": user['nome']})
-
-@app.route("/logout", methods=["POST"])
+        return erro_login("USUARIO_NAO_ENCONTRADO")
+
+    # segunda volta só se a senha mudou entre a leitura e o UPDATE (ex.: o
+    # rehash de um login simultâneo da mesma conta)
+    for _ in range(2):
+        try:
+            senha_ok, senha_nova = passwords.verify(user['senha'], senha)
+        except passwords.PasswordBusy:
+            return hash_ocupado()
+        if not senha_ok:
+            return erro_login("SENHA_INCORRETA")
+
+        parametros = {"id": user['id'], "senha_lida": user['senha'], "id_maquina": id_maquina}
+        with pool.connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            if senha_nova:
+                # senha em texto puro ou com custo antigo: grava o hash atual
+                cursor.execute(SQL_LOGIN_REHASH, {**parametros, "senha_nova": senha_nova})
+                if cursor.rowcount:
+                    parametros["senha_lida"] = senha_nova
+            cursor.execute(SQL_LOGIN_REIVINDICA, parametros)
+            autorizado = cursor.fetchone() is not None
+            if not autorizado:
+                # explica a recusa com o estado atual da linha
+                cursor.execute(SQL_LOGIN_ESTADO, parametros)
+                user = cursor.fetchone() or user
+            conn.commit()
+        if autorizado or user['senha'] == parametros['senha_lida']:
+            break
+
+    if not autorizado:
+        if user['senha'] != parametros['senha_lida']:
+            return erro_login("SENHA_INCORRETA")
+        if user['status'] != "aprovado":
+            return erro_login("AGUARDANDO_APROVACAO")
+        if user['id_maquina'] is not None and user['id_maquina'] != id_maquina:
+            return erro_login("OUTRO_DISPOSITIVO")
+        # já estava logado ou perdeu a corrida para outro login simultâneo
+        return erro_login("JA_LOGADO")
+    return jsonify({"msg": "Login autorizado", "codigo": "LOGIN_AUTORIZADO", "id": user['id'], "nome": user['nome']})
+
+@bp.route("/logout", methods=["POST"])
 def logout():
     email = request.json.get("email")
     if not email: return jsonify({"erro": "E-mail é obrigatório."}), 400
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE usuarios SET logado = 0 WHERE email = %s", (email,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET logado = 0 WHERE email = %s", (email,))
+        conn.commit()
     return jsonify({"msg": "Logout realizado com sucesso"})
 
+@bp.route("/metricas/pool", methods=["GET"])
+def metricas_pool():
+    if not validar_token(request): return jsonify({"erro": "não autorizado"}), 403
+    return jsonify(pool.stats())
+
+# Métricas no formato do Prometheus (latência por endpoint, consultas por
+# requisição, N+1, pool). Mesmo token da API: bearer_token no scrape_config.
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    if not validar_token(request): return jsonify({"erro": "não autorizado"}), 403
+    return current_app.response_class(
+        instrumentation.render_metrics(pool),
+        mimetype="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 # ========== ROTAS DO PAINEL ADMIN E PORTAL (WEB) ==========
 
-@app.route("/")
+@bp.route("/")
 def index():
     try:
-        conn = get_conn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT * FROM usuarios")
-        usuarios = cursor.fetchall()
-        conn.close()
+        with pool.connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            # sem a coluna senha: o painel não mostra nem envia o hash
+            cursor.execute("SELECT id, nome, email, id_maquina, empresa, plano, status FROM usuarios ORDER BY id")
+            usuarios = cursor.fetchall()
     except Exception as e:
         usuarios = []
     return render_template("index.html", usuarios=usuarios)
 
-@app.route("/portal")
+# 🗂️ Cache da página /portal. A lista de manuais só muda pelo admin: cada
+# mudança chama invalidar_portal(), que troca a "geração" no cache
+# compartilhado e faz todos os workers renderizarem de novo.
+PORTAL_CACHE_TTL = int(os.environ.get("PORTAL_CACHE_TTL", 3600))
+PORTAL_GERACAO_KEY = "portal:geracao"
+PORTAL_GERACAO_TTL = 30 * 24 * 3600
+
+def geracao_portal():
+    geracao = cache.get(PORTAL_GERACAO_KEY)
+    if geracao is None:
+        geracao = time.time()
+        cache.set(PORTAL_GERACAO_KEY, geracao, ttl=PORTAL_GERACAO_TTL)
+    return geracao
+
+def invalidar_portal():
+    """Chamar depois de inserir, editar ou excluir manuais."""
+    cache.set(PORTAL_GERACAO_KEY, time.time(), ttl=PORTAL_GERACAO_TTL)
+
+@bp.route("/portal")
 def portal_fiscal():
-    conn = get_conn()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute("SELECT * FROM manuais ORDER BY id DESC")
-    manuais = cursor.fetchall()
-    conn.close()
-    return render_template("portal.html", manuais=manuais)
-
-@app.route("/admin/cadastrar_manual", methods=["GET", "POST"])
+    # a geração é lida antes da consulta: se um admin cadastrar no meio do
+    # caminho, esta página fica guardada sob a geração antiga e ninguém a lê
+    geracao = geracao_portal()
+    chave = f"portal:manuais:{geracao}"
+    pagina = cache.get(chave)
+    if pagina is None:
+        with pool.connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("SELECT * FROM manuais ORDER BY id DESC")
+            manuais = cursor.fetchall()
+        html = render_template("portal.html", manuais=manuais)
+        pagina = {"html": html, "etag": hashlib.sha1(html.encode("utf-8")).hexdigest()}
+        cache.set(chave, pagina, ttl=PORTAL_CACHE_TTL)
+
+    resposta = make_response(pagina["html"])
+    resposta.set_etag(pagina["etag"])
+    resposta.last_modified = datetime.fromtimestamp(geracao, tz=timezone.utc)
+    resposta.cache_control.public = True
+    resposta.cache_control.no_cache = True
+    return resposta.make_conditional(request)
+
+@bp.route("/admin/cadastrar_manual", methods=["GET", "POST"])
 def cadastrar_manual():
     if request.method == "POST":
         titulo = request.form.get("titulo")
         url_gif = request.form.get("url_gif")
         url_pdf = request.form.get("url_pdf")
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO manuais (titulo, url_gif, url_pdf) VALUES (%s, %s, %s)", (titulo, url_gif, url_pdf))
-        conn.commit()
-        conn.close()
-        return redirect(url_for('portal_fiscal'))
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO manuais (titulo, url_gif, url_pdf) VALUES (%s, %s, %s)", (titulo, url_gif, url_pdf))
+            conn.commit()
+        invalidar_portal()
+        return redirect(url_for('api.portal_fiscal'))
     return render_template("cadastrar_manual.html")
 
-@app.route("/aprovar/<int:usuario_id>", methods=["POST"])
+@bp.route("/aprovar/<int:usuario_id>", methods=["POST"])
 def aprovar_web(usuario_id):
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE usuarios SET status='aprovado' WHERE id=%s", (usuario_id,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET status='aprovado' WHERE id=%s", (usuario_id,))
+        conn.commit()
     return redirect("/")
 
-@app.route("/rejeitar/<int:usuario_id>", methods=["POST"])
+@bp.route("/rejeitar/<int:usuario_id>", methods=["POST"])
 def rejeitar_web(usuario_id):
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE usuarios SET status='rejeitado' WHERE id=%s", (usuario_id,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET status='rejeitado' WHERE id=%s", (usuario_id,))
+        conn.commit()
     return redirect("/")
 
-@app.route("/excluir/<int:usuario_id>", methods=["POST"])
+@bp.route("/excluir/<int:usuario_id>", methods=["POST"])
 def excluir_web(usuario_id):
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM usuarios WHERE id=%s", (usuario_id,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM usuarios WHERE id=%s", (usuario_id,))
+        conn.commit()
     return redirect("/")
 
-@app.route("/desvincular/<int:usuario_id>", methods=["POST"])
+@bp.route("/desvincular/<int:usuario_id>", methods=["POST"])
 def desvincular_web(usuario_id):
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE usuarios SET id_maquina = NULL, logado = 0 WHERE id=%s", (usuario_id,))
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET id_maquina = NULL, logado = 0 WHERE id=%s", (usuario_id,))
+        conn.commit()
     return redirect("/")
 
+@bp.route("/lote", methods=["POST"])
+def acao_lote_web():
+    acao = request.form.get("acao")
+    ids = [int(i) for i in request.form.getlist("ids") if i.isdigit()]
+    if acao in ACOES_LOTE and ids:
+        executar_lote(acao, ids[:LOTE_MAXIMO])
+    return redirect("/")
+
+
+def _dispose_engines_after_fork(app):
+    # gunicorn --preload: o pai importa e monta o app; cada worker descarta as
+    # conexões do SQLAlchemy que porventura herdou (o pool psycopg2 já detecta
+    # o fork sozinho)
+    def dispose():
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=dispose)
+
+
+def create_app(config=None):
+    """Monta o app: API do software na raiz e portal web (pages/).
+
+    ``config``: dicionário que sobrescreve o Config (testes, benchmarks).
+    """
+    app = Flask(__name__, template_folder="templates", static_folder="static")
+    app.config.from_object(Config)
+    if config:
+        app.config.from_mapping(config)
+    if not app.config.get("DATABASE_DSN"):
+        app.config["DATABASE_DSN"] = libpq_dsn(app.config["SQLALCHEMY_DATABASE_URI"])
+
+    CORS(app)
+    db.init_app(app)
+    login_manager.init_app(app)
+    pool.init_app(app)
+    # o after_request registrado primeiro roda por último: comprime o que as views e
+    # a instrumentação já finalizaram
+    compression.init_app(app)
+    instrumentation.init_app(app, pool)
+    static_assets.init_app(app)
+
+    # a API vem primeiro: "/" e POST "/login" são do painel e do software
+    app.register_blueprint(bp)
+    register_blueprints(app, web_prefix=app.config.get("WEB_URL_PREFIX", ""))
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(init_db_command)
+    _dispose_engines_after_fork(app)
+    return app
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
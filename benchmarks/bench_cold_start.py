@@ -0,0 +1,81 @@
+"""Partida a frio do app: import, montagem (create_app) e primeira requisição.
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/bench_cold_start.py [--ref HEAD~1] [--repeat 5]
+
+Cada medição roda num processo Python novo. Com --ref, a mesma medição é
+feita numa cópia da árvore daquele commit (git archive) para comparar antes
+e depois. "worker sem preload" é o que cada worker do gunicorn paga ao subir
+(import + montagem + 1ª requisição); com --preload o import e a montagem
+ficam no processo pai e o worker paga só a 1ª requisição.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Árvores antigas expõem app.app (montado no import); as novas, create_app().
+SONDA = """
+import json, sys, time
+t0 = time.perf_counter()
+import app as modulo
+t1 = time.perf_counter()
+application = modulo.create_app() if hasattr(modulo, "create_app") else modulo.app
+t2 = time.perf_counter()
+resp = application.test_client().get(sys.argv[1])
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "montagem": t2 - t1, "primeira_requisicao": t3 - t2, "status": resp.status_code}))
+"""
+
+
+def medir(arvore, caminho, repeat):
+    amostras = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", SONDA, caminho],
+            cwd=arvore, capture_output=True, text=True, check=True,
+        ).stdout
+        amostras.append(json.loads(out.strip().splitlines()[-1]))
+    resultado = {k: round(statistics.median(a[k] for a in amostras) * 1000, 1)
+                 for k in ("import", "montagem", "primeira_requisicao")}
+    resultado["worker_sem_preload"] = round(sum(resultado.values()), 1)
+    resultado["worker_com_preload"] = resultado["primeira_requisicao"]
+    resultado["status"] = amostras[-1]["status"]
+    return resultado
+
+
+def extrair(ref, destino):
+    arquivo = subprocess.run(["git", "-C", REPO, "archive", ref], capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", destino], input=arquivo, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ref", help="commit para comparar (ex.: HEAD~1)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--caminho", default="/portal", help="rota da 1ª requisição")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    resultados = {"atual": medir(REPO, args.caminho, args.repeat)}
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            extrair(args.ref, tmp)
+            resultados[args.ref] = medir(tmp, args.caminho, args.repeat)
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    for nome, r in resultados.items():
+        print(f"{nome} (status {r['status']}, mediana de {args.repeat}, ms):")
+        for k in ("import", "montagem", "primeira_requisicao", "worker_sem_preload", "worker_com_preload"):
+            print(f"  {k:22} {r[k]:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
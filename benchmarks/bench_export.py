@@ -0,0 +1,91 @@
+"""Pico de memória e tempo até o primeiro byte do /manual/exportar.
+
+Uso:
+    python benchmarks/bench_export.py [--scales 10000,100000,500000]
+
+Cada escala roda num subprocesso próprio (o ru_maxrss é o pico do processo),
+sobre um SQLite gerado uma vez em benchmarks/.data/.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, ".data")
+
+
+def db_path(scale):
+    return os.path.join(DATA_DIR, f"clients_{scale}.db")
+
+
+def ensure_db(scale):
+    from webapp import build_app
+    from datasets import seed_clients
+    from extensions import db
+
+    path = db_path(scale)
+    if os.path.exists(path):
+        return path
+    os.makedirs(DATA_DIR, exist_ok=True)
+    app = build_app(f"sqlite:///{path}.tmp")
+    with app.app_context():
+        seed_clients(db.session, scale)
+        db.engine.dispose()
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def child(scale):
+    from webapp import build_app
+
+    app = build_app(f"sqlite:///{db_path(scale)}")
+    client = app.test_client()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    t0 = time.perf_counter()
+    resp = client.get("/manual/exportar", buffered=False)
+    chunks = iter(resp.response)
+    first = next(chunks)
+    ttfb = time.perf_counter() - t0
+    size = len(first) + sum(len(c) for c in chunks)
+    total = time.perf_counter() - t0
+    resp.close()
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "rows": scale,
+        "status": resp.status_code,
+        "bytes": size,
+        "ttfb_s": round(ttfb, 3),
+        "total_s": round(total, 3),
+        "peak_rss_mb": round(rss_after / 1024, 1),
+        "peak_rss_delta_mb": round((rss_after - rss_before) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="10000,100000,500000")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, HERE)
+    if args.child:
+        child(args.child)
+        return
+
+    for scale in (int(s) for s in args.scales.split(",")):
+        ensure_db(scale)
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(scale)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        print(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
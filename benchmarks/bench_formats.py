@@ -0,0 +1,135 @@
+"""Importação e exportação de clientes: .xlsx x CSV x JSON Lines.
+
+Uso:
+    python benchmarks/bench_formats.py [--rows 100000] [--formatos xlsx,csv,jsonl]
+
+Importação: lê o arquivo com client_formats.RowReader e valida em lotes de
+IMPORT_CHUNK_SIZE linhas (client_import.normalize_rows), como o job de
+importação faz, sem a gravação no banco. O CSV é gerado como sai de um ERP
+(";" e Windows-1252), então a detecção de separador e codificação entra na
+conta. Exportação: GET /manual/exportar?formato=... sobre um SQLite com o
+mesmo número de clientes (benchmarks/.data/, como bench_export.py).
+
+Cada medição roda num subprocesso próprio: ru_maxrss é o pico do processo.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import islice
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def child_import(path):
+    from client_formats import RowReader
+    from client_import import ImportStats, map_columns, normalize_rows
+    from import_jobs import IMPORT_CHUNK_SIZE
+
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    linhas = erros = 0
+    with RowReader(path) as reader:
+        rows = iter(reader)
+        col, missing = map_columns(next(rows))
+        assert not missing, missing
+        while chunk := list(islice(rows, IMPORT_CHUNK_SIZE)):
+            stats = ImportStats()
+            normalize_rows(chunk, col, stats, first_line=linhas + 2)
+            linhas += len(chunk)
+            erros += stats.errors
+    total = time.perf_counter() - t0
+    print(json.dumps({
+        "linhas": linhas,
+        "erros": erros,
+        "total_s": round(total, 3),
+        "linhas_s": round(linhas / total, 1),
+        "pico_rss_mb": rss_mb(),
+        "pico_rss_delta_mb": round(rss_mb() - rss_before, 1),
+    }))
+
+
+def child_export(db_file, formato):
+    from webapp import build_app
+
+    app = build_app(f"sqlite:///{db_file}")
+    client = app.test_client()
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    resp = client.get("/manual/exportar", query_string={"formato": formato}, buffered=False)
+    chunks = iter(resp.response)
+    first = next(chunks)
+    ttfb = time.perf_counter() - t0
+    size = len(first) + sum(len(c) for c in chunks)
+    total = time.perf_counter() - t0
+    resp.close()
+    print(json.dumps({
+        "status": resp.status_code,
+        "bytes": size,
+        "ttfb_s": round(ttfb, 3),
+        "total_s": round(total, 3),
+        "pico_rss_mb": rss_mb(),
+        "pico_rss_delta_mb": round(rss_mb() - rss_before, 1),
+    }))
+
+
+def run_child(*args):
+    out = subprocess.run(
+        [sys.executable, __file__, *args], check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--formatos", default="xlsx,csv,jsonl")
+    parser.add_argument("--sem-exportar", action="store_true")
+    parser.add_argument("--child-import", help=argparse.SUPPRESS)
+    parser.add_argument("--child-export", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_import:
+        child_import(args.child_import)
+        return
+    if args.child_export:
+        child_export(*args.child_export)
+        return
+
+    import datasets
+
+    formatos = args.formatos.split(",")
+    resultados = {"linhas": args.rows, "importar": {}, "exportar": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for formato in formatos:
+            path = datasets.write_clients_file(os.path.join(tmp, f"clientes.{formato}"), args.rows)
+            r = run_child("--child-import", path)
+            r["arquivo_mb"] = round(os.path.getsize(path) / 2**20, 1)
+            resultados["importar"][formato] = r
+
+    if not args.sem_exportar:
+        from bench_export import db_path, ensure_db
+
+        ensure_db(args.rows)
+        for formato in formatos:
+            resultados["exportar"][formato] = run_child("--child-export", db_path(args.rows), formato)
+
+    base = resultados["importar"].get("xlsx")
+    if base:
+        for formato, r in resultados["importar"].items():
+            r["x_xlsx"] = round(r["linhas_s"] / base["linhas_s"], 2)
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Importação em conjunto (upsert_clients) x laço linha a linha original.
+
+Uso:
+    python benchmarks/bench_import.py [--rows 20000] [--db sqlite:///...|postgresql://...]
+
+Metade das linhas já existe no banco; a planilha tem 1% de CNPJs repetidos.
+Mede só a etapa de banco (as linhas já vêm lidas da planilha).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from webapp import add_disposable_flag, build_app, require_disposable  # noqa: E402
+from datasets import client_rows, seed_clients  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Client  # noqa: E402
+from client_import import map_columns, only_digits, upsert_clients  # noqa: E402
+
+HEADER = ["razao_social", "cnpj", "regime_tributario", "responsavel_fiscal"]
+
+
+def legacy_import(rows, col, atualizar):
+    """O laço que existia em import_xlsx(): um SELECT por linha."""
+    inserted = updated = skipped = errors = 0
+    for r in rows:
+        try:
+            razao_social = str(r[col["razao_social"]] or "").strip()
+            cnpj_raw = str(r[col["cnpj"]] or "").strip()
+            regime_tributario = str(r[col["regime_tributario"]] or "").strip()
+            responsavel_fiscal = str(r[col["responsavel_fiscal"]] or "").strip()
+            if not (razao_social and cnpj_raw and regime_tributario and responsavel_fiscal):
+                errors += 1
+                continue
+            cnpj = only_digits(cnpj_raw)
+            if len(cnpj) != 14:
+                errors += 1
+                continue
+            exists = Client.query.filter_by(cnpj=cnpj).first()
+            if exists:
+                if atualizar:
+                    exists.razao_social = razao_social
+                    exists.regime_tributario = regime_tributario
+                    exists.responsavel_fiscal = responsavel_fiscal
+                    updated += 1
+                else:
+                    skipped += 1
+                continue
+            db.session.add(Client(
+                razao_social=razao_social, cnpj=cnpj,
+                regime_tributario=regime_tributario, responsavel_fiscal=responsavel_fiscal,
+            ))
+            inserted += 1
+        except Exception:
+            errors += 1
+    return {"inserted": inserted, "updated": updated, "skipped": skipped, "errors": errors}
+
+
+def sheet_rows(n):
+    rows = [tuple(r[h] for h in HEADER) for r in client_rows(n, seed=7)]
+    return rows + rows[: n // 100]
+
+
+def run(uri, n, atualizar):
+    app = build_app(uri)
+    col, _ = map_columns(HEADER)
+    rows = sheet_rows(n)
+    results = {}
+    for name in ("legacy", "bulk"):
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            seed_clients(db.session, n // 2, seed=7)
+            t0 = time.perf_counter()
+            if name == "legacy":
+                counts = legacy_import(rows, col, atualizar)
+            else:
+                s = upsert_clients(db.session, rows, col, atualizar)
+                counts = {"inserted": s.inserted, "updated": s.updated, "skipped": s.skipped, "errors": s.errors}
+            db.session.commit()
+            results[name] = {"seconds": round(time.perf_counter() - t0, 3), **counts}
+            db.session.remove()
+    results["speedup"] = round(results["legacy"]["seconds"] / results["bulk"]["seconds"], 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--db", help="URI do banco (padrão: SQLite temporário)")
+    parser.add_argument("--atualizar", action="store_true")
+    add_disposable_flag(parser)
+    args = parser.parse_args()
+    if args.db:
+        args.db = require_disposable(args.db, args.confirmado)
+
+    uri = args.db or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "import.db")
+    print(json.dumps({"rows": args.rows, "db": uri.split(":")[0], **run(uri, args.rows, args.atualizar)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Listagem de clientes com manuais grandes: manual_content fora do SELECT.
+
+Uso:
+    python benchmarks/bench_manual_list.py [--clients 500] [--manual-kb 200] [--db postgresql://...]
+
+Mede a mediana de uma página da listagem pela rota e da mesma consulta
+carregando manual_content (como era antes do deferred), e da página do
+cliente, que não deve depender do tamanho do manual. Quais rotas podem
+selecionar manual_content é verificado em tests/test_manual_list.py.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.orm import undefer  # noqa: E402
+
+from webapp import add_disposable_flag, build_app, require_disposable  # noqa: E402
+from datasets import seed_clients  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Client  # noqa: E402
+
+
+def manual_html(kb):
+    paragrafo = "<p>Acessar o portal da prefeitura, emitir a guia e conferir o vencimento.</p>"
+    return "<h1>Manual</h1>" + paragrafo * (kb * 1024 // len(paragrafo))
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return round(statistics.median(runs) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--manual-kb", type=int, default=200)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--db", help="URI do banco (padrão: SQLite temporário)")
+    parser.add_argument("--repeat", type=int, default=7)
+    add_disposable_flag(parser)
+    args = parser.parse_args()
+    if args.db:
+        args.db = require_disposable(args.db, args.confirmado)
+
+    tmp = tempfile.mkdtemp()
+    uri = args.db or "sqlite:///" + os.path.join(tmp, "manual_list.db")
+    app = build_app(uri)
+    client = app.test_client()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_clients(db.session, args.clients, batch=200, manual_content=manual_html(args.manual_kb))
+
+    results = {
+        "clients": args.clients,
+        "manual_kb": args.manual_kb,
+        "db": uri.split(":")[0],
+        "ms": {},
+    }
+
+    with app.app_context():
+        def page(query):
+            db.session.expunge_all()
+            query.order_by(Client.razao_social.asc(), Client.id.asc()).limit(args.per_page).all()
+
+        results["ms"]["query_deferred"] = timed(lambda: page(Client.query), args.repeat)
+        results["ms"]["query_com_manual"] = timed(
+            lambda: page(Client.query.options(undefer(Client.manual_content))), args.repeat
+        )
+    results["ms"]["rota_index"] = timed(lambda: client.get(f"/manual/?per_page={args.per_page}"), args.repeat)
+    results["ms"]["rota_detalhe"] = timed(lambda: client.get("/manual/cliente/1"), args.repeat)
+    results["ms"]["rota_secoes"] = timed(lambda: client.get("/manual/cliente/1/secoes?de=0&ate=4"), args.repeat)
+
+    shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
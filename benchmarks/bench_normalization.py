@@ -0,0 +1,129 @@
+"""Normalização das linhas importadas: laço original x normalization (por colunas).
+
+Uso:
+    python benchmarks/bench_normalization.py [--rows 100000] [--repeat 5]
+
+As linhas imitam uma planilha real: metade dos CNPJs formatada, espaços
+sobrando e regimes escritos de vários jeitos. Mede só a validação e o
+agrupamento por CNPJ (client_import.normalize_rows), sem banco. O laço
+original só conferia se o CNPJ tinha 14 números; o novo também confere os
+dígitos verificadores e o regime, e mesmo assim precisa ser mais rápido.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datasets import client_rows  # noqa: E402
+from client_import import ImportStats, normalize_rows  # noqa: E402
+import normalization  # noqa: E402
+
+HEADER = ["razao_social", "cnpj", "regime_tributario", "responsavel_fiscal"]
+GRAFIAS = {
+    "SIMPLES NACIONAL": ["SIMPLES NACIONAL", "Simples", "simples nacional", " Simples Nacional "],
+    "LUCRO PRESUMIDO": ["LUCRO PRESUMIDO", "Lucro Presumido", "presumido"],
+    "LUCRO REAL": ["LUCRO REAL", "Lucro real"],
+    "MEI": ["MEI", "mei"],
+}
+
+
+def legacy_only_digits(s):
+    return re.sub(r"\D", "", s or "")
+
+
+def legacy_normalize_rows(rows, col, stats, first_line=2):
+    """client_import.normalize_rows antes do normalization."""
+    by_cnpj = {}
+    for line, r in enumerate(rows, start=first_line):
+        try:
+            razao_social = str(r[col["razao_social"]] or "").strip()
+            cnpj_raw = str(r[col["cnpj"]] or "").strip()
+            regime_tributario = str(r[col["regime_tributario"]] or "").strip()
+            responsavel_fiscal = str(r[col["responsavel_fiscal"]] or "").strip()
+        except Exception:
+            stats.errors += 1
+            stats.rejected.append((line, "linha ilegível", r))
+            continue
+        if not (razao_social and cnpj_raw and regime_tributario and responsavel_fiscal):
+            stats.errors += 1
+            stats.rejected.append((line, "campo obrigatório vazio", r))
+            continue
+        cnpj = legacy_only_digits(cnpj_raw)
+        if len(cnpj) != 14:
+            stats.errors += 1
+            stats.rejected.append((line, "CNPJ sem 14 números", r))
+            continue
+        by_cnpj.setdefault(cnpj, []).append({
+            "razao_social": razao_social,
+            "cnpj": cnpj,
+            "regime_tributario": regime_tributario,
+            "responsavel_fiscal": responsavel_fiscal,
+        })
+    return by_cnpj
+
+
+def sheet_rows(n, seed=3):
+    rnd = random.Random(seed)
+    rows = []
+    for r in client_rows(n, seed=seed):
+        cnpj = r["cnpj"]
+        if rnd.random() < 0.5:
+            cnpj = normalization.format_cnpj(cnpj)
+        rows.append((
+            "  " + r["razao_social"] + " ",
+            cnpj,
+            rnd.choice(GRAFIAS[r["regime_tributario"]]),
+            r["responsavel_fiscal"],
+        ))
+    return rows
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return round(statistics.median(runs) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = sheet_rows(args.rows)
+    col = {h: i for i, h in enumerate(HEADER)}
+
+    legacy = legacy_normalize_rows(rows, col, ImportStats())
+    new_stats = ImportStats()
+    new = normalize_rows(rows, col, new_stats)
+    regimes = set(new.batch.columns["regime_tributario"][i] for i in new.batch.valid)
+
+    results = {
+        "rows": args.rows,
+        "ms": {
+            "legacy": timed(lambda: legacy_normalize_rows(rows, col, ImportStats()), args.repeat),
+            "normalization": timed(lambda: normalize_rows(rows, col, ImportStats()), args.repeat),
+        },
+        "cnpjs_legacy": len(legacy),
+        "cnpjs_normalization": len(new.counts),
+        "rejeitadas_normalization": new_stats.errors,
+        "regimes": sorted(regimes),
+    }
+    results["speedup"] = round(results["ms"]["legacy"] / results["ms"]["normalization"], 2)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    ok = set(legacy) == set(new.keys()) and regimes <= set(normalization.REGIMES) and results["speedup"] > 1
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Escolha do custo do KDF de senhas para uma meta de p99 no pico de logins.
+
+Uso:
+    python benchmarks/bench_password.py --taxa 20 --meta-p99-ms 300 [--workers 4]
+    python benchmarks/bench_password.py --metodos scrypt:16384:8:1 pbkdf2:sha256:600000
+
+Para cada método/custo:
+1. mede o tempo de um hash isolado;
+2. simula o pico: logins chegando a --taxa por segundo durante --duracao
+   segundos (chegadas em intervalos fixos, sem esperar as anteriores), cada
+   um conferindo a senha pelo pool do passwords (--workers threads);
+3. informa p50/p99 (da chegada até a resposta) e quantos receberiam 503.
+
+Sugere o método mais caro que cumpre a meta sem nenhum 503. Rode na mesma
+máquina (ou tipo de instância) do servidor.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import passwords  # noqa: E402
+
+METODOS_PADRAO = [
+    "pbkdf2:sha256:200000",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:1000000",
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+    "scrypt:65536:8:1",
+]
+SENHA = "Senha@Benchmark1"
+
+
+def configurar(metodo, workers, fila, timeout):
+    passwords.PASSWORD_METHOD = metodo
+    passwords.PASSWORD_WORKERS = workers
+    passwords.PASSWORD_QUEUE_MAX = fila
+    passwords.PASSWORD_TIMEOUT = timeout
+    passwords._executor = None  # recria o pool com os parâmetros novos
+
+
+def tempo_hash(metodo, repeticoes=5):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        passwords._hash(SENHA, metodo)
+        tempos.append(time.perf_counter() - t0)
+    return statistics.median(tempos)
+
+
+def pico(hash_gravado, taxa, duracao):
+    total = int(taxa * duracao)
+    latencias, ocupado = [], 0
+    lock = threading.Lock()
+
+    def login(chegada):
+        nonlocal ocupado
+        try:
+            ok, _ = passwords.verify(hash_gravado, SENHA)
+            assert ok
+        except passwords.PasswordBusy:
+            with lock:
+                ocupado += 1
+            return
+        with lock:
+            latencias.append(time.perf_counter() - chegada)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=512) as requisicoes:
+        for n in range(total):
+            chegada = inicio + n / taxa
+            espera = chegada - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            requisicoes.submit(login, chegada)
+    latencias.sort()
+
+    def pct(p):
+        return round(latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000, 1) if latencias else None
+
+    return {"logins": total, "p50_ms": pct(0.50), "p99_ms": pct(0.99), "ocupado_503": ocupado}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--metodos", nargs="+", default=METODOS_PADRAO)
+    parser.add_argument("--taxa", type=float, default=20, help="logins por segundo no pico")
+    parser.add_argument("--duracao", type=float, default=10, help="segundos de pico simulados")
+    parser.add_argument("--meta-p99-ms", type=float, default=300)
+    parser.add_argument("--workers", type=int, default=passwords.PASSWORD_WORKERS)
+    parser.add_argument("--fila", type=int, default=passwords.PASSWORD_QUEUE_MAX)
+    parser.add_argument("--timeout", type=float, default=passwords.PASSWORD_TIMEOUT)
+    args = parser.parse_args()
+
+    resultados = []
+    for metodo in args.metodos:
+        configurar(metodo, args.workers, args.fila, args.timeout)
+        hash_gravado = passwords._hash(SENHA, metodo)
+        r = {"metodo": metodo, "hash_ms": round(tempo_hash(metodo) * 1000, 1)}
+        r.update(pico(hash_gravado, args.taxa, args.duracao))
+        r["cumpre_meta"] = bool(r["p99_ms"] is not None and r["p99_ms"] <= args.meta_p99_ms and not r["ocupado_503"])
+        resultados.append(r)
+        print(json.dumps(r, ensure_ascii=False), flush=True)
+
+    bons = [r for r in resultados if r["cumpre_meta"]]
+    sugestao = max(bons, key=lambda r: r["hash_ms"])["metodo"] if bons else None
+    print(json.dumps({
+        "taxa": args.taxa,
+        "meta_p99_ms": args.meta_p99_ms,
+        "workers": args.workers,
+        "sugestao": sugestao,
+    }, ensure_ascii=False))
+    if sugestao:
+        print(f"PASSWORD_METHOD={sugestao}")
+    else:
+        print("Nenhum método cumpre a meta: aumente --workers (CPUs) ou reduza o custo.")
+    return 0 if sugestao else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""Planos (EXPLAIN) das consultas quentes, com e sem os índices das migrações.
+
+Uso:
+    python benchmarks/bench_query_plans.py [--db postgresql://...] [--users 20000] [--clients 50000]
+
+Aplica migrations.py num banco descartável (SQLite temporário por padrão; as
+tabelas de --db são apagadas e recriadas, então ele precisa ter nome de
+teste, estar vazio ou vir com --i-know-this-is-disposable), gera os dados e
+roda EXPLAIN das consultas que o portal e a API fazem de verdade:
+
+- admin.pending_users: User PENDING por created_at desc -> ix_user_pending_created_at;
+- manual.index filtrado por regime (1ª página por chave) -> ix_client_regime_razao_social_id;
+- login do software, usuarios por e-mail (só PostgreSQL) -> usuarios_email_key.
+
+Cada consulta é cronometrada com e sem o índice (DROP INDEX e recriação
+logo depois), com os dois planos no JSON. Que os planos usam os índices é
+verificado em tests/test_query_plans.py.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from webapp import add_disposable_flag, build_app, require_disposable  # noqa: E402
+import datasets  # noqa: E402
+from extensions import db, pool  # noqa: E402
+from models import Client, User  # noqa: E402
+import migrations  # noqa: E402
+
+
+def compiled_sql(query):
+    return str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def plan_indexes(conn, sql):
+    """Nomes dos índices no plano e o plano em texto."""
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        names, stack = [], [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if "Index Name" in node:
+                names.append(node["Index Name"])
+            stack.extend(node.get("Plans", []))
+        text = conn.exec_driver_sql("EXPLAIN " + sql).scalars().all()
+        return names, "\n".join(text)
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).all()
+    details = [r[-1] for r in rows]
+    names = [d.split(" INDEX ", 1)[1].split()[0] for d in details if " INDEX " in d]
+    return names, "\n".join(details)
+
+
+def timed(conn, sql, repeat=20):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.exec_driver_sql(sql).all()
+        runs.append(time.perf_counter() - t0)
+    return round(statistics.median(runs) * 1000, 3)
+
+
+def index_ddl(conn, index):
+    """CREATE INDEX que recria o índice depois da medição sem ele."""
+    if conn.dialect.name == "postgresql":
+        sql = "SELECT indexdef FROM pg_indexes WHERE indexname = %(n)s"
+    else:
+        sql = "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = :n"
+    return conn.exec_driver_sql(sql, {"n": index}).scalar_one()
+
+
+def check(nome, sql, index, droppable=True):
+    with db.engine.connect() as conn:
+        names, plan = plan_indexes(conn, sql)
+        result = {"indice": index, "indices_no_plano": names, "ms": timed(conn, sql), "plano": plan}
+        if droppable:
+            ddl = index_ddl(conn, index)
+            conn.exec_driver_sql(f"DROP INDEX {index}")
+            conn.commit()
+            # texto diferente: o cache de statements do sqlite3 devolveria o plano antigo
+            _, plan_sem = plan_indexes(conn, sql + " ")
+            result["sem_indice"] = {"ms": timed(conn, sql), "plano": plan_sem}
+            conn.exec_driver_sql(ddl)
+            conn.commit()
+    print(f"{nome}: {result['ms']} ms"
+          + (f", sem {index} {result['sem_indice']['ms']} ms" if droppable else ""), file=sys.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="banco descartável (padrão: SQLite temporário)")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=50000)
+    add_disposable_flag(parser)
+    args = parser.parse_args()
+    if args.db:
+        args.db = require_disposable(args.db, args.confirmado)
+
+    tmp = tempfile.TemporaryDirectory()
+    uri = args.db or f"sqlite:///{os.path.join(tmp.name, 'planos.db')}"
+    app = build_app(uri)
+    postgres = uri.startswith("postgres")
+
+    resultados = {}
+    with app.app_context():
+        db.drop_all()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS client_fts")
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {migrations.MIGRATIONS_TABLE}")
+        if postgres:
+            with pool.connection() as conn:
+                conn.cursor().execute(
+                    "DROP TABLE IF EXISTS usuarios, usuarios_versao, usuarios_excluidos, manuais CASCADE"
+                )
+                conn.commit()
+        migrations.upgrade(db.engine, pool if postgres else None)
+
+        pendentes = max(args.users // 100, 1)
+        datasets.seed_users(db.session, args.users - pendentes, "x")
+        datasets.seed_users(db.session, pendentes, "x", status="PENDING", start=args.users)
+        datasets.seed_clients(db.session, args.clients)
+        if postgres:
+            datasets.seed_usuarios(pool, args.users, "x")
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+        from pages.manual import _apply_filters
+
+        pending = User.query.filter_by(status="PENDING").order_by(User.created_at.desc())
+        resultados["pending_users"] = check("pending_users", compiled_sql(pending), "ix_user_pending_created_at")
+
+        listagem, _ = _apply_filters(Client.query, "", "Simples")
+        listagem = listagem.order_by(Client.razao_social.asc(), Client.id.asc()).limit(21)
+        resultados["manual_index_regime"] = check(
+            "manual_index_regime", compiled_sql(listagem), "ix_client_regime_razao_social_id",
+        )
+
+        if postgres:
+            from app import SQL_LOGIN_BUSCA
+
+            sql = SQL_LOGIN_BUSCA.replace("%(email)s", "'bench7@benchmark.local'")
+            resultados["login_api_email"] = check("login_api_email", sql, "usuarios_email_key", droppable=False)
+
+    tmp.cleanup()
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Busca de clientes: ILIKE '%q%' original x client_search (FTS5 / tsvector / CNPJ).
+
+Uso:
+    python benchmarks/bench_search.py [--clients 100000] [--db postgresql://...]
+
+Para cada termo mede a mediana de uma página da listagem (COUNT + 20 linhas),
+como o manual.index faz.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from webapp import add_disposable_flag, build_app, require_disposable  # noqa: E402
+from datasets import seed_clients  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Client  # noqa: E402
+import client_search  # noqa: E402
+
+QUERIES = ["comercio", "padaria joao", "logist", "Farmácia Paulista", "12345", "00.012.3"]
+
+
+def legacy(q):
+    return client_search._ilike(Client.query, q)
+
+
+def new(q):
+    query, _ = client_search.apply_search(Client.query, db.session, q)
+    return query
+
+
+def page(query):
+    query.order_by(Client.razao_social.asc()).paginate(page=1, per_page=20, error_out=False).items
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return round(statistics.median(runs) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--db", help="URI do banco (padrão: SQLite temporário)")
+    parser.add_argument("--repeat", type=int, default=5)
+    add_disposable_flag(parser)
+    args = parser.parse_args()
+    if args.db:
+        args.db = require_disposable(args.db, args.confirmado)
+
+    tmp = tempfile.mkdtemp()
+    uri = args.db or "sqlite:///" + os.path.join(tmp, "search.db")
+    app = build_app(uri)
+    results = {"clients": args.clients, "db": uri.split(":")[0], "ms": {}}
+    with app.app_context():
+        db.drop_all()
+        if db.engine.dialect.name == "sqlite":
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql("DROP TABLE IF EXISTS client_fts")
+        db.create_all()
+        seed_clients(db.session, args.clients)
+
+        t0 = time.perf_counter()
+        results["mode"] = client_search.search_mode(db.session)
+        results["install_s"] = round(time.perf_counter() - t0, 2)
+
+        for q in QUERIES:
+            results["ms"][q] = {
+                "ilike": timed(lambda: page(legacy(q)), args.repeat),
+                "search": timed(lambda: page(new(q)), args.repeat),
+                "hits_ilike": legacy(q).count(),
+                "hits_search": new(q).count(),
+            }
+    shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
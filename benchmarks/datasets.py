@@ -0,0 +1,167 @@
+"""Geradores de dados sintéticos (determinísticos) para os benchmarks."""
+import base64
+import os
+import random
+import struct
+import zlib
+
+from sqlalchemy import insert, update
+
+REGIMES = ["SIMPLES NACIONAL", "LUCRO PRESUMIDO", "LUCRO REAL", "MEI"]
+PALAVRAS = [
+    "Comércio", "Indústria", "Serviços", "Alimentos", "Transportes", "Construções",
+    "Tecnologia", "Distribuidora", "Açougue", "Padaria", "Farmácia", "Logística",
+    "São", "João", "Paulista", "Mineira", "Gaúcha", "Nordeste", "Atacado", "Varejo",
+]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Élida", "Fábio", "Gisele", "Hugo", "Íris", "Júlio"]
+
+
+def cnpj_valido(n: int) -> str:
+    """CNPJ de 14 dígitos com dígitos verificadores corretos, único por n."""
+    base = f"{n % 10**8:08d}{n // 10**8 % 10**4 + 1:04d}"
+    digitos = [int(d) for d in base]
+    for pesos in ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]):
+        resto = sum(d * p for d, p in zip(digitos, pesos)) % 11
+        digitos.append(0 if resto < 2 else 11 - resto)
+    return "".join(map(str, digitos))
+
+
+def client_rows(n, seed=42, start=0):
+    rnd = random.Random(seed)
+    for i in range(start, start + n):
+        yield {
+            "razao_social": " ".join(rnd.sample(PALAVRAS, 3)) + f" {i} LTDA",
+            "cnpj": cnpj_valido(i + 1),
+            "regime_tributario": rnd.choice(REGIMES),
+            "responsavel_fiscal": rnd.choice(NOMES) + " " + rnd.choice(NOMES),
+        }
+
+
+def seed_clients(session, n, batch=5000, manual_content=None, seed=42):
+    """Insere n clientes em lotes; manual_content opcional para todos."""
+    from manual_sections import dump_toc
+    from models import Client
+
+    # o índice de seções é gravado junto com o manual, como no save_manual
+    manual_toc = dump_toc(manual_content) if manual_content is not None else None
+    lote = []
+    for row in client_rows(n, seed=seed):
+        if manual_content is not None:
+            row["manual_content"] = manual_content
+            row["manual_toc"] = manual_toc
+        lote.append(row)
+        if len(lote) >= batch:
+            session.execute(insert(Client), lote)
+            lote = []
+    if lote:
+        session.execute(insert(Client), lote)
+    session.commit()
+
+
+def seed_users(session, n, password_hash, status="ACTIVE", start=0):
+    """n usuários do portal (bench0@..., bench1@...), todos com o mesmo hash."""
+    from models import User
+
+    session.execute(insert(User), [
+        {"nome": f"Usuário {i}", "email": f"bench{i}@benchmark.local", "password_hash": password_hash,
+         "status": status, "role": "USER"}
+        for i in range(start, start + n)
+    ])
+    session.commit()
+
+
+def seed_usuarios(pool, n, senha_hash):
+    """n usuários aprovados e deslogados na tabela usuarios da API (PostgreSQL)."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO usuarios (nome, email, empresa, plano, senha, status) "
+            "VALUES (%s, %s, 'Benchmark', 'mensal', %s, 'aprovado') "
+            "ON CONFLICT (email) DO UPDATE SET senha = EXCLUDED.senha, status = 'aprovado'",
+            [(f"Usuário {i}", f"bench{i}@benchmark.local", senha_hash) for i in range(n)],
+        )
+        cursor.execute("UPDATE usuarios SET id_maquina = NULL, logado = 0")
+        conn.commit()
+
+
+def png(seed: int, size: int = 48) -> bytes:
+    """PNG válido de size×size com uma cor por seed (imagens distintas)."""
+    rnd = random.Random(seed)
+    pixel = bytes(rnd.randrange(256) for _ in range(3))
+    raw = b"".join(b"\x00" + pixel * size for _ in range(size))
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def manual_with_media(kb, images, seed=0):
+    """Manual de ~kb KB com títulos e `images` imagens embutidas (data URIs),
+    como o editor grava antes da extração de mídia."""
+    paragrafo = "<p>Acessar o portal da prefeitura, emitir a guia e conferir o vencimento.</p>"
+    per_section = max(1, kb * 1024 // len(paragrafo) // max(images, 1))
+    parts = []
+    for i in range(max(images, 1)):
+        parts.append(f"<h2>Etapa {i + 1}</h2>" + paragrafo * per_section)
+        if images:
+            data = base64.b64encode(png(seed * 1000 + i)).decode()
+            parts.append(f'<p><img src="data:image/png;base64,{data}"></p>')
+    return "<h1>Manual</h1>" + "".join(parts)
+
+
+def seed_manuals(session, client_ids, kb, images):
+    from manual_sections import dump_toc
+    from models import Client
+
+    for n, client_id in enumerate(client_ids):
+        html = manual_with_media(kb, images, seed=n)
+        session.execute(
+            update(Client).where(Client.id == client_id).values(manual_content=html, manual_toc=dump_toc(html))
+        )
+    session.commit()
+
+
+def write_clients_xlsx(path, n, start=0, seed=7):
+    """Planilha de importação com n clientes (cabeçalho igual ao modelo)."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("clientes")
+    header = ["razao_social", "cnpj", "regime_tributario", "responsavel_fiscal"]
+    ws.append(header)
+    for row in client_rows(n, seed=seed, start=start):
+        ws.append([row[h] for h in header])
+    wb.save(path)
+    return path
+
+
+def write_clients_csv(path, n, start=0, seed=7, delimiter=";", encoding="cp1252"):
+    """O mesmo conteúdo em CSV, como sai de um ERP brasileiro (";" e Windows-1252)."""
+    import csv
+
+    header = ["razao_social", "cnpj", "regime_tributario", "responsavel_fiscal"]
+    with open(path, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(header)
+        writer.writerows([row[h] for h in header] for row in client_rows(n, seed=seed, start=start))
+    return path
+
+
+def write_clients_jsonl(path, n, start=0, seed=7):
+    """O mesmo conteúdo em JSON Lines (um objeto por cliente)."""
+    import json
+
+    header = ["razao_social", "cnpj", "regime_tributario", "responsavel_fiscal"]
+    with open(path, "w", encoding="utf-8") as f:
+        for row in client_rows(n, seed=seed, start=start):
+            f.write(json.dumps({h: row[h] for h in header}, ensure_ascii=False) + "\n")
+    return path
+
+
+def write_clients_file(path, n, start=0, seed=7):
+    """Arquivo de importação no formato da extensão (.xlsx, .csv ou .jsonl)."""
+    writer = {".xlsx": write_clients_xlsx, ".csv": write_clients_csv, ".jsonl": write_clients_jsonl}
+    return writer[os.path.splitext(path)[1]](path, n, start=start, seed=seed)
@@ -0,0 +1,107 @@
+"""Rajada de logins simultâneos contra uma única conta do /login.
+
+Uso:
+    python benchmarks/login_burst.py --dsn postgresql://.../portal_bench --logins 300
+
+--dsn (ou DATABASE_URL no ambiente; o .env não vale) tem de ser um banco
+descartável: o nome com test/bench/tmp, vazio ou --i-know-this-is-disposable.
+Cria (ou reaproveita) uma conta aprovada e deslogada, dispara N logins em
+paralelo, cada um de um id_maquina diferente, e confere que exatamente um foi
+autorizado. Sai com código 1 se mais (ou menos) de um login vencer.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from webapp import DATABASE_URL_AMBIENTE, add_disposable_flag, require_disposable  # noqa: E402
+from app import create_app, init_db  # noqa: E402
+from extensions import pool  # noqa: E402
+import passwords  # noqa: E402
+
+
+def preparar_conta(email, senha, legado=False):
+    # legado: senha em texto puro, como antes do passwords (o 1º login regrava)
+    gravada = senha if legado else passwords.hash_password(senha)
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO usuarios (nome, email, senha, status)
+            VALUES ('Rajada', %s, %s, 'aprovado')
+            ON CONFLICT (email) DO UPDATE SET senha = EXCLUDED.senha, status = 'aprovado'
+        """, (email, gravada))
+        cursor.execute("UPDATE usuarios SET id_maquina = NULL, logado = 0 WHERE email = %s", (email,))
+        conn.commit()
+
+
+def disparar(app, email, senha, logins, threads):
+    barreira = threading.Barrier(threads)
+    codigos = Counter()
+    latencias = []
+    lock = threading.Lock()
+    fila = iter(range(logins))
+
+    def worker():
+        client = app.test_client()
+        barreira.wait()
+        while True:
+            with lock:
+                n = next(fila, None)
+            if n is None:
+                return
+            t0 = time.perf_counter()
+            resp = client.post("/login", json={"email": email, "senha": senha, "id_maquina": f"MAQ-{n}"})
+            dt = time.perf_counter() - t0
+            with lock:
+                codigos[resp.get_json().get("codigo")] += 1
+                latencias.append(dt)
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return codigos, sorted(latencias), time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--email", default="rajada@benchmark.local")
+    parser.add_argument("--legado", action="store_true", help="grava a senha em texto puro (testa o rehash)")
+    parser.add_argument("--dsn", default=DATABASE_URL_AMBIENTE, help="PostgreSQL descartável")
+    add_disposable_flag(parser)
+    args = parser.parse_args()
+
+    uri = require_disposable(args.dsn, args.confirmado)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": uri})
+    init_db()
+    senha = "rajada123"
+    preparar_conta(args.email, senha, args.legado)
+    codigos, lat, total = disparar(app, args.email, senha, args.logins, args.threads)
+
+    def pct(p):
+        return lat[min(len(lat) - 1, int(len(lat) * p))] * 1000
+
+    print(f"{args.logins} logins em {total:.2f}s ({args.logins / total:.0f}/s)")
+    print(f"latência p50={pct(0.50):.1f}ms p99={pct(0.99):.1f}ms")
+    for codigo, n in codigos.most_common():
+        print(f"  {codigo}: {n}")
+    print("pool:", pool.stats())
+
+    vencedores = codigos["LOGIN_AUTORIZADO"]
+    if vencedores != 1:
+        print(f"FALHA: {vencedores} logins autorizados (esperado 1)")
+        return 1
+    print("OK: exatamente um login autorizado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
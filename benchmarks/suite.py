@@ -0,0 +1,470 @@
+"""Suíte de benchmarks dos caminhos quentes do portal, com resultados em JSON.
+
+Uso:
+    python benchmarks/suite.py [--escala pequena|media|grande] [--pg postgresql://...] [--extras]
+    python benchmarks/suite.py --comparar resultados/antes.json resultados/depois.json [--limite 15]
+
+Roda offline, sobre um SQLite temporário e, com --pg, também sobre um
+PostgreSQL local (as tabelas do banco indicado são apagadas e recriadas: o
+banco precisa ter nome de teste, estar vazio ou vir com
+--i-know-this-is-disposable). Para cada banco:
+
+1. gera dados sintéticos na escala escolhida: usuários do portal e da API,
+   clientes e manuais com imagens embutidas;
+2. mede vazão (req/s) e latência (p50/p95/p99) pela aplicação completa
+   (create_app + test client) de: login web e da API (/login), /usuarios,
+   manual.index com e sem busca, planilha modelo, exportação (xlsx, CSV e
+   JSON Lines), importação de planilhas .xlsx e .csv de 1k a 100k linhas (até o job
+   terminar), extração de mídia e a página do cliente
+   (seções, conteúdo, imagens);
+3. mede o peso das páginas: bytes de cada resposta sem compressão, com
+   gzip e com br (o que o Accept-Encoding de um navegador receberia) e o
+   tempo estimado de transferência em 3G (1,6 Mbit/s) e 10 Mbit/s;
+4. simula a rajada de segunda de manhã: --rajada logins de usuários
+   diferentes disparados ao mesmo tempo por --threads threads;
+5. conta as consultas por requisição de cada cenário (instrumentation), para
+   que um N+1 novo apareça como regressão mesmo quando o tempo não muda.
+
+Cada execução grava benchmarks/resultados/<data>-<commit>-<banco>-<escala>.json.
+--comparar mostra a variação entre dois arquivos e sai com código 1 se algum
+cenário piorou mais que --limite por cento (p50, p99, req/s, consultas ou
+bytes transferidos).
+--extras roda também os scripts avulsos (busca, listagem de manuais,
+importação em conjunto, formatos de arquivo, partida a frio) e inclui a saída deles no JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from flask import url_for  # noqa: E402
+from webapp import DISPOSABLE_FLAG, REPO, add_disposable_flag, build_app, require_disposable  # noqa: E402
+import datasets  # noqa: E402
+from extensions import db, pool  # noqa: E402
+from models import Client, ManualAsset  # noqa: E402
+import instrumentation  # noqa: E402
+import manual_assets  # noqa: E402
+import migrations  # noqa: E402
+import passwords  # noqa: E402
+
+RESULTS_DIR = os.path.join(HERE, "resultados")
+SENHA = "Benchmark@123"
+
+ESCALAS = {
+    "pequena": {"usuarios": 200, "clientes": 1000, "manuais": 10, "manual_kb": 64, "imagens": 4,
+                "importar": [1000], "requisicoes": 50, "rajada": 50},
+    "media": {"usuarios": 2000, "clientes": 20000, "manuais": 50, "manual_kb": 256, "imagens": 8,
+              "importar": [1000, 10000], "requisicoes": 100, "rajada": 200},
+    "grande": {"usuarios": 10000, "clientes": 100000, "manuais": 200, "manual_kb": 1024, "imagens": 16,
+               "importar": [1000, 10000, 100000], "requisicoes": 200, "rajada": 500},
+}
+
+# scripts avulsos (--extras), com o tamanho ajustado à escala
+EXTRAS = {
+    "busca": lambda e: ["bench_search.py", "--clients", str(e["clientes"]), "--repeat", "3"],
+    "listagem_manuais": lambda e: ["bench_manual_list.py", "--clients", str(e["manuais"] * 10),
+                                   "--manual-kb", str(e["manual_kb"]), "--repeat", "3"],
+    "importacao_em_conjunto": lambda e: ["bench_import.py", "--rows", str(e["importar"][-1])],
+    "formatos": lambda e: ["bench_formats.py", "--rows", str(e["importar"][-1])],
+    "partida_a_frio": lambda e: ["bench_cold_start.py", "--json", "--repeat", "3"],
+}
+
+# peso das páginas: banda (Mbit/s) e latência de ida e volta (ms) de cada rede
+REDES = {"3g": (1.6, 150), "10mbit": (10, 40)}
+CODIFICACOES = ("identity", "gzip", "br")
+
+
+# ---------- medição ----------
+
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(app, requisicao, n, threads=1, barreira=False):
+    """Executa requisicao(client, i) n vezes em `threads` threads.
+
+    requisicao devolve True se a resposta foi a esperada. Com barreira, todas
+    as threads começam juntas (rajada).
+    """
+    latencias, falhas = [], [0]
+    lock = threading.Lock()
+    fila = iter(range(n))
+    inicio = threading.Barrier(threads) if barreira else None
+    instrumentation.registry.reset()
+
+    def worker():
+        client = app.test_client()
+        if inicio:
+            inicio.wait()
+        while True:
+            with lock:
+                i = next(fila, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            ok = requisicao(client, i)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencias.append(dt)
+                if not ok:
+                    falhas[0] += 1
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    total = time.perf_counter() - t0
+
+    latencias.sort()
+    consultas = sum(
+        value for _, value in instrumentation.registry.snapshot().get("portal_db_queries_total", [])
+    )
+    return {
+        "n": n,
+        "threads": threads,
+        "falhas": falhas[0],
+        "req_s": round(n / total, 1),
+        "p50_ms": round(percentil(latencias, 0.50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 0.95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 0.99) * 1000, 2),
+        "max_ms": round(latencias[-1] * 1000, 2),
+        "consultas_por_req": round(consultas / n, 2),
+    }
+
+
+# ---------- dados ----------
+
+def preparar_banco(app, escala, postgres):
+    """Recria as tabelas e gera os dados da escala. Devolve o tempo de geração."""
+    t0 = time.perf_counter()
+    with app.app_context():
+        db.drop_all()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS client_fts")
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {migrations.MIGRATIONS_TABLE}")
+        if postgres:
+            with pool.connection() as conn:
+                conn.cursor().execute(
+                    "DROP TABLE IF EXISTS usuarios, usuarios_versao, usuarios_excluidos, manuais CASCADE"
+                )
+                conn.commit()
+        migrations.upgrade(db.engine, pool if postgres else None)
+
+        senha_hash = passwords.hash_password(SENHA)
+        datasets.seed_users(db.session, escala["usuarios"], senha_hash)
+        datasets.seed_clients(db.session, escala["clientes"])
+        datasets.seed_manuals(db.session, range(1, escala["manuais"] + 1), escala["manual_kb"], escala["imagens"])
+        if postgres:
+            datasets.seed_usuarios(pool, escala["usuarios"], senha_hash)
+    return round(time.perf_counter() - t0, 2)
+
+
+def resetar_logins():
+    with pool.connection() as conn:
+        conn.cursor().execute("UPDATE usuarios SET id_maquina = NULL, logado = 0")
+        conn.commit()
+
+
+# ---------- cenários ----------
+
+def login_web(client, i, usuarios):
+    resp = client.post("/web/login", data={"email": f"bench{i % usuarios}@benchmark.local", "password": SENHA})
+    return resp.status_code == 302 and resp.headers["Location"].endswith("/home")
+
+
+def login_api(client, i, usuarios):
+    resp = client.post("/login", json={
+        "email": f"bench{i % usuarios}@benchmark.local", "senha": SENHA, "id_maquina": f"MAQ-{i}",
+    })
+    return resp.status_code == 200
+
+
+def get(caminho, esperado=200, **kwargs):
+    def requisicao(client, i):
+        resp = client.get(caminho, **kwargs)
+        ok = resp.status_code == esperado
+        resp.close()
+        return ok
+    return requisicao
+
+
+def importar(app, pasta, linhas, inicio, formato="xlsx"):
+    """Envia o arquivo e espera o job terminar. Devolve o resultado do cenário."""
+    caminho = datasets.write_clients_file(os.path.join(pasta, f"importar_{linhas}.{formato}"), linhas, start=inicio)
+    client = app.test_client()
+    t0 = time.perf_counter()
+    with open(caminho, "rb") as f:
+        resp = client.post("/manual/importar", data={"file": (f, os.path.basename(caminho))},
+                           content_type="multipart/form-data")
+    status_url = resp.headers["Location"]
+    resposta = time.perf_counter() - t0
+    while True:
+        job = client.get(status_url, query_string={"formato": "json"}).get_json()
+        if job["status"] in ("DONE", "FAILED"):
+            break
+        time.sleep(0.05)
+    total = time.perf_counter() - t0
+    return {
+        "linhas": linhas,
+        "status": job["status"],
+        "resposta_upload_ms": round(resposta * 1000, 2),
+        "total_s": round(total, 3),
+        "linhas_s": round(linhas / total, 1),
+        "inseridos": job["inserted"],
+        "erros": job["errors"],
+    }
+
+
+def exportar(formato):
+    def requisicao(client, i):
+        resp = client.get("/manual/exportar", query_string={"formato": formato}, buffered=False)
+        tamanho = sum(len(c) for c in resp.response)
+        resp.close()
+        return resp.status_code == 200 and tamanho > 0
+    return requisicao
+
+
+def peso_pagina(app, caminho):
+    """Bytes da resposta por codificação e tempo estimado de transferência da menor."""
+    client = app.test_client()
+    resultado = {}
+    for codificacao in CODIFICACOES:
+        t0 = time.perf_counter()
+        resp = client.get(caminho, headers={"Accept-Encoding": codificacao})
+        servidor = time.perf_counter() - t0
+        if resp.status_code != 200:
+            return {"falhas": 1, "status": resp.status_code}
+        recebida = resp.headers.get("Content-Encoding", "identity")
+        resultado[f"bytes_{codificacao}"] = len(resp.get_data())
+        resultado[f"servidor_{codificacao}_ms"] = round(servidor * 1000, 2)
+        if recebida != codificacao:  # não comprimiu (pequena, tipo binário ou sem Brotli)
+            resultado[f"bytes_{codificacao}"] = resultado["bytes_identity"]
+    resultado["bytes"] = min(resultado[f"bytes_{c}"] for c in CODIFICACOES)
+    resultado["reducao_pct"] = round((1 - resultado["bytes"] / max(resultado["bytes_identity"], 1)) * 100, 1)
+    for rede, (mbits, rtt) in REDES.items():
+        resultado[f"transferencia_{rede}_ms"] = round(rtt + resultado["bytes"] * 8 / (mbits * 1000), 1)
+        resultado[f"transferencia_{rede}_sem_compressao_ms"] = round(
+            rtt + resultado["bytes_identity"] * 8 / (mbits * 1000), 1,
+        )
+    return resultado
+
+
+def rodar_banco(uri, escala, args, pasta):
+    postgres = uri.startswith("postgres")
+    app = build_app(uri)
+    app.config["IMPORT_UPLOAD_DIR"] = pasta
+    resultado = {"banco": "postgresql" if postgres else "sqlite", "cenarios": {}}
+    resultado["geracao_dados_s"] = preparar_banco(app, escala, postgres)
+    cenarios = resultado["cenarios"]
+    n = args.requisicoes or escala["requisicoes"]
+    usuarios = escala["usuarios"]
+
+    def registrar(nome, valor):
+        cenarios[nome] = valor
+        print(f"  {nome}: {json.dumps(valor, ensure_ascii=False)}", file=sys.stderr)
+
+    registrar("login_web", medir(app, lambda c, i: login_web(c, i, usuarios), min(n, usuarios)))
+    if postgres:
+        import app as api
+
+        token = {"Authorization": "Bearer " + api.API_KEY_ESPERADA}
+        resetar_logins()
+        registrar("login_api", medir(app, lambda c, i: login_api(c, i, usuarios), min(n, usuarios)))
+        registrar("usuarios", medir(app, get("/usuarios?limit=100", headers=token), n))
+        etag = app.test_client().get("/usuarios?limit=100", headers=token).headers["ETag"]
+        registrar("usuarios_304", medir(app, get("/usuarios?limit=100", 304, headers={**token, "If-None-Match": etag}), n))
+
+    registrar("manual_index", medir(app, get("/manual/"), n))
+    registrar("manual_index_busca", medir(app, get("/manual/?q=padaria%20joao"), n))
+    registrar("manual_index_cnpj", medir(app, get("/manual/?q=00.000.0"), n))
+    registrar("modelo_clientes", medir(app, get("/manual/modelo-clientes"), n))
+    registrar("exportar", medir(app, exportar("xlsx"), 3))
+    registrar("exportar_csv", medir(app, exportar("csv"), 3))
+    registrar("exportar_jsonl", medir(app, exportar("jsonl"), 3))
+
+    inicio = escala["clientes"]  # CNPJs novos a cada planilha
+    for linhas in escala["importar"]:
+        if args.max_importar and linhas > args.max_importar:
+            continue
+        registrar(f"importar_{linhas}", importar(app, pasta, linhas, inicio))
+        inicio += linhas
+        registrar(f"importar_csv_{linhas}", importar(app, pasta, linhas, inicio, "csv"))
+        inicio += linhas
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        convertidos, imagens, _ = manual_assets.migrate_manuals(db.session)
+        registrar("extrair_midias", {"manuais": convertidos, "imagens": imagens,
+                                     "total_s": round(time.perf_counter() - t0, 3)})
+        asset = db.session.scalar(db.select(ManualAsset.sha256).limit(1))
+        client_id = db.session.scalar(db.select(Client.id).where(Client.manual_hash.is_not(None)).limit(1)) or 1
+    registrar("client_detail", medir(app, get(f"/manual/cliente/{client_id}"), n))
+    registrar("client_detail_secoes", medir(app, get(f"/manual/cliente/{client_id}/secoes?de=0&ate=4"), n))
+    registrar("client_detail_conteudo", medir(app, get(f"/manual/cliente/{client_id}/conteudo"), n))
+    if asset:
+        registrar("manual_asset", medir(app, get(f"/manual/assets/{asset}"), n))
+
+    with app.test_request_context():
+        paginas = {
+            "manual_index": "/manual/?per_page=100",
+            "client_detail": f"/manual/cliente/{client_id}",
+            "client_detail_conteudo": f"/manual/cliente/{client_id}/conteudo",
+            "theme_css": url_for("static", filename="css/theme.css"),
+            "quill_js": url_for("static", filename="vendor/quill/1.3.6/quill.js"),
+        }
+    for nome, caminho in paginas.items():
+        registrar(f"peso_{nome}", peso_pagina(app, caminho))
+
+    # rajada de segunda de manhã: todo mundo entra ao mesmo tempo
+    rajada = min(args.rajada or escala["rajada"], usuarios)
+    registrar("rajada_login_web", medir(app, lambda c, i: login_web(c, i, usuarios), rajada,
+                                        threads=args.threads, barreira=True))
+    if postgres:
+        resetar_logins()
+        registrar("rajada_login_api", medir(app, lambda c, i: login_api(c, i, usuarios), rajada,
+                                            threads=args.threads, barreira=True))
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    pool.close()
+    return resultado
+
+
+def rodar_extras(uri, escala):
+    saida = {}
+    for nome, montar in EXTRAS.items():
+        comando = montar(escala)
+        cmd = [sys.executable, os.path.join(HERE, comando[0]), *comando[1:]]
+        env = dict(os.environ)
+        if nome == "partida_a_frio":
+            # /portal é da API (PostgreSQL); sem --pg, a 1ª requisição é a tela de login
+            if uri:
+                env["DATABASE_URL"] = uri
+            else:
+                env.pop("DATABASE_URL", None)
+                cmd += ["--caminho", "/web/login"]
+        elif uri and nome != "formatos":  # formatos não usa banco na importação
+            # o banco já passou por require_disposable aqui
+            cmd += ["--db", uri, DISPOSABLE_FLAG]
+        proc = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO, env=env)
+        try:
+            saida[nome] = json.loads(proc.stdout)
+        except ValueError:
+            saida[nome] = {"erro": (proc.stderr or proc.stdout).strip()[-500:]}
+    return saida
+
+
+# ---------- metadados e comparação ----------
+
+def commit_atual():
+    def git(*args):
+        return subprocess.run(["git", "-C", REPO, *args], capture_output=True, text=True).stdout.strip()
+
+    rev = git("rev-parse", "--short", "HEAD") or "sem-git"
+    return rev + ("-sujo" if git("status", "--porcelain", "--untracked-files=no") else "")
+
+
+def comparar(antes_path, depois_path, limite):
+    with open(antes_path) as f:
+        antes = json.load(f)
+    with open(depois_path) as f:
+        depois = json.load(f)
+    # métrica -> True se maior é melhor
+    metricas = {"p50_ms": False, "p99_ms": False, "req_s": True, "consultas_por_req": False,
+                "total_s": False, "linhas_s": True, "bytes": False}
+    piorou = []
+    print(f"{antes.get('commit')} -> {depois.get('commit')} ({depois.get('banco')}, escala {depois.get('escala')})")
+    for cenario, novo in depois["cenarios"].items():
+        velho = antes["cenarios"].get(cenario)
+        if not velho:
+            print(f"  {cenario:28} (novo)")
+            continue
+        partes = []
+        for metrica, maior_melhor in metricas.items():
+            a, b = velho.get(metrica), novo.get(metrica)
+            if not isinstance(a, (int, float)) or not isinstance(b, (int, float)) or a == 0:
+                continue
+            variacao = (b - a) / a * 100
+            pior = -variacao if maior_melhor else variacao
+            marca = " !" if pior > limite else ""
+            if marca:
+                piorou.append(f"{cenario}.{metrica}")
+            partes.append(f"{metrica} {a}→{b} ({variacao:+.0f}%){marca}")
+        print(f"  {cenario:28} " + "  ".join(partes))
+    if piorou:
+        print(f"Regressões acima de {limite}%: " + ", ".join(piorou))
+        return 1
+    print("Sem regressões acima do limite.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    parser.add_argument("--pg", help="PostgreSQL descartável (as tabelas são recriadas)")
+    parser.add_argument("--sem-sqlite", action="store_true", help="só o PostgreSQL de --pg")
+    parser.add_argument("--requisicoes", type=int, help="requisições por cenário (padrão: da escala)")
+    parser.add_argument("--rajada", type=int, help="logins na rajada (padrão: da escala)")
+    parser.add_argument("--threads", type=int, default=32, help="threads da rajada")
+    parser.add_argument("--max-importar", type=int, help="pula planilhas maiores que isso")
+    parser.add_argument("--extras", action="store_true", help="inclui os scripts avulsos")
+    parser.add_argument("--saida", default=RESULTS_DIR, help="diretório dos JSON")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    parser.add_argument("--limite", type=float, default=15.0, help="piora tolerada em %% (--comparar)")
+    add_disposable_flag(parser)
+    args = parser.parse_args()
+
+    if args.comparar:
+        return comparar(*args.comparar, args.limite)
+
+    escala = ESCALAS[args.escala]
+    bancos = [] if args.sem_sqlite else [None]
+    if args.pg:
+        bancos.append(require_disposable(args.pg, args.confirmado))
+    if not bancos:
+        parser.error("--sem-sqlite exige --pg")
+
+    os.makedirs(args.saida, exist_ok=True)
+    commit = commit_atual()
+    data = datetime.now()
+    for uri in bancos:
+        pasta = tempfile.mkdtemp()
+        alvo = uri or "sqlite:///" + os.path.join(pasta, "suite.db")
+        print(f"{alvo.split(':')[0]} / escala {args.escala}", file=sys.stderr)
+        resultado = {
+            "commit": commit,
+            "data": data.isoformat(timespec="seconds"),
+            "escala": args.escala,
+            "parametros": escala,
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "password_method": passwords.PASSWORD_METHOD,
+            **rodar_banco(alvo, escala, args, pasta),
+        }
+        if args.extras:
+            resultado["extras"] = rodar_extras(uri, escala)
+        nome = f"{data:%Y%m%d-%H%M%S}-{commit}-{resultado['banco']}-{args.escala}.json"
+        caminho = os.path.join(args.saida, nome)
+        with open(caminho, "w") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(caminho)
+        shutil.rmtree(pasta, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Monta o app completo (app.create_app) sobre um banco descartável."""
+import os
+import re
+import sys
+
+# DATABASE_URL de verdade do ambiente, antes do load_dotenv do config.py:
+# o .env aponta para o banco de produção e nunca vale como "descartável"
+DATABASE_URL_AMBIENTE = os.environ.get("DATABASE_URL")
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from sqlalchemy import create_engine, inspect  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import database_url  # noqa: E402
+from extensions import db  # noqa: E402
+import migrations  # noqa: E402
+
+# nomes de banco que só existem para teste/benchmark
+DISPOSABLE_NAME_RE = re.compile(r"(test|teste|bench|tmp|scratch|descartavel)", re.IGNORECASE)
+DISPOSABLE_FLAG = "--i-know-this-is-disposable"
+
+
+def build_app(database_uri):
+    app = create_app({
+        "SECRET_KEY": "benchmark",
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "LOGIN_DISABLED": True,
+        "TESTING": True,
+    })
+    with app.app_context():
+        migrations.upgrade(db.engine)
+    return app
+
+
+def add_disposable_flag(parser):
+    parser.add_argument(
+        DISPOSABLE_FLAG, dest="confirmado", action="store_true",
+        help="o banco indicado pode ser apagado mesmo sem nome de teste",
+    )
+
+
+def require_disposable(uri, confirmed=False):
+    """Encerra o script se ``uri`` não parece um banco descartável.
+
+    Passa se ``confirmed`` (--i-know-this-is-disposable), se o nome do banco
+    (ou do arquivo SQLite) tem test/bench/tmp/scratch/descartavel ou se o
+    banco está vazio. Chame antes de gravar ou apagar qualquer coisa.
+    """
+    if not uri:
+        sys.exit("informe o banco descartável (--db/--dsn ou DATABASE_URL no ambiente)")
+    uri = database_url(uri)
+    if confirmed:
+        return uri
+    url = make_url(uri)
+    name = os.path.basename(url.database or "")
+    if DISPOSABLE_NAME_RE.search(name):
+        return uri
+    engine = create_engine(uri)
+    try:
+        tables = inspect(engine).get_table_names()
+    finally:
+        engine.dispose()
+    if not tables:
+        return uri
+    sys.exit(
+        f"recusado: o banco {url.render_as_string(hide_password=True)} tem {len(tables)} tabelas e o "
+        f"nome não indica um banco de teste. Use um banco descartável ou {DISPOSABLE_FLAG}."
+    )
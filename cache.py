@@ -0,0 +1,237 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Cache de respostas/consultas com duas implementações de mesma interface
+# (get / set / delete / clear):
+# - MemoryCache: LRU com TTL dentro do processo. Rápido, mas cada worker do
+#   gunicorn tem o seu: uma invalidação só vale para o worker que a fez.
+# - FileCache: arquivos JSON num diretório local (0700, do usuário do
+#   processo) compartilhado pelos workers da máquina. Uma invalidação vale
+#   para todos. Limitado a CACHE_MAX_ENTRIES arquivos e CACHE_MAX_BYTES.
+# CACHE_BACKEND escolhe qual usar (padrão: file, por causa dos workers).
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+CACHE_DIR = os.getenv("CACHE_DIR") or os.path.join(tempfile.gettempdir(), f"portal-fiscal-cache-{os.getuid()}")
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", 300))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 128 * 2**20))
+CACHE_SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", 300))
+CACHE_TMP_MAX_AGE = 300
+
+
+class MemoryCache:
+    """LRU com TTL, por processo."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, default_ttl=CACHE_DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()  # key -> (expira_em, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return hit[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _encode(value):
+    # JSON com marcas para o que ele não representa: bytes, tuplas e dicts
+    # (marcados também, para um dict do app nunca passar por marca)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        return {"b": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, tuple):
+        return {"t": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict) and all(isinstance(k, str) for k in value):
+        return {"d": {k: _encode(v) for k, v in value.items()}}
+    raise TypeError(f"FileCache não guarda {type(value).__name__}")
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "b" in value:
+        return base64.b64decode(value["b"])
+    if "t" in value:
+        return tuple(_decode(v) for v in value["t"])
+    return {k: _decode(v) for k, v in value["d"].items()}
+
+
+def private_directory(directory):
+    """Cria o diretório só para o usuário do processo e confere quem é o dono.
+
+    O cache guarda páginas e sessões: outro usuário da máquina não pode ler
+    nem plantar arquivos nele. Diretório de outro dono (ou link simbólico)
+    impede a subida; aberto demais, mas nosso, é fechado e devolve False
+    (quem chama descarta o que havia nele). Também usado por METRICS_DIR.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise RuntimeError(f"CACHE_DIR {directory} não é um diretório do usuário {os.getuid()}")
+    if stat.S_IMODE(st.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+        return False
+    return True
+
+
+class FileCache:
+    """Um arquivo JSON por chave num diretório local, compartilhado entre processos.
+
+    A gravação é atômica (arquivo temporário + os.replace): quem lê vê o valor
+    antigo ou o novo, nunca um arquivo pela metade. O mtime do arquivo é a
+    hora em que expira: a limpeza (sweep) decide só com stat, sem abrir nada.
+    """
+
+    def __init__(self, directory=CACHE_DIR, default_ttl=CACHE_DEFAULT_TTL,
+                 max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 sweep_interval=CACHE_SWEEP_INTERVAL):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._written = 0
+        if not private_directory(directory):
+            # estava aberto a outros usuários: o que havia nele não é confiável
+            self.clear()
+
+    def _path(self, key):
+        name = hashlib.sha1(str(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".cache")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = json.loads(f.read())
+            expires_at, value = entry["exp"], _decode(entry["v"])
+        except (OSError, ValueError, KeyError, TypeError, binascii.Error):
+            return None
+        if expires_at <= time.time():
+            self._remove(path)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl
+        data = json.dumps({"exp": expires_at, "v": _encode(value)}, separators=(",", ":")).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.utime(tmp, (expires_at, expires_at))
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self._written += len(data)
+        if self._written > self.max_bytes // 4 or time.monotonic() >= self._next_sweep:
+            self.sweep()
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith((".cache", ".tmp")):
+                self._remove(os.path.join(self.directory, name))
+
+    def sweep(self):
+        """Apaga os expirados e, acima de max_entries/max_bytes, os que expiram antes.
+
+        Roda a cada sweep_interval segundos ou a cada max_bytes/4 gravados por
+        este processo. Devolve quantos arquivos apagou.
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._written = 0
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            now = time.time()
+            removed = 0
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if entry.name.endswith(".tmp"):
+                        # gravação interrompida (o processo morreu antes do replace)
+                        if st.st_ctime < now - CACHE_TMP_MAX_AGE:
+                            removed += self._remove(entry.path)
+                    elif entry.name.endswith(".cache"):
+                        if st.st_mtime <= now:
+                            removed += self._remove(entry.path)
+                        else:
+                            entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            entries.sort()
+            while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+                _, size, path = entries.pop(0)
+                total -= size
+                removed += self._remove(path)
+            return removed
+        finally:
+            self._sweep_lock.release()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+
+def make_cache(backend=CACHE_BACKEND):
+    if backend == "memory":
+        return MemoryCache()
+    if backend == "file":
+        return FileCache()
+    raise ValueError(f"CACHE_BACKEND desconhecido: {backend}")
+
+
+cache = make_cache()
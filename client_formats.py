@@ -0,0 +1,322 @@
+import codecs
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+# Arquivos de clientes aceitos na importação e gerados na exportação. Os três
+# formatos são escritos em streaming (o .xlsx por xlsx_chunks, um zip gerado
+# enquanto as linhas chegam); CSV e JSON Lines também são lidos assim, sem
+# montar o arquivo inteiro na memória. Os cabeçalhos passam pelo mesmo
+# client_import.map_columns (COLUMN_ALIASES) qualquer que seja o formato.
+
+FORMATS = ("xlsx", "csv", "jsonl")
+EXTENSIONS = {"xlsx": "xlsx", "csv": "csv", "txt": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}
+MIMETYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+READ_ERRORS = {
+    "xlsx": "Não consegui ler esse Excel. Confirme se é .xlsx válido.",
+    "csv": "Não consegui ler esse CSV. Confirme o separador e a codificação do arquivo.",
+    "jsonl": "Não consegui ler esse JSON Lines: cada linha deve ser um objeto JSON.",
+}
+
+# Exportações de ERP brasileiro costumam vir com ";" e em Windows-1252
+CSV_DELIMITERS = ";,\t|"
+CSV_DEFAULT_DELIMITER = ";"
+SNIFF_BYTES = 64 * 1024
+WRITE_BATCH_SIZE = 1000
+
+
+def format_of(filename: str):
+    """Formato pelo nome do arquivo (None se não for aceito)."""
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return EXTENSIONS.get(ext)
+
+
+# ---------- leitura ----------
+
+def sniff_encoding(sample: bytes) -> str:
+    """UTF-8 (com ou sem BOM) quando a amostra decodifica; senão Windows-1252/latin-1."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False: a amostra pode terminar no meio de um caractere
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def sniff_delimiter(first_line: str) -> str:
+    """O separador que mais aparece no cabeçalho (";" se nenhum aparece)."""
+    counts = {d: first_line.count(d) for d in CSV_DELIMITERS}
+    best = max(counts, key=counts.get)
+    return best if counts[best] else CSV_DEFAULT_DELIMITER
+
+
+def count_lines(path: str) -> int:
+    """Número de quebras de linha do arquivo (lido em blocos, sem decodificar)."""
+    n = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            n += block.count(b"\n")
+            last = block[-1:]
+    return n + (last != b"\n")
+
+
+class RowReader:
+    """Lê um arquivo de clientes em streaming: o cabeçalho e depois as linhas.
+
+    Iterar devolve tuplas (o cabeçalho primeiro); ``total_rows`` é uma
+    estimativa para a barra de progresso. Erros de leitura no meio do arquivo
+    viram ValueError com a mensagem de READ_ERRORS.
+    """
+
+    def __init__(self, path: str, fmt: str = None):
+        self.path = path
+        self.format = fmt or format_of(path)
+        if self.format not in FORMATS:
+            raise ValueError("Formato de arquivo não suportado.")
+        self.encoding = None
+        self.delimiter = None
+        self._file = None
+        self._wb = None
+        try:
+            self._rows = getattr(self, "_open_" + self.format)()
+        except Exception:
+            self.close()
+            raise ValueError(READ_ERRORS[self.format])
+
+    def _open_xlsx(self):
+        self._wb = load_workbook(self.path, data_only=True, read_only=True)
+        ws = self._wb.active
+        self.total_rows = max((ws.max_row or 1) - 1, 0) or None
+        return ws.iter_rows(values_only=True)
+
+    def _open_csv(self):
+        with open(self.path, "rb") as f:
+            sample = f.read(SNIFF_BYTES)
+        self.encoding = sniff_encoding(sample)
+        first_line = sample.decode(self.encoding, errors="replace").lstrip("\ufeff").split("\n", 1)[0]
+        self.delimiter = sniff_delimiter(first_line)
+        self.total_rows = max(count_lines(self.path) - 1, 0) or None
+        self._file = open(self.path, encoding=self.encoding, newline="")
+        return self._csv_rows(csv.reader(self._file, delimiter=self.delimiter))
+
+    @staticmethod
+    def _csv_rows(reader):
+        width = None
+        for r in reader:
+            if not r:
+                continue
+            if width is None:
+                width = len(r)
+            elif len(r) < width:
+                # campos finais omitidos: vazios, como numa célula em branco
+                r += [None] * (width - len(r))
+            yield r
+
+    def _open_jsonl(self):
+        self.total_rows = max(count_lines(self.path) - 1, 0) or None
+        self._file = open(self.path, encoding="utf-8-sig")
+        return self._jsonl_rows(self._file)
+
+    @staticmethod
+    def _jsonl_rows(lines):
+        header = None
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                obj = None
+            if header is None:
+                if not isinstance(obj, dict):
+                    raise ValueError(READ_ERRORS["jsonl"])
+                header = list(obj)
+                yield header
+            # linha que não é objeto: chega como ilegível (client_import)
+            yield None if not isinstance(obj, dict) else tuple(
+                json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                for v in map(obj.get, header)
+            )
+
+    def __iter__(self):
+        try:
+            yield from self._rows
+        except ValueError as e:
+            # UnicodeDecodeError também é ValueError: codificação errada no meio do arquivo
+            if isinstance(e, UnicodeDecodeError):
+                raise ValueError(READ_ERRORS[self.format])
+            raise
+        except Exception:
+            raise ValueError(READ_ERRORS[self.format])
+
+    def close(self):
+        if self._wb is not None:
+            self._wb.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---------- escrita ----------
+
+def _batched(rows, size=WRITE_BATCH_SIZE):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def csv_chunks(header, rows, delimiter: str = CSV_DEFAULT_DELIMITER):
+    """CSV em UTF-8 com BOM (o Excel reconhece a codificação), em blocos de bytes."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, lineterminator="\r\n")
+    buf.write("\ufeff")
+    writer.writerow(header)
+    for batch in _batched(rows):
+        writer.writerows(batch)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def jsonl_chunks(header, rows):
+    """Um objeto JSON por linha, em blocos de bytes."""
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for batch in _batched(rows):
+        yield "".join(dumps(dict(zip(header, r))) + "\n" for r in batch).encode("utf-8")
+
+
+# .xlsx mínimo (uma planilha, textos inline, sem estilos): o zip é gravado num
+# destino sem seek, que devolve os bytes comprimidos a cada lote de linhas.
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+_XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_SHEET_TAIL = "</sheetData></worksheet>"
+# caracteres de controle não são permitidos em XML
+_XML_ILLEGAL_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino de escrita sem seek: acumula o que o zipfile grava até take()."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _xlsx_cell(ref: str, value) -> str:
+    if value is None or value == "":
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL_RE.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_chunks(header, rows, sheet: str = "clientes"):
+    """.xlsx em blocos de bytes: o primeiro sai antes de ler a segunda linha.
+
+    Números viram células numéricas; o resto, texto (CNPJ com zeros à
+    esquerda continua texto). Linhas mais largas que o cabeçalho são aceitas.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _XLSX_PARTS.items():
+            zf.writestr(name, xml.replace("{sheet}", escape(sheet, {'"': "&quot;"})))
+        letters = []
+
+        def row_xml(n, values):
+            while len(letters) < len(values):
+                letters.append(get_column_letter(len(letters) + 1))
+            cells = "".join(_xlsx_cell(f"{letters[i]}{n}", v) for i, v in enumerate(values))
+            return f'<row r="{n}">{cells}</row>'
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as f:
+            f.write((_XLSX_SHEET_HEAD + row_xml(1, header)).encode("utf-8"))
+            yield sink.take()
+            n = 1
+            for batch in _batched(rows):
+                parts = []
+                for values in batch:
+                    n += 1
+                    parts.append(row_xml(n, values))
+                f.write("".join(parts).encode("utf-8"))
+                yield sink.take()
+            f.write(_XLSX_SHEET_TAIL.encode("utf-8"))
+    yield sink.take()
@@ -0,0 +1,157 @@
+from collections import Counter
+from dataclasses import dataclass, field
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Client
+from normalization import ClientBatch, columns_from_rows, norm_header, normalize_columns, only_digits  # noqa: F401
+
+# Cabeçalhos aceitos na planilha (já normalizados por norm_header)
+COLUMN_ALIASES = {
+    "razao_social": {"razao_social", "razao", "razao_social_empresa", "nome", "empresa", "cliente"},
+    "cnpj": {"cnpj", "cnpj_cpf", "documento", "documento_de_identificacao"},
+    "regime_tributario": {"regime_tributario", "regime", "regime_federal", "tributacao"},
+    "responsavel_fiscal": {"responsavel_fiscal", "responsavel", "resp_fiscal", "responsavel_do_fiscal"},
+}
+
+PREFETCH_BATCH_SIZE = 500
+WRITE_BATCH_SIZE = 1000
+
+
+def map_columns(header_row):
+    """Índice de cada campo no cabeçalho. Devolve (col, campos_faltando)."""
+    header = [norm_header(str(c or "")) for c in header_row]
+    col = {}
+    for idx, h in enumerate(header):
+        for key, opts in COLUMN_ALIASES.items():
+            if h in opts and key not in col:
+                col[key] = idx
+    missing = [k for k in COLUMN_ALIASES if k not in col]
+    return col, missing
+
+
+@dataclass
+class ImportStats:
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    errors: int = 0
+    # (linha da planilha, motivo, valores originais)
+    rejected: list = field(default_factory=list)
+
+    def merge(self, other: "ImportStats"):
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.skipped += other.skipped
+        self.errors += other.errors
+        self.rejected.extend(other.rejected)
+
+
+@dataclass
+class CnpjGroups:
+    """Linhas aprovadas agrupadas por CNPJ, sem montar uma lista por grupo."""
+    batch: ClientBatch
+    # {cnpj: ocorrências}, na ordem da 1ª aparição
+    counts: dict
+    # {cnpj: posição} da 1ª e da última ocorrência
+    first: dict
+    last: dict
+
+    def keys(self):
+        return self.counts.keys()
+
+
+def normalize_rows(rows, col, stats: ImportStats, first_line: int = 2) -> CnpjGroups:
+    """Valida as linhas (normalization, coluna a coluna) e agrupa por CNPJ,
+    mantendo a ordem de aparição.
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    columns, unreadable = columns_from_rows(rows, col)
+    batch = normalize_columns(columns, unreadable)
+
+    for i, reason in batch.rejected:
+        stats.rejected.append((first_line + i, reason, rows[i]))
+    stats.errors += len(batch.rejected)
+
+    # dict(zip(...)) guarda a última posição de cada chave; ao contrário, a primeira
+    positions = batch.valid
+    cnpjs = [batch.columns["cnpj"][i] for i in positions]
+    return CnpjGroups(
+        batch=batch,
+        counts=Counter(cnpjs),
+        first=dict(zip(reversed(cnpjs), reversed(positions))),
+        last=dict(zip(cnpjs, positions)),
+    )
+
+
+def existing_cnpjs(session, cnpjs):
+    found = set()
+    cnpjs = list(cnpjs)
+    for i in range(0, len(cnpjs), PREFETCH_BATCH_SIZE):
+        batch = cnpjs[i:i + PREFETCH_BATCH_SIZE]
+        found.update(session.scalars(select(Client.cnpj).where(Client.cnpj.in_(batch))))
+    return found
+
+
+def _write(session, values, atualizar: bool):
+    """Grava em lotes com INSERT ... ON CONFLICT (cnpj) (PostgreSQL/SQLite)."""
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(Client)
+        if atualizar:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Client.cnpj],
+                set_={
+                    "razao_social": stmt.excluded.razao_social,
+                    "regime_tributario": stmt.excluded.regime_tributario,
+                    "responsavel_fiscal": stmt.excluded.responsavel_fiscal,
+                },
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Client.cnpj])
+        for i in range(0, len(values), WRITE_BATCH_SIZE):
+            session.execute(stmt, values[i:i + WRITE_BATCH_SIZE])
+        return
+
+    # Demais bancos: insere os novos e atualiza os existentes, também em lote
+    present = existing_cnpjs(session, (v["cnpj"] for v in values))
+    new = [v for v in values if v["cnpj"] not in present]
+    for i in range(0, len(new), WRITE_BATCH_SIZE):
+        session.execute(insert(Client), new[i:i + WRITE_BATCH_SIZE])
+    if atualizar:
+        changed = [{**v, "b_cnpj": v["cnpj"]} for v in values if v["cnpj"] in present]
+        stmt = update(Client.__table__).where(Client.cnpj == bindparam("b_cnpj"))
+        for i in range(0, len(changed), WRITE_BATCH_SIZE):
+            session.connection().execute(stmt, changed[i:i + WRITE_BATCH_SIZE])
+
+
+def upsert_clients(session, rows, col, atualizar: bool, first_line: int = 2) -> ImportStats:
+    """Importa as linhas (sem o cabeçalho) em operações de conjunto.
+
+    Os contadores seguem a importação linha a linha: a primeira ocorrência
+    de um CNPJ novo é inserida; as repetições (e CNPJs já cadastrados) contam
+    como atualizadas quando ``atualizar`` e, senão, como ignoradas. Quem chama
+    faz o commit.
+    """
+    stats = ImportStats()
+    groups = normalize_rows(rows, col, stats, first_line)
+    present = existing_cnpjs(session, groups.keys())
+
+    values = []
+    for cnpj, occurrences in groups.counts.items():
+        repeats = occurrences if cnpj in present else occurrences - 1
+        if cnpj not in present:
+            stats.inserted += 1
+        if atualizar:
+            stats.updated += repeats
+            values.append(groups.batch.record(groups.last[cnpj]))
+        else:
+            stats.skipped += repeats
+            if cnpj not in present:
+                values.append(groups.batch.record(groups.first[cnpj]))
+
+    if values:
+        _write(session, values, atualizar)
+    return stats
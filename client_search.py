@@ -0,0 +1,174 @@
+import re
+import threading
+import unicodedata
+
+from sqlalchemy import Float, Integer, func, literal_column, text
+
+from models import Client
+
+# Busca de clientes por razão social / responsável, sem acento e sem diferenciar
+# maiúsculas, usando índice:
+# - PostgreSQL: índice GIN sobre to_tsvector('simple', client_search_fold(...))
+#   e consulta por prefixo de palavra (to_tsquery 'termo:*'), com ts_rank;
+# - SQLite: tabela FTS5 client_fts (external content) mantida por gatilhos;
+# - CNPJ: busca só com dígitos vira faixa por prefixo no índice único de cnpj.
+# A estrutura é criada só pela migração 5 (migrations.py), nunca durante uma
+# requisição: search_mode apenas confere, uma vez por processo, se ela existe.
+# Nos demais bancos (ou sem a estrutura) cai no ILIKE.
+
+CNPJ_PREFIX_MIN_DIGITS = 2
+
+_PG_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION client_search_fold(text) RETURNS text
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+        SELECT translate(lower($1), 'áàâãäåéèêëíìîïóòôõöúùûüçñ', 'aaaaaaeeeeiiiiooooouuuucn')
+    $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_client_search_tsv ON client USING gin (
+        to_tsvector('simple'::regconfig, client_search_fold((razao_social || ' ') || responsavel_fiscal))
+    )
+    """,
+]
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE client_fts USING fts5(
+        razao_social, responsavel_fiscal,
+        content='client', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS client_fts_ai AFTER INSERT ON client BEGIN
+        INSERT INTO client_fts(rowid, razao_social, responsavel_fiscal)
+        VALUES (new.id, new.razao_social, new.responsavel_fiscal);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS client_fts_ad AFTER DELETE ON client BEGIN
+        INSERT INTO client_fts(client_fts, rowid, razao_social, responsavel_fiscal)
+        VALUES ('delete', old.id, old.razao_social, old.responsavel_fiscal);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS client_fts_au AFTER UPDATE OF razao_social, responsavel_fiscal ON client BEGIN
+        INSERT INTO client_fts(client_fts, rowid, razao_social, responsavel_fiscal)
+        VALUES ('delete', old.id, old.razao_social, old.responsavel_fiscal);
+        INSERT INTO client_fts(rowid, razao_social, responsavel_fiscal)
+        VALUES (new.id, new.razao_social, new.responsavel_fiscal);
+    END
+    """,
+    "INSERT INTO client_fts(client_fts) VALUES ('rebuild')",
+]
+
+_modes = {}
+_modes_lock = threading.Lock()
+
+
+def create_structures(conn) -> str:
+    """Cria a estrutura de busca na conexão dada (idempotente). Devolve o modo."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        for ddl in _PG_DDL:
+            conn.execute(text(ddl))
+        return "postgresql"
+    if dialect == "sqlite":
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'client_fts'")
+        ).first()
+        if not exists:
+            for ddl in _SQLITE_DDL:
+                conn.execute(text(ddl))
+        return "sqlite"
+    return "ilike"
+
+
+def detect(engine) -> str:
+    """Modo de busca que o banco suporta, pela estrutura que a migração criou."""
+    try:
+        with engine.connect() as conn:
+            dialect = conn.dialect.name
+            if dialect == "postgresql":
+                found = conn.execute(text("SELECT to_regprocedure('client_search_fold(text)')")).scalar()
+            elif dialect == "sqlite":
+                found = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = 'client_fts'")
+                ).first()
+            else:
+                found = None
+    except Exception:
+        return "ilike"
+    return dialect if found else "ilike"
+
+
+def search_mode(session) -> str:
+    engine = session.get_bind()
+    key = str(engine.url)
+    mode = _modes.get(key)
+    if mode is None:
+        with _modes_lock:
+            mode = _modes.get(key)
+            if mode is None:
+                mode = _modes[key] = detect(engine)
+    return mode
+
+
+def fold(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s or "")
+    return "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+
+
+def terms(q: str) -> list:
+    return re.findall(r"\w+", fold(q))
+
+
+def cnpj_prefix(q: str):
+    """Os dígitos de q quando a busca é só um pedaço de CNPJ (00.000.000/0000-00)."""
+    if not re.fullmatch(r"[\d./\-\s]+", q or ""):
+        return None
+    digits = re.sub(r"\D", "", q)
+    return digits if len(digits) >= CNPJ_PREFIX_MIN_DIGITS else None
+
+
+def _ilike(query, q: str):
+    q_like = f"%{q}%"
+    return query.filter(
+        (Client.razao_social.ilike(q_like))
+        | (Client.cnpj.ilike(q_like))
+        | (Client.responsavel_fiscal.ilike(q_like))
+    )
+
+
+def apply_search(query, session, q: str):
+    """Filtra a consulta pela busca q. Devolve (query, ordem_por_relevância).
+
+    A ordem por relevância é None quando não se aplica (busca por CNPJ ou ILIKE).
+    """
+    digits = cnpj_prefix(q)
+    if digits:
+        # faixa [prefixo, prefixo + ':') — ':' vem logo depois do '9' — usa o índice de cnpj
+        return query.filter(Client.cnpj >= digits, Client.cnpj < digits + ":"), None
+
+    words = terms(q)
+    mode = search_mode(session)
+    if not words or mode == "ilike":
+        return _ilike(query, q), None
+
+    if mode == "postgresql":
+        simple = literal_column("'simple'::regconfig")
+        document = func.to_tsvector(
+            simple, func.client_search_fold(Client.razao_social + " " + Client.responsavel_fiscal)
+        )
+        tsquery = func.to_tsquery(simple, " & ".join(f"{w}:*" for w in words))
+        return query.filter(document.op("@@")(tsquery)), func.ts_rank(document, tsquery).desc()
+
+    match = " ".join(f'"{w}"*' for w in words)
+    fts = (
+        text("SELECT rowid AS id, bm25(client_fts) AS rank FROM client_fts WHERE client_fts MATCH :match")
+        .bindparams(match=match)
+        .columns(id=Integer, rank=Float)
+        .subquery("fts")
+    )
+    return query.join(fts, fts.c.id == Client.id), fts.c.rank.asc()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+from io import BytesIO
+
+from openpyxl import Workbook
+from openpyxl.styles import Font
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from cache import cache
+from client_import import COLUMN_ALIASES
+import normalization
+
+# Planilha modelo de importação de clientes (GET /manual/modelo-clientes).
+# Gerar um .xlsx custa CPU de um worker síncrono; o conteúdo só muda quando
+# mudam as colunas que o import entende (COLUMN_ALIASES), os regimes
+# (normalization.REGIMES) ou o layout abaixo. SCHEMA_VERSION resume os três:
+# cada variante é gerada uma vez por versão, fica no cache compartilhado
+# pelos workers (cache.py) e na memória do processo, e sai com ETag.
+#
+# Variantes: com ou sem linha de exemplo e, opcionalmente, de um regime só
+# (a lista suspensa da coluna de regime oferece só ele). A validação é um
+# aviso, não um bloqueio: o import também aceita as grafias alternativas
+# ("Simples", "LP"...) listadas na aba "regimes".
+
+# mude quando o layout da planilha mudar (a versão entra no ETag)
+TEMPLATE_LAYOUT = 1
+TEMPLATE_CACHE_TTL = 30 * 24 * 3600
+VALIDATION_ROWS = 5000
+MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+HEADER = list(COLUMN_ALIASES)
+# o CNPJ de exemplo não passa no dígito verificador: se a linha não for
+# apagada, o import a rejeita em vez de cadastrar um cliente fictício
+EXAMPLE_ROW = {
+    "razao_social": "EMPRESA EXEMPLO LTDA",
+    "cnpj": "00.000.000/0000-00",
+    "regime_tributario": normalization.SIMPLES_NACIONAL,
+    "responsavel_fiscal": "RESPONSÁVEL",
+}
+COLUMN_WIDTHS = {"razao_social": 40, "cnpj": 22, "regime_tributario": 22, "responsavel_fiscal": 28}
+# datas fixas nas propriedades: a mesma versão gera os mesmos bytes
+FIXED_TIMESTAMP = datetime(2024, 1, 1)
+
+
+def _schema_version() -> str:
+    schema = {
+        "layout": TEMPLATE_LAYOUT,
+        "colunas": {k: sorted(v) for k, v in COLUMN_ALIASES.items()},
+        "regimes": {r: normalization.regime_aliases(r) for r in normalization.REGIMES},
+    }
+    raw = json.dumps(schema, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:12]
+
+
+SCHEMA_VERSION = _schema_version()
+
+
+def variant_key(exemplo: bool, regime=None) -> str:
+    return f"{'exemplo' if exemplo else 'vazio'}-{regime or 'todos'}"
+
+
+def build(exemplo: bool = True, regime=None) -> bytes:
+    """Gera o .xlsx da variante (regime: um de normalization.REGIMES ou None)."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "clientes"
+    ws.append(HEADER)
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+    ws.freeze_panes = "A2"
+    for idx, field in enumerate(HEADER, start=1):
+        letter = ws.cell(row=1, column=idx).column_letter
+        ws.column_dimensions[letter].width = COLUMN_WIDTHS.get(field, 20)
+    if exemplo:
+        ws.append([(regime if field == "regime_tributario" and regime else EXAMPLE_ROW[field]) for field in HEADER])
+
+    # aba de referência: regimes canônicos (origem da lista suspensa) e grafias aceitas
+    ref = wb.create_sheet("regimes")
+    ref.append(["regime_tributario", "grafias_aceitas"])
+    for cell in ref[1]:
+        cell.font = Font(bold=True)
+    for r in normalization.REGIMES:
+        ref.append([r, ", ".join(normalization.regime_aliases(r))])
+    ref.column_dimensions["A"].width = 22
+    ref.column_dimensions["B"].width = 80
+
+    if regime:
+        formula = f'"{regime}"'
+    else:
+        formula = f"=regimes!$A$2:$A${len(normalization.REGIMES) + 1}"
+    dv = DataValidation(
+        type="list",
+        formula1=formula,
+        allow_blank=True,
+        showErrorMessage=True,
+        errorStyle="warning",
+        errorTitle="Regime tributário",
+        error="Regime fora da lista. O import também aceita as grafias da aba \"regimes\".",
+    )
+    col = ws.cell(row=1, column=HEADER.index("regime_tributario") + 1).column_letter
+    dv.add(f"{col}2:{col}{VALIDATION_ROWS + 1}")
+    ws.add_data_validation(dv)
+
+    wb.properties.creator = "Portal Fiscal"
+    wb.properties.created = FIXED_TIMESTAMP
+    wb.properties.modified = FIXED_TIMESTAMP
+    bio = BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+_memo = {}
+_lock = threading.Lock()
+
+
+def get(exemplo: bool = True, regime=None):
+    """(etag, bytes) da variante: memória do processo -> cache compartilhado -> build()."""
+    key = f"modelo_clientes:{SCHEMA_VERSION}:{variant_key(exemplo, regime)}"
+    hit = _memo.get(key)
+    if hit is not None:
+        return hit
+    hit = cache.get(key)
+    if hit is None:
+        data = build(exemplo, regime)
+        hit = (f"{SCHEMA_VERSION}-{hashlib.sha256(data).hexdigest()[:16]}", data)
+        cache.set(key, hit, ttl=TEMPLATE_CACHE_TTL)
+    with _lock:
+        _memo[key] = hit
+    return hit
@@ -0,0 +1,119 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:  # opcional: sem o pacote Brotli, só gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compressão das respostas dinâmicas (HTML, JSON, CSS...) negociada pelo
+# Accept-Encoding: br quando o pacote Brotli está instalado, senão gzip.
+# Respostas pequenas (COMPRESS_MIN_SIZE), em streaming, send_file (arquivos
+# e static/, que têm variantes prontas em static_assets) e tipos já
+# comprimidos (imagens, xlsx) passam direto.
+#
+# O ETag não muda: identifica a versão do conteúdo e é com ele que as views
+# comparam o If-None-Match; Vary: Accept-Encoding separa as variantes nos
+# caches. Respostas com ETag (portal, /usuarios, conteúdo do manual) se
+# repetem: o resultado comprimido delas fica guardado (LRU por bytes).
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+# qualidade 4-5 comprime melhor que o gzip 6 em tempo parecido; 11 é para static/
+COMPRESS_BR_LEVEL = int(os.getenv("COMPRESS_BR_LEVEL", 5))
+COMPRESS_CACHE_BYTES = int(os.getenv("COMPRESS_CACHE_BYTES", 16 * 2**20))
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript", "text/xml",
+    "application/javascript", "application/json", "application/x-ndjson", "application/xml",
+    "image/svg+xml",
+}
+
+
+def available_encodings() -> list:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(data: bytes, encoding: str, level: int = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_BR_LEVEL if level is None else level)
+    # mtime=0: a mesma entrada dá sempre os mesmos bytes
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL if level is None else level, mtime=0)
+
+
+class _CompressedCache:
+    """LRU de respostas comprimidas, limitado pelo total de bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+            return body
+
+    def set(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+
+def init_app(app):
+    """Comprime as respostas do app (COMPRESS_* no app.config sobrescrevem os do ambiente)."""
+    min_size = app.config.get("COMPRESS_MIN_SIZE", COMPRESS_MIN_SIZE)
+    levels = {
+        "br": app.config.get("COMPRESS_BR_LEVEL", COMPRESS_BR_LEVEL),
+        "gzip": app.config.get("COMPRESS_GZIP_LEVEL", COMPRESS_GZIP_LEVEL),
+    }
+    cache = _CompressedCache(app.config.get("COMPRESS_CACHE_BYTES", COMPRESS_CACHE_BYTES))
+    encodings = available_encodings()
+
+    @app.after_request
+    def _compress_response(response):
+        if (
+            response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        if response.status_code != 200 or (response.content_length or 0) < min_size:
+            return response
+
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        etag, weak = response.get_etag()
+        # a chave é o próprio conteúdo (resumo): ETags iguais em rotas diferentes não se confundem
+        key = (encoding, hashlib.blake2b(data, digest_size=16).digest()) if etag and not weak else None
+        body = cache.get(key) if key else None
+        if body is None:
+            body = compress(data, encoding, levels[encoding])
+            if key:
+                cache.set(key, body)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    app.extensions["compression"] = cache
@@ -3,10 +3,40 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def database_url(url=None):
+    """URL do banco para o SQLAlchemy.
+
+    O Render entrega "postgres://", que o SQLAlchemy 2 não aceita mais.
+    """
+    url = url or os.getenv("DATABASE_URL") or "sqlite:///local_dev.db"
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def libpq_dsn(url):
+    """A mesma URL no formato do psycopg2 (sem "+driver"); None se não for PostgreSQL."""
+    scheme, sep, rest = (url or "").partition("://")
+    if not sep or scheme.split("+", 1)[0] not in ("postgres", "postgresql"):
+        return None
+    return "postgresql://" + rest
+
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
-    SQLALCHEMY_DATABASE_URI = os.getenv(
-        "DATABASE_URL",
-        "sqlite:///local_dev.db"
-    )
+    SQLALCHEMY_DATABASE_URI = database_url()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # API do software (app.py): pool psycopg2 por worker do gunicorn.
+    # DATABASE_DSN sai do SQLALCHEMY_DATABASE_URI quando não informado.
+    DATABASE_DSN = None
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 0))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 1800))
+    DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", 30))
+
+    # Páginas do portal (pages/) ficam sob este prefixo: "/" e "/login" são da API
+    WEB_URL_PREFIX = os.getenv("WEB_URL_PREFIX", "/web")
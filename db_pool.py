@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo limite do pool."""
+
+
+class ConnectionPool:
+    """Pool de conexões psycopg2 por processo (um por worker do gunicorn).
+
+    - mantém até ``max_size`` conexões abertas e aceita ``max_overflow``
+      conexões extras em picos, que são fechadas assim que devolvidas;
+    - descarta conexões quebradas e as que passaram de ``max_lifetime``;
+    - faz um ``SELECT 1`` antes de reutilizar conexões ociosas há mais de
+      ``health_check_after`` segundos;
+    - detecta fork (``--preload``) e não reaproveita sockets do processo pai.
+    """
+
+    def __init__(self, dsn=None, min_size=0, max_size=10, max_overflow=5, timeout=10.0,
+                 max_lifetime=1800.0, health_check_after=30.0, connection_factory=None):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.connection_factory = connection_factory
+
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def init_app(self, app):
+        """Configura o pool pelo ``app.config`` (DATABASE_DSN e DB_POOL_*).
+
+        Nenhuma conexão é aberta aqui: com ``--preload`` o processo pai não
+        fica com sockets abertos. As ``min_size`` iniciais são abertas pelo
+        ``prefill()`` no hook post_worker_init (gunicorn.conf.py), já no worker;
+        as demais, no primeiro uso.
+        """
+        cfg = app.config
+        dsn = cfg.get("DATABASE_DSN")
+        if dsn != self.dsn:
+            self.close()
+            self.dsn = dsn
+        self.min_size = cfg.get("DB_POOL_MIN_SIZE", self.min_size)
+        self.max_size = cfg.get("DB_POOL_MAX_SIZE", self.max_size)
+        self.max_overflow = cfg.get("DB_POOL_MAX_OVERFLOW", self.max_overflow)
+        self.timeout = cfg.get("DB_POOL_TIMEOUT", self.timeout)
+        self.max_lifetime = cfg.get("DB_POOL_MAX_LIFETIME", self.max_lifetime)
+        self.health_check_after = cfg.get("DB_POOL_HEALTH_CHECK_AFTER", self.health_check_after)
+        app.extensions["db_pool"] = self
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = deque()  # (conn, criada_em, devolvida_em)
+        self._born = {}       # id(conn) -> criada_em das conexões em uso
+        self._size = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "overflow": 0,
+            "created": 0,
+            "discarded": 0,
+            "failed_health_checks": 0,
+        }
+
+    # ---------- conexões ----------
+
+    def _connect(self):
+        if not self.dsn:
+            raise RuntimeError("pool sem DSN: defina DATABASE_URL com um banco PostgreSQL")
+        kwargs = {}
+        if self.connection_factory is not None:
+            kwargs["connection_factory"] = self.connection_factory
+        conn = psycopg2.connect(self.dsn, **kwargs)
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def _expired(self, born, now):
+        return self.max_lifetime and now - born > self.max_lifetime
+
+    def _healthy(self, conn, returned_at, now):
+        if conn.closed:
+            return False
+        if now - returned_at < self.health_check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._cond:
+                self._stats["failed_health_checks"] += 1
+            return False
+
+    def _check_fork(self):
+        # Chamado com o lock. Conexões herdadas do processo pai não podem ser
+        # fechadas aqui (o close encerraria o socket do pai): só esquecemos.
+        if self._pid != os.getpid():
+            _orphaned.extend(conn for conn, _, _ in self._idle)
+            self._reset_state()
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        waited_since = None
+        while True:
+            with self._cond:
+                self._check_fork()
+                if self._idle:
+                    conn, born, returned_at = self._idle.pop()
+                    create = False
+                elif self._size < self.max_size + self.max_overflow:
+                    self._size += 1
+                    if self._size > self.max_size:
+                        self._stats["overflow"] += 1
+                    create = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"pool esgotado ({self.max_size}+{self.max_overflow} conexões em uso)"
+                        )
+                    if waited_since is None:
+                        waited_since = time.monotonic()
+                        self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+                    continue
+
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                born = time.monotonic()
+            else:
+                now = time.monotonic()
+                if self._expired(born, now) or not self._healthy(conn, returned_at, now):
+                    self._discard(conn)
+                    continue
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+                if waited_since is not None:
+                    self._stats["wait_time"] += time.monotonic() - waited_since
+                self._born[id(conn)] = born
+            return conn
+
+    def _release(self, conn):
+        with self._cond:
+            born = self._born.pop(id(conn), None)
+            if self._pid != os.getpid() or born is None:
+                # conexão de outro processo/geração do pool
+                return
+
+        status = extensions.TRANSACTION_STATUS_UNKNOWN if conn.closed else conn.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._discard(conn)
+            return
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+
+        now = time.monotonic()
+        with self._cond:
+            keep = self._size <= self.max_size and not self._expired(born, now)
+            if keep:
+                self._idle.append((conn, born, now))
+                self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Empresta uma conexão e a devolve ao pool mesmo em caso de erro.
+
+        Transações não confirmadas com ``commit()`` são desfeitas na devolução.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    # ---------- administração ----------
+
+    def prefill(self):
+        """Abre ``min_size`` conexões de antemão (use depois do fork)."""
+        conns = []
+        try:
+            while len(conns) < self.min_size:
+                with self._cond:
+                    self._check_fork()
+                    if self._size >= self.min_size:
+                        break
+                conns.append(self._acquire())
+        finally:
+            for conn in conns:
+                self._release(conn)
+
+    def close(self):
+        with self._cond:
+            self._check_fork()
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            self._check_fork()
+            data = dict(self._stats)
+            data.update(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                max_size=self.max_size,
+                max_overflow=self.max_overflow,
+                pid=self._pid,
+            )
+        data["wait_time"] = round(data["wait_time"], 6)
+        return data
+
+
+# Conexões herdadas em um fork: mantidas vivas para não fechar o socket do pai.
+_orphaned = []
@@ -1,6 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 
+from db_pool import ConnectionPool
+
 db = SQLAlchemy()
 login_manager = LoginManager()
-login_manager.login_view = "auth.login"
\ No newline at end of file
+login_manager.login_view = "auth.login"
+# conexões psycopg2 da API do software (usuarios, manuais), configurado no create_app
+pool = ConnectionPool()
@@ -0,0 +1,16 @@
+# Lido automaticamente pelo gunicorn (diretório de trabalho do startCommand).
+
+
+def post_worker_init(worker):
+    """Abre as DB_POOL_MIN_SIZE conexões do pool da API já no worker.
+
+    Roda depois do fork e do app carregado (com ou sem --preload), antes da
+    primeira requisição: o pool nunca abre conexões no processo pai.
+    """
+    from extensions import pool
+
+    try:
+        pool.prefill()
+    except Exception:
+        # banco fora do ar na subida: o pool abre as conexões sob demanda
+        worker.log.exception("pool: falha ao abrir as conexões iniciais")
@@ -0,0 +1,99 @@
+import os
+
+from flask_login import UserMixin
+
+from cache import MemoryCache, cache
+from extensions import db, login_manager
+from models import User
+
+# Carregamento do current_user sem ir ao banco a cada requisição.
+#
+# A sessão guarda "id:versão" (User.get_id). A versão (User.session_version)
+# sobe a cada mudança de status/papel e fica também no cache compartilhado
+# (cache.cache), que todos os workers consultam: uma sessão com versão antiga
+# deixa de valer na hora, sem consulta ao banco. O retrato do usuário fica num
+# LRU por worker por USER_CACHE_TTL segundos.
+#
+# Com CACHE_BACKEND=memory a versão não é compartilhada entre workers: a
+# revogação vale na hora no worker que a fez e, nos demais, quando o retrato
+# expira.
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 300))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 1024))
+VERSION_TTL = 30 * 24 * 3600
+
+_identities = MemoryCache(max_entries=USER_CACHE_MAX_ENTRIES, default_ttl=USER_CACHE_TTL)
+
+
+def _version_key(user_id) -> str:
+    return f"user:versao:{user_id}"
+
+
+class CachedUser(UserMixin):
+    """Retrato somente-leitura do User, usado como current_user."""
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.nome = user.nome
+        self.email = user.email
+        self.status = user.status
+        self.role = user.role
+        self.session_version = user.session_version
+
+    def get_id(self):
+        return f"{self.id}:{self.session_version}"
+
+    def is_admin(self) -> bool:
+        return self.role == "ADMIN"
+
+
+def parse_session_id(value: str):
+    """(id, versão) da sessão, ou None para formatos antigos/inválidos."""
+    user_id, sep, version = (value or "").partition(":")
+    if not sep or not user_id.isdigit() or not version.isdigit():
+        return None
+    return int(user_id), int(version)
+
+
+@login_manager.user_loader
+def load_user(value: str):
+    parsed = parse_session_id(value)
+    if parsed is None:
+        return None
+    user_id, version = parsed
+
+    current = cache.get(_version_key(user_id))
+    if current is not None and current != version:
+        return None
+
+    identity = _identities.get(user_id)
+    if identity is not None and identity.session_version == version:
+        return identity
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    if current is None:
+        # TTL curto: se esta leitura perder a corrida para um publish_user,
+        # a versão velha não fica muito tempo no cache compartilhado
+        cache.set(_version_key(user_id), user.session_version, ttl=USER_CACHE_TTL)
+    if user.session_version != version or user.status != "ACTIVE":
+        return None
+
+    identity = CachedUser(user)
+    _identities.set(user_id, identity)
+    return identity
+
+
+def user_changed(user: User):
+    """Status/papel do usuário mudou: derruba as sessões abertas dele.
+
+    Chame antes do commit; a versão nova é publicada no cache depois dele.
+    """
+    user.session_version = (user.session_version or 0) + 1
+
+
+def publish_user(user: User):
+    """Depois do commit: publica a versão nova para todos os workers."""
+    _identities.delete(user.id)
+    cache.set(_version_key(user.id), user.session_version, ttl=VERSION_TTL)
@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import func, insert, update
+
+from extensions import db
+from models import ImportJob, ImportJobError
+from client_formats import RowReader, format_of
+from client_import import map_columns, upsert_clients
+from pagination import invalidate_counts
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 2))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+# Os jobs rodam em threads do worker: um restart (deploy, max-requests) os
+# mata no meio. Enquanto o processo vive, os jobs dele (na fila ou rodando)
+# têm o heartbeat_at renovado a cada IMPORT_HEARTBEAT_INTERVAL segundos; ao
+# ler o status, um job QUEUED/RUNNING sem heartbeat há IMPORT_STALE_AFTER
+# segundos é dado como interrompido (FAILED) e a tela para de acompanhar.
+IMPORT_HEARTBEAT_INTERVAL = float(os.getenv("IMPORT_HEARTBEAT_INTERVAL", 30))
+IMPORT_STALE_AFTER = float(os.getenv("IMPORT_STALE_AFTER", 180))
+STALE_MESSAGE = "Importação interrompida: o servidor reiniciou durante o processamento. Envie o arquivo de novo."
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+# jobs deste processo ainda não terminados: id -> app
+_active = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Um pool por processo: threads não sobrevivem ao fork dos workers do gunicorn
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+            _executor_pid = os.getpid()
+            _active.clear()
+            threading.Thread(target=_heartbeat_loop, name="import-heartbeat", daemon=True).start()
+        return _executor
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(IMPORT_HEARTBEAT_INTERVAL)
+        by_app = {}
+        with _executor_lock:
+            for job_id, app in _active.items():
+                by_app.setdefault(app, []).append(job_id)
+        for app, ids in by_app.items():
+            try:
+                with app.app_context():
+                    db.session.execute(
+                        update(ImportJob)
+                        .where(ImportJob.id.in_(ids), ImportJob.status.in_(("QUEUED", "RUNNING")))
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    db.session.commit()
+                    db.session.remove()
+            except Exception:
+                app.logger.exception("Falha ao renovar o heartbeat dos jobs de importação")
+
+
+def fail_if_stale(job: ImportJob) -> bool:
+    """Marca como FAILED o job na fila/rodando cujo processo morreu. True se marcou."""
+    if job.status not in ("QUEUED", "RUNNING"):
+        return False
+    with _executor_lock:
+        if job.id in _active and _executor_pid == os.getpid():
+            return False
+    limit = datetime.utcnow() - timedelta(seconds=IMPORT_STALE_AFTER)
+    # condicional no banco: um heartbeat renovado agora por outro worker vence
+    marked = db.session.execute(
+        update(ImportJob)
+        .where(
+            ImportJob.id == job.id,
+            ImportJob.status.in_(("QUEUED", "RUNNING")),
+            func.coalesce(ImportJob.heartbeat_at, ImportJob.created_at) < limit,
+        )
+        .values(status="FAILED", message=STALE_MESSAGE, finished_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if not marked:
+        return False
+    db.session.refresh(job)
+    try:
+        os.remove(job.file_path)
+    except OSError:
+        pass
+    return True
+
+
+def upload_dir() -> str:
+    path = current_app.config.get("IMPORT_UPLOAD_DIR") or os.path.join(current_app.instance_path, "imports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def create_job(file_storage, atualizar: bool) -> ImportJob:
+    """Grava o upload em disco, registra o job e o coloca na fila.
+
+    O formato (client_formats) sai da extensão do nome enviado.
+    """
+    job_id = uuid.uuid4().hex
+    path = os.path.join(upload_dir(), f"{job_id}.{format_of(file_storage.filename) or 'xlsx'}")
+    file_storage.save(path)
+
+    job = ImportJob(
+        id=job_id, filename=file_storage.filename, file_path=path, atualizar=atualizar,
+        heartbeat_at=datetime.utcnow(),
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    executor = _get_executor()
+    with _executor_lock:
+        _active[job_id] = app
+    executor.submit(run_job, app, job_id)
+    return job
+
+
+def _save_rejected(job_id, rejected):
+    if not rejected:
+        return
+    db.session.execute(insert(ImportJobError), [
+        {
+            "job_id": job_id,
+            "line": line,
+            "reason": reason,
+            "raw_values": json.dumps(list(values or ()), default=str, ensure_ascii=False),
+        }
+        for line, reason, values in rejected
+    ])
+
+
+def run_job(app, job_id: str):
+    """Lê o arquivo (xlsx, csv ou jsonl) em streaming e grava em lotes, com
+    commit a cada lote.
+
+    Um lote que falha ao gravar é desfeito sozinho: suas linhas viram erro
+    e o job segue para o próximo.
+    """
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        job.status = "RUNNING"
+        job.heartbeat_at = datetime.utcnow()
+        path = job.file_path
+        db.session.commit()
+
+        reader = None
+        try:
+            reader = RowReader(path)
+            rows = iter(reader)
+            header = next(rows, None)
+            if header is None:
+                raise ValueError("Planilha vazia.")
+
+            col, missing = map_columns(header)
+            if missing:
+                raise ValueError("Colunas obrigatórias não encontradas: " + ", ".join(missing))
+
+            job.total_rows = reader.total_rows
+            db.session.commit()
+
+            line = 2
+            while True:
+                chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                try:
+                    stats = upsert_clients(db.session, chunk, col, job.atualizar, first_line=line)
+                    _save_rejected(job_id, stats.rejected)
+                except Exception:
+                    db.session.rollback()
+                    job = db.session.get(ImportJob, job_id)
+                    _save_rejected(job_id, [
+                        (n, "falha ao gravar o lote no banco de dados", r)
+                        for n, r in enumerate(chunk, start=line)
+                    ])
+                    job.errors += len(chunk)
+                else:
+                    job.inserted += stats.inserted
+                    job.updated += stats.updated
+                    job.skipped += stats.skipped
+                    job.errors += stats.errors
+                job.processed_rows += len(chunk)
+                job.heartbeat_at = datetime.utcnow()
+                db.session.commit()
+                invalidate_counts()
+                line += len(chunk)
+
+            job.status = "DONE"
+            job.message = (
+                f"Importação concluída. Inseridos: {job.inserted} | Atualizados: {job.updated} | "
+                f"Duplicados ignorados: {job.skipped} | Linhas com erro: {job.errors}"
+            )
+        except Exception as e:
+            if not isinstance(e, ValueError):
+                current_app.logger.exception("Falha no job de importação %s", job_id)
+            db.session.rollback()
+            job = db.session.get(ImportJob, job_id)
+            job.status = "FAILED"
+            job.message = str(e) if isinstance(e, ValueError) else "Falha ao importar: erro ao gravar no banco de dados."
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            db.session.remove()
+            with _executor_lock:
+                _active.pop(job_id, None)
+            if reader is not None:
+                reader.close()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,488 @@
+import atexit
+import contextvars
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+from flask import current_app, g, request
+from psycopg2 import extensions as pg_extensions
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from cache import private_directory
+
+# Medição de requisições e consultas, exposta em /metrics (formato Prometheus).
+#
+# - latência por endpoint (histograma);
+# - por requisição: quantas consultas e quanto tempo no banco, somando o
+#   SQLAlchemy (eventos do Engine) e os cursores psycopg2 do pool da API
+#   (InstrumentedConnection);
+# - N+1: a mesma consulta (literais trocados por ?) repetida
+#   N_PLUS_ONE_THRESHOLD vezes numa requisição gera um aviso no log e conta
+#   em portal_n_plus_one_total;
+# - profiler por amostragem (opcional, PROFILE_SLOW_MS): uma thread lê a pilha
+#   das requisições em andamento a cada PROFILE_INTERVAL_MS e, se a requisição
+#   passar de PROFILE_SLOW_MS, grava as pilhas em PROFILE_DIR no formato
+#   "folded" (flamegraph.pl, speedscope, inferno).
+#
+# Cada worker do gunicorn mede o seu tráfego e grava um retrato em
+# METRICS_DIR a cada METRICS_FLUSH_INTERVAL segundos; o /metrics soma os
+# retratos de todos os workers da máquina (METRICS_DIR vazio: só o worker
+# que atendeu). Respostas em streaming (exportação) são medidas até a view
+# devolver a resposta, não até o último byte. METRICS_DIR é privado (0700,
+# do usuário do processo, como o do cache.py), e o retrato de um worker que
+# já morreu sai da soma e do diretório.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "")
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"portal-fiscal-metrics-{os.getuid()}"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 10))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 0))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "portal-fiscal-profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 200))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+# ---------- registro de métricas ----------
+
+class Registry:
+    """Contadores e histogramas do processo, com rótulos fixos por métrica."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}    # nome -> (tipo, ajuda, rótulos, buckets)
+        self._values = {}  # nome -> {valores_dos_rótulos: contador | [buckets..., soma, total]}
+
+    def counter(self, name, help_text, labels=()):
+        self._meta[name] = ("counter", help_text, tuple(labels), None)
+        self._values[name] = {}
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self._meta[name] = ("histogram", help_text, tuple(labels), tuple(buckets))
+        self._values[name] = {}
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            series = self._values[name]
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = self._meta[name][3]
+        with self._lock:
+            series = self._values[name]
+            data = series.get(labels)
+            if data is None:
+                data = series[labels] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: [[list(labels), value if not isinstance(value, list) else list(value)]
+                       for labels, value in series.items()]
+                for name, series in self._values.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            for series in self._values.values():
+                series.clear()
+
+    def render(self, snapshots) -> str:
+        """Texto no formato de exposição do Prometheus, somando os retratos."""
+        merged = {name: {} for name in self._meta}
+        for snap in snapshots:
+            for name, series in snap.items():
+                if name not in merged:
+                    continue
+                target = merged[name]
+                for labels, value in series:
+                    key = tuple(labels)
+                    if isinstance(value, list):
+                        acc = target.setdefault(key, [0] * len(value))
+                        for i, v in enumerate(value):
+                            acc[i] += v
+                    else:
+                        target[key] = target.get(key, 0) + value
+
+        lines = []
+        for name, (kind, help_text, label_names, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(merged[name].items()):
+                pairs = list(zip(label_names, labels))
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                    continue
+                for bound, count in zip(buckets + ("+Inf",), value[:len(buckets)] + [value[-1]]):
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', le)])} {count}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(pairs)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+registry.histogram("portal_http_request_duration_seconds", "Latência das requisições por endpoint.",
+                   ("endpoint", "method", "status"))
+registry.histogram("portal_db_queries_per_request", "Consultas ao banco por requisição.",
+                   ("endpoint",), QUERY_COUNT_BUCKETS)
+registry.histogram("portal_db_time_per_request_seconds", "Tempo no banco por requisição.",
+                   ("endpoint",))
+registry.counter("portal_db_queries_total", "Consultas ao banco feitas em requisições.",
+                 ("endpoint", "driver"))
+registry.counter("portal_n_plus_one_total", "Requisições com a mesma consulta repetida (N+1).",
+                 ("endpoint",))
+registry.counter("portal_profiles_total", "Perfis de requisições lentas gravados.", ("endpoint",))
+
+
+# ---------- consultas da requisição em andamento ----------
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "by_driver", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.by_driver = Counter()
+        self.statements = Counter()
+
+
+_current = contextvars.ContextVar("portal_request_stats", default=None)
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement) -> str:
+    """Consulta sem literais e listas de IN, para agrupar repetições."""
+    if isinstance(statement, bytes):
+        statement = statement.decode("utf-8", "replace")
+    text = " ".join(str(statement).split())
+    text = _LITERAL_RE.sub("?", text)
+    return _IN_LIST_RE.sub("(?)", text)
+
+
+def record_query(statement, elapsed: float, driver: str):
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_time += elapsed
+    stats.by_driver[driver] += 1
+    stats.statements[normalize_sql(statement)] += 1
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("portal_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("portal_query_start")
+    if starts:
+        record_query(statement, time.perf_counter() - starts.pop(), "sqlalchemy")
+
+
+_timed_cursors = {}
+_timed_cursors_lock = threading.Lock()
+
+
+def timed_cursor_class(base):
+    """Subclasse de ``base`` (cursor, RealDictCursor, ...) que mede execute()."""
+    cls = _timed_cursors.get(base)
+    if cls is not None:
+        return cls
+
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            t0 = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                record_query(query, time.perf_counter() - t0, "psycopg2")
+
+        def executemany(self, query, vars_list):
+            t0 = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                record_query(query, time.perf_counter() - t0, "psycopg2")
+
+    TimedCursor.__name__ = TimedCursor.__qualname__ = "Timed" + base.__name__
+    with _timed_cursors_lock:
+        return _timed_cursors.setdefault(base, TimedCursor)
+
+
+class InstrumentedConnection(pg_extensions.connection):
+    """Conexão psycopg2 cujos cursores (de qualquer cursor_factory) são medidos."""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or pg_extensions.cursor
+        kwargs["cursor_factory"] = timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+# ---------- profiler por amostragem ----------
+
+class SamplingProfiler:
+    """Amostra as pilhas das threads registradas (uma thread por processo)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active = {}  # ident da thread -> Counter de pilhas
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_thread(self):
+        # thread não sobrevive ao fork dos workers: uma por processo
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._active = {}
+            threading.Thread(target=self._run, name="profiler", daemon=True).start()
+
+    def start(self):
+        with self._lock:
+            self._ensure_thread()
+            self._active[threading.get_ident()] = Counter()
+
+    def stop(self) -> Counter:
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None) or Counter()
+
+    def _run(self):
+        me = os.getpid()
+        while self._pid == me:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, stacks in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[fold_stack(frame)] += 1
+
+
+def fold_stack(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def write_profile(endpoint: str, elapsed: float, stacks: Counter, directory=PROFILE_DIR):
+    """Grava as pilhas no formato folded ("a;b;c N" por linha). Devolve o caminho."""
+    if not stacks:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    if len(os.listdir(directory)) >= PROFILE_MAX_FILES:
+        return None
+    name = "{}-{}-{}-{}ms.folded".format(
+        datetime.now().strftime("%Y%m%d-%H%M%S"), os.getpid(),
+        re.sub(r"[^\w.-]", "_", endpoint), int(elapsed * 1000),
+    )
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000)
+
+
+# ---------- retratos dos workers ----------
+
+_last_flush = {"pid": None, "at": 0.0}
+_dir_checked = {"ok": False}
+_SNAPSHOT_RE = re.compile(r"metrics-(\d+)\.json")
+
+
+def _snapshot_path(pid=None) -> str:
+    return os.path.join(METRICS_DIR, f"metrics-{pid or os.getpid()}.json")
+
+
+def _metrics_dir():
+    """Confere METRICS_DIR uma vez por processo (cache.private_directory)."""
+    if not _dir_checked["ok"]:
+        if not private_directory(METRICS_DIR):
+            # estava aberto a outros usuários: os retratos nele não são confiáveis
+            for name in os.listdir(METRICS_DIR):
+                if name.startswith("metrics-"):
+                    _remove(os.path.join(METRICS_DIR, name))
+        _dir_checked["ok"] = True
+    return METRICS_DIR
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def flush(force=False):
+    """Grava o retrato deste processo em METRICS_DIR (no máximo a cada intervalo)."""
+    if not METRICS_DIR:
+        return
+    now = time.monotonic()
+    if not force and _last_flush["pid"] == os.getpid() and now - _last_flush["at"] < METRICS_FLUSH_INTERVAL:
+        return
+    _last_flush.update(pid=os.getpid(), at=now)
+    fd, tmp = tempfile.mkstemp(dir=_metrics_dir(), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp, _snapshot_path())
+    except BaseException:
+        _remove(tmp)
+        raise
+
+
+def collect_snapshots() -> list:
+    """Retrato deste processo + os gravados pelos outros workers vivos.
+
+    O retrato de um pid que não existe mais (worker reiniciado) é apagado.
+    """
+    snapshots = [registry.snapshot()]
+    if not METRICS_DIR:
+        return snapshots
+    directory = _metrics_dir()
+    for name in os.listdir(directory):
+        m = _SNAPSHOT_RE.fullmatch(name)
+        if not m or int(m.group(1)) == os.getpid():
+            continue
+        path = os.path.join(directory, name)
+        if not _pid_alive(int(m.group(1))):
+            _remove(path)
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def render_metrics(pool=None) -> str:
+    text = registry.render(collect_snapshots())
+    if pool is not None:
+        # estado do pool psycopg2 é do worker que respondeu
+        pid = os.getpid()
+        lines = []
+        for key, value in pool.stats().items():
+            if key in ("pid", "max_size", "max_overflow"):
+                continue
+            name = f"portal_db_pool_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f'{name}{{pid="{pid}"}} {_number(value)}')
+        text += "\n".join(lines) + "\n"
+    return text
+
+
+# ---------- ganchos do Flask ----------
+
+def _before_request():
+    g._instr_started = time.perf_counter()
+    _current.set(RequestStats())
+    g._instr_done = False
+    if PROFILE_SLOW_MS:
+        profiler.start()
+
+
+def _finish(status: int):
+    if getattr(g, "_instr_done", True):
+        return
+    g._instr_done = True
+    elapsed = time.perf_counter() - g._instr_started
+    stats = _current.get()
+    _current.set(None)
+    endpoint = request.endpoint or "sem_rota"
+
+    registry.observe("portal_http_request_duration_seconds", (endpoint, request.method, str(status)), elapsed)
+    registry.observe("portal_db_queries_per_request", (endpoint,), stats.queries)
+    registry.observe("portal_db_time_per_request_seconds", (endpoint,), stats.db_time)
+    for driver, n in stats.by_driver.items():
+        registry.inc("portal_db_queries_total", (endpoint, driver), n)
+
+    repeated = [(sql, n) for sql, n in stats.statements.items() if n >= N_PLUS_ONE_THRESHOLD]
+    if repeated:
+        registry.inc("portal_n_plus_one_total", (endpoint,))
+        sql, n = max(repeated, key=lambda item: item[1])
+        current_app.logger.warning("Possível N+1 em %s: consulta repetida %d vezes: %s", endpoint, n, sql[:300])
+
+    if PROFILE_SLOW_MS:
+        stacks = profiler.stop()
+        if elapsed * 1000 >= PROFILE_SLOW_MS and write_profile(endpoint, elapsed, stacks):
+            registry.inc("portal_profiles_total", (endpoint,))
+    flush()
+
+
+def _after_request(response):
+    _finish(response.status_code)
+    return response
+
+
+def _teardown_request(exc):
+    # só chega aqui sem ter passado pelo after_request se a view levantou erro
+    _finish(500)
+
+
+def init_app(app, pool=None):
+    """Liga a medição no app e nos cursores do ``pool`` psycopg2 (se houver)."""
+    if not app.config.get("METRICS_ENABLED", METRICS_ENABLED):
+        return
+    if pool is not None and pool.connection_factory is None:
+        pool.connection_factory = InstrumentedConnection
+    if METRICS_DIR:
+        _metrics_dir()  # diretório de outro usuário impede a subida
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    atexit.register(flush, True)
+    app.extensions["instrumentation"] = registry
+
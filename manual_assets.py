@@ -0,0 +1,150 @@
+import base64
+import binascii
+import hashlib
+import re
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Client, ManualAsset
+from manual_revisions import build_revision, content_hash
+from manual_sections import dump_toc
+
+# Imagens e GIFs colados no editor chegam como data URIs base64 dentro do HTML.
+# Ao salvar, cada uma vira um registro em manual_asset, endereçado pelo SHA-256
+# do conteúdo (a mesma imagem em vários manuais é guardada uma vez só), e o
+# src passa a apontar para /manual/assets/<hash>.
+
+ASSET_URL_PREFIX = "/manual/assets/"
+
+# SVG fica de fora: servido pela nossa origem, poderia executar script
+ALLOWED_MIME_TYPES = {
+    "image/png",
+    "image/jpeg",
+    "image/jpg",
+    "image/gif",
+    "image/webp",
+    "image/bmp",
+}
+
+_DATA_URI_RE = re.compile(
+    r"""(?P<attr>\bsrc\s*=\s*)(?P<q>["'])data:(?P<mime>[\w.+-]+/[\w.+-]+);base64,(?P<data>[A-Za-z0-9+/=\s]*)(?P=q)""",
+    re.IGNORECASE,
+)
+
+_HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def is_asset_hash(value: str) -> bool:
+    return bool(_HASH_RE.fullmatch(value or ""))
+
+
+def asset_url(sha256: str) -> str:
+    return ASSET_URL_PREFIX + sha256
+
+
+def _store(session, assets: dict):
+    """Grava os blobs que ainda não existem. ``assets``: {sha256: (mime, bytes)}."""
+    if not assets:
+        return
+    rows = [
+        {"sha256": h, "mime_type": mime, "size": len(data), "data": data}
+        for h, (mime, data) in assets.items()
+    ]
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(ManualAsset).on_conflict_do_nothing(index_elements=[ManualAsset.sha256])
+        session.execute(stmt, rows)
+        return
+
+    present = set(session.scalars(select(ManualAsset.sha256).where(ManualAsset.sha256.in_(list(assets)))))
+    new = [r for r in rows if r["sha256"] not in present]
+    if new:
+        session.execute(insert(ManualAsset), new)
+
+
+def externalize_media(session, html: str):
+    """Troca as imagens embutidas (data URIs) do HTML por URLs do repositório.
+
+    Devolve (html_reescrito, hashes_referenciados). Data URIs inválidas ou de
+    tipos fora de ALLOWED_MIME_TYPES ficam como estão. Quem chama faz o commit.
+    """
+    if not html or "data:" not in html:
+        return html, []
+
+    found = {}
+
+    def replace(m):
+        mime = m.group("mime").lower()
+        if mime not in ALLOWED_MIME_TYPES:
+            return m.group(0)
+        try:
+            data = base64.b64decode(re.sub(r"\s+", "", m.group("data")), validate=True)
+        except (binascii.Error, ValueError):
+            return m.group(0)
+        if not data:
+            return m.group(0)
+        sha256 = hashlib.sha256(data).hexdigest()
+        found.setdefault(sha256, ("image/jpeg" if mime == "image/jpg" else mime, data))
+        return f'{m.group("attr")}{m.group("q")}{asset_url(sha256)}{m.group("q")}'
+
+    html = _DATA_URI_RE.sub(replace, html)
+    _store(session, found)
+    return html, list(found)
+
+
+def migrate_manuals(session, batch_size: int = 50, log=None):
+    """Converte os manuais já gravados com mídia embutida. Commit a cada lote.
+
+    Cada conversão é uma revisão nova do manual, gravada como o save_manual
+    faz: UPDATE condicional na revisão lida (manual_revision + 1) e revisão
+    completa no histórico. Assim um editor aberto antes da conversão recebe
+    409 em vez de aplicar o trecho dele sobre o HTML reescrito. Se alguém
+    salvou o manual entre a leitura e a gravação, ele fica como está e entra
+    na próxima execução.
+
+    Devolve (manuais_convertidos, imagens_extraídas, manuais_pulados).
+    """
+    ids = session.scalars(
+        select(Client.id)
+        .where(Client.manual_content.like("%data:%;base64,%"))
+        .order_by(Client.id)
+    ).all()
+
+    converted = extracted = skipped = 0
+    for i in range(0, len(ids), batch_size):
+        for client_id in ids[i:i + batch_size]:
+            row = session.execute(
+                select(Client.manual_content, Client.manual_revision).where(Client.id == client_id)
+            ).one()
+            html, hashes = externalize_media(session, row.manual_content)
+            if not hashes:
+                continue
+            revision = row.manual_revision + 1
+            claimed = session.execute(
+                update(Client)
+                .where(Client.id == client_id, Client.manual_revision == row.manual_revision)
+                .values(
+                    manual_content=html,
+                    manual_hash=content_hash(html),
+                    manual_revision=revision,
+                    manual_toc=dump_toc(html),  # posições mudaram
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not claimed:
+                skipped += 1
+                continue
+            if row.manual_revision == 0:
+                # conteúdo anterior ao histórico: vira a revisão 0, como no save_manual
+                session.add(build_revision(client_id, 0, None, row.manual_content))
+            session.add(build_revision(client_id, revision, None, html))
+            converted += 1
+            extracted += len(hashes)
+        session.commit()
+        # libera o HTML antigo da memória antes do próximo lote
+        session.expunge_all()
+        if log:
+            log(f"{min(i + batch_size, len(ids))}/{len(ids)} manuais verificados")
+    return converted, extracted, skipped
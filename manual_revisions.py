@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import zlib
+from difflib import SequenceMatcher
+
+from sqlalchemy import select
+
+from models import ManualRevision
+
+# Histórico dos manuais: cada "Salvar" gera uma revisão compactada (zlib).
+# A cada MANUAL_KEYFRAME_INTERVAL revisões guardamos o HTML completo; nas
+# demais só a diferença para a revisão anterior, calculada sobre o HTML
+# quebrado em tags e textos. Para remontar uma revisão: último HTML completo
+# até ela + as diferenças seguintes.
+KEYFRAME_INTERVAL = int(os.getenv("MANUAL_KEYFRAME_INTERVAL", 20))
+
+_TOKEN_RE = re.compile(r"(<[^>]*>)")
+
+
+def content_hash(html: str) -> str:
+    return hashlib.sha256((html or "").encode("utf-8")).hexdigest()
+
+
+def tokenize(html: str) -> list:
+    return [t for t in _TOKEN_RE.split(html or "") if t]
+
+
+def diff(old: str, new: str) -> list:
+    """Operações que levam de ``old`` a ``new``.
+
+    Cada item é [i, j] (copia os tokens i:j de ``old``) ou um texto a inserir.
+    """
+    a, b = tokenize(old), tokenize(new)
+
+    # prefixo e sufixo comuns saem de graça; o SequenceMatcher fica só com o miolo
+    start = 0
+    limit = min(len(a), len(b))
+    while start < limit and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < limit - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+
+    ops = []
+    if start:
+        ops.append([0, start])
+    matcher = SequenceMatcher(None, a[start:len(a) - end], b[start:len(b) - end])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([start + i1, start + i2])
+        elif j2 > j1:
+            ops.append("".join(b[start + j1:start + j2]))
+    if end:
+        ops.append([len(a) - end, len(a)])
+    return ops
+
+
+def patch(old: str, ops: list) -> str:
+    a = tokenize(old)
+    return "".join("".join(a[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def _pack(obj) -> bytes:
+    raw = obj if isinstance(obj, str) else json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(raw.encode("utf-8"), 6)
+
+
+def _unpack(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def build_revision(client_id: int, revision: int, old: str, new: str, author_id=None) -> ManualRevision:
+    """Revisão ``revision`` com o conteúdo ``new``.
+
+    ``old`` é o conteúdo da revisão anterior; None quando ela não está no
+    histórico (aí a revisão é guardada completa).
+    """
+    full = _pack(new or "")
+    kind, data = "full", full
+    if old is not None and (revision - 1) % KEYFRAME_INTERVAL:
+        delta = _pack(diff(old, new or ""))
+        if len(delta) < len(full):
+            kind, data = "diff", delta
+    return ManualRevision(
+        client_id=client_id,
+        revision=revision,
+        kind=kind,
+        content_hash=content_hash(new),
+        size=len((new or "").encode("utf-8")),
+        data=data,
+        author_id=author_id,
+    )
+
+
+def load_revision(session, client_id: int, revision: int):
+    """HTML de uma revisão, ou None se ela não existir."""
+    keyframe = session.scalar(
+        select(ManualRevision.revision)
+        .where(
+            ManualRevision.client_id == client_id,
+            ManualRevision.kind == "full",
+            ManualRevision.revision <= revision,
+        )
+        .order_by(ManualRevision.revision.desc())
+        .limit(1)
+    )
+    if keyframe is None:
+        return None
+
+    rows = session.execute(
+        select(ManualRevision.revision, ManualRevision.kind, ManualRevision.data)
+        .where(
+            ManualRevision.client_id == client_id,
+            ManualRevision.revision.between(keyframe, revision),
+        )
+        .order_by(ManualRevision.revision.asc())
+    ).all()
+    if not rows or rows[-1].revision != revision:
+        return None
+
+    html = None
+    for row in rows:
+        text = _unpack(row.data)
+        html = text if row.kind == "full" else patch(html, json.loads(text))
+    return html
+
+
+def apply_splice(base: str, splice: dict) -> str:
+    """Aplica um trecho enviado pelo editor: troca base[inicio:fim] por texto.
+
+    As posições vêm do JavaScript, em unidades UTF-16.
+    """
+    start, end, text = splice["inicio"], splice["fim"], splice["texto"]
+    if not (isinstance(start, int) and isinstance(end, int) and isinstance(text, str)):
+        raise ValueError("trecho inválido")
+    units = (base or "").encode("utf-16-le", "surrogatepass")
+    if not 0 <= start <= end <= len(units) // 2:
+        raise ValueError("trecho fora do conteúdo")
+    merged = units[:2 * start] + text.encode("utf-16-le", "surrogatepass") + units[2 * end:]
+    try:
+        return merged.decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise ValueError("trecho inválido")
@@ -0,0 +1,139 @@
+import html as html_lib
+import json
+import re
+
+from sqlalchemy import func, select
+
+from models import Client
+
+# Manual dividido em seções para a página do cliente: cada título (h1–h3)
+# começa uma seção, e trechos longos sem título são quebrados no fim de um
+# bloco depois de SECTION_MAX_CHARS. O índice (manual_toc) guarda só posições
+# e títulos: a página monta a navegação com ele e busca o HTML de cada seção
+# sob demanda, lendo do banco só o pedaço pedido (substr). O índice é gravado
+# junto com o manual; se ele mudar entre a leitura do índice e a do trecho, a
+# revisão lida com o trecho denuncia e a leitura recomeça.
+#
+# O editor (Quill) grava títulos sempre no primeiro nível do documento; em HTML
+# antigo com títulos dentro de outros blocos, o navegador fecha as tags soltas.
+
+# mude junto com uma migração que recalcule manual_toc (como a 10)
+TOC_VERSION = 1
+SECTION_MAX_CHARS = 32 * 1024
+
+_HEADING_RE = re.compile(r"<h([1-3])\b[^>]*>(.*?)</h\1\s*>", re.IGNORECASE | re.DOTALL)
+_BLOCK_END_RE = re.compile(r"</(?:p|ol|ul|pre|blockquote|h[1-6]|div|table)\s*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]*>")
+_IMG_RE = re.compile(r"<img\b(?![^>]*\bloading=)", re.IGNORECASE)
+
+
+def heading_text(fragment: str) -> str:
+    text = html_lib.unescape(_TAG_RE.sub("", fragment))
+    return " ".join(text.split())
+
+
+def _split_long(start: int, end: int, content: str):
+    """Quebra [start, end) em pedaços de ~SECTION_MAX_CHARS no fim de blocos."""
+    while end - start > SECTION_MAX_CHARS:
+        m = _BLOCK_END_RE.search(content, start + SECTION_MAX_CHARS, end)
+        if not m or m.end() >= end:
+            break
+        yield start, m.end()
+        start = m.end()
+    yield start, end
+
+
+def build_toc(content: str) -> dict:
+    """Índice do manual: {"v": versão, "secoes": [{inicio, fim, nivel, titulo}]}.
+
+    Posições em caracteres do HTML gravado. Seções sem título (a introdução
+    antes do primeiro título e as continuações de seções longas) têm nivel 0
+    e titulo None.
+    """
+    content = content or ""
+    heads = list(_HEADING_RE.finditer(content))
+    bounds = [(0, 0, None)] if not heads or heads[0].start() > 0 else []
+    bounds += [(m.start(), int(m.group(1)), heading_text(m.group(2))) for m in heads]
+
+    sections = []
+    for i, (start, level, title) in enumerate(bounds):
+        end = bounds[i + 1][0] if i + 1 < len(bounds) else len(content)
+        if start == end:
+            continue
+        for n, (a, b) in enumerate(_split_long(start, end, content)):
+            sections.append({
+                "inicio": a,
+                "fim": b,
+                "nivel": level if n == 0 else 0,
+                "titulo": title if n == 0 else None,
+            })
+    return {"v": TOC_VERSION, "secoes": sections}
+
+
+def dump_toc(content: str) -> str:
+    return json.dumps(build_toc(content), separators=(",", ":"), ensure_ascii=False)
+
+
+def load_toc(raw):
+    """Índice gravado, ou None se ausente/de versão antiga (precisa recalcular)."""
+    if not raw:
+        return None
+    try:
+        toc = json.loads(raw)
+    except ValueError:
+        return None
+    return toc if isinstance(toc, dict) and toc.get("v") == TOC_VERSION else None
+
+
+def read_toc(session, client_id: int):
+    """(revisão, hash, índice) do manual, lidos na mesma consulta; None se o cliente não existe.
+
+    O índice é gravado por quem grava o manual (save_manual, migração 10).
+    Sem ele (ou de versão antiga), é calculado na memória a partir do
+    conteúdo lido junto com a revisão, sem gravar nada.
+    """
+    row = session.execute(
+        select(Client.manual_toc, Client.manual_revision, Client.manual_hash).where(Client.id == client_id)
+    ).one_or_none()
+    if row is None:
+        return None
+    toc = load_toc(row.manual_toc)
+    if toc is not None:
+        return row.manual_revision, row.manual_hash, toc
+
+    row = session.execute(
+        select(Client.manual_content, Client.manual_revision, Client.manual_hash).where(Client.id == client_id)
+    ).one()
+    return row.manual_revision, row.manual_hash, build_toc(row.manual_content)
+
+
+def lazy_images(fragment: str) -> str:
+    return _IMG_RE.sub('<img loading="lazy" decoding="async"', fragment)
+
+
+def load_sections(session, client_id: int, revision: int, sections: list, first: int, last: int):
+    """HTML das seções first..last (inclusive), lendo só esse trecho do banco.
+
+    O trecho e a revisão saem da mesma consulta: se o manual mudou depois do
+    índice (revision), as posições não valem mais e devolve None.
+    """
+    if first < 0 or last < first:
+        return []
+    chosen = sections[first:last + 1]
+    if not chosen:
+        return []
+    start, end = chosen[0]["inicio"], chosen[-1]["fim"]
+    row = session.execute(
+        select(func.substr(Client.manual_content, start + 1, end - start), Client.manual_revision)
+        .where(Client.id == client_id)
+    ).one_or_none()
+    if row is None or row.manual_revision != revision:
+        return None
+    text = row[0] or ""
+    return [
+        {
+            "indice": first + i,
+            "html": lazy_images(text[s["inicio"] - start:s["fim"] - start]),
+        }
+        for i, s in enumerate(chosen)
+    ]
@@ -0,0 +1,430 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+import client_search
+import manual_sections
+import normalization
+
+# Migrações versionadas do banco, numa sequência única para os dois lados:
+# - "portal": tabelas dos models (SQLAlchemy, db.engine), PostgreSQL ou SQLite;
+# - "api": tabelas cruas do software de licenças (usuarios, manuais...),
+#   criadas pelo psycopg2 (extensions.pool), só PostgreSQL.
+# Cada banco guarda as versões aplicadas em schema_migrations; uma migração
+# roda na sua própria transação, junto com o registro da versão. Todas são
+# idempotentes (IF NOT EXISTS, colunas conferidas antes do ALTER): um banco
+# criado antes deste módulo passa por elas sem erro e só ganha o que falta.
+# No PostgreSQL um advisory lock impede dois deploys migrando ao mesmo tempo.
+#
+# Uma migração que não se aplica ao banco agora (ex.: SQLite sem FTS5) levanta
+# SkipMigration: nada dela fica gravado, nem a versão, e ela roda de novo no
+# próximo upgrade. Qualquer outro erro interrompe o upgrade.
+#
+# Para mudar o schema: acrescente uma Migration no fim de MIGRATIONS (nunca
+# altere uma que já foi aplicada) e, quando for dos models, o mesmo em models.py.
+
+MIGRATIONS_TABLE = "schema_migrations"
+ADVISORY_LOCK_KEY = 7_311_402  # qualquer inteiro fixo, só deste app
+
+log = logging.getLogger(__name__)
+
+_CREATE_MIGRATIONS_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+)
+"""
+
+
+class SkipMigration(Exception):
+    """A migração não se aplica a este banco agora; fica pendente."""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    target: str  # "portal" ou "api"
+    # portal: up(conn) com uma Connection do SQLAlchemy; api: up(cursor) do psycopg2
+    up: Callable
+
+
+# ---------- portal (models) ----------
+
+def _portal_tables(conn):
+    from extensions import db
+
+    db.metadata.create_all(conn)
+
+
+def _add_column(conn, table: str, column: str, ddl: str):
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}')
+
+
+def _session_and_manual_columns(conn):
+    # colunas que entraram nos models depois das tabelas existirem
+    _add_column(conn, "user", "session_version", "INTEGER NOT NULL DEFAULT 1")
+    _add_column(conn, "client", "manual_revision", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "client", "manual_hash", "VARCHAR(64)")
+    _add_column(conn, "client", "manual_toc", "TEXT")
+
+
+def _sqlite_has_fts5(conn) -> bool:
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            conn.exec_driver_sql("DROP TABLE temp.fts5_probe")
+    except OperationalError as e:
+        if "no such module" in str(e):
+            return False
+        raise
+    return True
+
+
+def _client_search(conn):
+    # SQLite compilado sem FTS5: a busca fica no ILIKE (client_search) e a
+    # migração fica pendente. Sem permissão para o DDL, o upgrade falha.
+    if conn.dialect.name == "sqlite" and not _sqlite_has_fts5(conn):
+        raise SkipMigration("SQLite sem FTS5: busca de clientes por ILIKE")
+    client_search.create_structures(conn)
+
+
+def _hot_path_indexes(conn):
+    # admin.pending_users: WHERE status = 'PENDING' ORDER BY created_at DESC.
+    # Parcial: só as contas pendentes (poucas) entram no índice.
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_user_pending_created_at ON "user" (created_at) '
+        "WHERE status = 'PENDING'"
+    )
+    # manual.index com filtro de regime: igualdade + paginação por (razao_social, id)
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_client_regime_razao_social_id "
+        "ON client (regime_tributario, razao_social, id)"
+    )
+
+
+def _canonical_regimes(conn):
+    # O filtro de regime vira igualdade com o nome canônico (normalization):
+    # os valores gravados antes do cadastro normalizado passam para ele.
+    for (value,) in conn.exec_driver_sql("SELECT DISTINCT regime_tributario FROM client").all():
+        canonical = normalization.canonical_regime(value)
+        if canonical and canonical != value:
+            conn.execute(
+                text("UPDATE client SET regime_tributario = :novo WHERE regime_tributario = :velho"),
+                {"novo": canonical, "velho": value},
+            )
+
+
+def _import_job_heartbeat(conn):
+    _add_column(conn, "import_job", "heartbeat_at", "TIMESTAMP")
+
+
+def _manual_tocs(conn):
+    # O índice de seções é gravado junto com o manual (save_manual); os manuais
+    # gravados antes disso ganham o seu aqui, um por vez (podem ter megabytes).
+    ids = conn.exec_driver_sql("SELECT id FROM client WHERE manual_toc IS NULL ORDER BY id").scalars().all()
+    for client_id in ids:
+        content = conn.execute(
+            text("SELECT manual_content FROM client WHERE id = :id"), {"id": client_id}
+        ).scalar()
+        conn.execute(
+            text("UPDATE client SET manual_toc = :toc WHERE id = :id"),
+            {"toc": manual_sections.dump_toc(content), "id": client_id},
+        )
+
+
+def _client_name_index(conn):
+    # manual.index ordena e pagina por (razao_social, id); o create_all da
+    # migração 1 não cria índices em tabelas que já existiam
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_client_razao_social_id ON client (razao_social, id)")
+
+
+# ---------- api (psycopg2) ----------
+
+def _api_tables(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id SERIAL PRIMARY KEY,
+        nome TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE,
+        empresa TEXT,
+        plano TEXT,
+        senha TEXT,
+        status TEXT DEFAULT 'pendente',
+        id_maquina TEXT,
+        logado INTEGER DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS manuais (
+        id SERIAL PRIMARY KEY,
+        titulo TEXT NOT NULL,
+        descricao TEXT,
+        url_gif TEXT,
+        url_pdf TEXT,
+        categoria TEXT
+    );
+    """)
+
+
+def _api_revisions(cursor):
+    # Versão da tabela de usuários: muda a cada escrita e vira o ETag do GET /usuarios.
+    # Rastreamento de alterações: cada linha inserida/alterada recebe a próxima
+    # versão em "revisao" e cada exclusão deixa uma lápide em usuarios_excluidos.
+    # O contador é uma linha travada até o commit, então as revisões ficam
+    # visíveis na mesma ordem em que foram geradas. Substituído pela migração 8.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS usuarios_versao (
+        id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        versao BIGINT NOT NULL DEFAULT 0,
+        alterado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    INSERT INTO usuarios_versao (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+    ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS revisao BIGINT;
+    ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ;
+    CREATE TABLE IF NOT EXISTS usuarios_excluidos (
+        id INTEGER PRIMARY KEY,
+        revisao BIGINT NOT NULL,
+        excluido_em TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE OR REPLACE FUNCTION usuarios_proxima_revisao() RETURNS BIGINT AS $$
+        UPDATE usuarios_versao SET versao = versao + 1, alterado_em = now()
+        WHERE id = 1 RETURNING versao
+    $$ LANGUAGE sql;
+    CREATE OR REPLACE FUNCTION usuarios_marca_revisao() RETURNS trigger AS $$
+    BEGIN
+        NEW.revisao := usuarios_proxima_revisao();
+        NEW.atualizado_em := now();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    CREATE OR REPLACE FUNCTION usuarios_registra_exclusao() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO usuarios_excluidos (id, revisao) VALUES (OLD.id, usuarios_proxima_revisao())
+        ON CONFLICT (id) DO UPDATE SET revisao = EXCLUDED.revisao, excluido_em = now();
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    CREATE OR REPLACE FUNCTION usuarios_incrementa_versao() RETURNS trigger AS $$
+    BEGIN
+        PERFORM usuarios_proxima_revisao();
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    DO $$
+    BEGIN
+        -- versão anterior: um único gatilho por comando
+        IF EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'usuarios_versao_trg') THEN
+            DROP TRIGGER usuarios_versao_trg ON usuarios;
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'usuarios_revisao_trg') THEN
+            CREATE TRIGGER usuarios_revisao_trg
+            BEFORE INSERT OR UPDATE ON usuarios
+            FOR EACH ROW EXECUTE FUNCTION usuarios_marca_revisao();
+            -- numera as linhas que já existiam
+            UPDATE usuarios SET atualizado_em = now() WHERE revisao IS NULL;
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'usuarios_exclusao_trg') THEN
+            CREATE TRIGGER usuarios_exclusao_trg
+            AFTER DELETE ON usuarios
+            FOR EACH ROW EXECUTE FUNCTION usuarios_registra_exclusao();
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'usuarios_truncate_trg') THEN
+            CREATE TRIGGER usuarios_truncate_trg
+            AFTER TRUNCATE ON usuarios
+            FOR EACH STATEMENT EXECUTE FUNCTION usuarios_incrementa_versao();
+        END IF;
+    END
+    $$;
+    CREATE INDEX IF NOT EXISTS usuarios_revisao_idx ON usuarios (revisao);
+    """)
+
+
+def _api_revisions_by_xid(cursor):
+    # A migração 3 numerava as revisões com UPDATE na linha única de
+    # usuarios_versao, dentro de um gatilho por linha: a linha ficava travada
+    # até o commit e todas as escritas em usuarios (logins, rehash, lotes)
+    # andavam em fila, com risco de deadlock entre um lote e um login.
+    #
+    # Agora a revisão é o id da transação (txid_current(), 64 bits, cresce
+    # sempre), somado a um deslocamento que continua a numeração antiga: nada
+    # é travado além das próprias linhas. Como a ordem dos txids não é a ordem
+    # dos commits, o /usuarios/changes só entrega revisões abaixo do xmin do
+    # seu snapshot (usuarios_revisao_segura): toda transação mais antiga que
+    # ele já terminou, então nenhuma revisão menor aparece depois.
+    # usuarios_versao só muda no TRUNCATE (que não deixa lápides).
+    #
+    # A tabela fica travada contra escritas durante a migração: quem estava
+    # gravando termina com a numeração antiga, quem chega depois usa a nova.
+    cursor.execute("LOCK TABLE usuarios IN SHARE ROW EXCLUSIVE MODE")
+    cursor.execute("""
+        SELECT GREATEST(
+            (SELECT versao FROM usuarios_versao WHERE id = 1),
+            (SELECT COALESCE(max(revisao), 0) FROM usuarios),
+            (SELECT COALESCE(max(revisao), 0) FROM usuarios_excluidos)
+        ) - txid_current() + 1
+    """)
+    offset = max(cursor.fetchone()[0], 0)
+    cursor.execute(f"""
+    CREATE OR REPLACE FUNCTION usuarios_revisao_atual() RETURNS BIGINT AS $$
+        SELECT txid_current() + {offset:d}
+    $$ LANGUAGE sql;
+    CREATE OR REPLACE FUNCTION usuarios_revisao_segura() RETURNS BIGINT AS $$
+        SELECT txid_snapshot_xmin(txid_current_snapshot()) + {offset:d} - 1
+    $$ LANGUAGE sql STABLE;
+    CREATE OR REPLACE FUNCTION usuarios_marca_revisao() RETURNS trigger AS $$
+    BEGIN
+        NEW.revisao := usuarios_revisao_atual();
+        NEW.atualizado_em := now();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    CREATE OR REPLACE FUNCTION usuarios_registra_exclusao() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO usuarios_excluidos (id, revisao) VALUES (OLD.id, usuarios_revisao_atual())
+        ON CONFLICT (id) DO UPDATE SET revisao = EXCLUDED.revisao, excluido_em = now();
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    CREATE OR REPLACE FUNCTION usuarios_incrementa_versao() RETURNS trigger AS $$
+    BEGIN
+        UPDATE usuarios_versao SET versao = usuarios_revisao_atual(), alterado_em = now() WHERE id = 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    DROP FUNCTION IF EXISTS usuarios_proxima_revisao();
+    CREATE INDEX IF NOT EXISTS usuarios_excluidos_revisao_idx ON usuarios_excluidos (revisao);
+    """)
+
+
+MIGRATIONS = [
+    Migration(1, "tabelas do portal", "portal", _portal_tables),
+    Migration(2, "tabelas da API (usuarios, manuais)", "api", _api_tables),
+    Migration(3, "versão e revisões de usuarios", "api", _api_revisions),
+    Migration(4, "colunas de sessão e do manual", "portal", _session_and_manual_columns),
+    Migration(5, "busca de clientes", "portal", _client_search),
+    Migration(6, "índices de pending_users e do filtro de regime", "portal", _hot_path_indexes),
+    Migration(7, "regimes tributários canônicos", "portal", _canonical_regimes),
+    Migration(8, "revisões de usuarios pelo id da transação", "api", _api_revisions_by_xid),
+    Migration(9, "heartbeat dos jobs de importação", "portal", _import_job_heartbeat),
+    Migration(10, "índice de seções dos manuais", "portal", _manual_tocs),
+    Migration(11, "índice da listagem de clientes por nome", "portal", _client_name_index),
+]
+
+
+# ---------- execução ----------
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _portal_upgrade(engine, migrations) -> list:
+    applied = []
+    with engine.connect() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            conn.exec_driver_sql(f"SELECT pg_advisory_lock({ADVISORY_LOCK_KEY})")
+            conn.commit()
+        try:
+            with conn.begin():
+                conn.exec_driver_sql(_CREATE_MIGRATIONS_TABLE)
+            done = {v for (v,) in conn.exec_driver_sql(f"SELECT version FROM {MIGRATIONS_TABLE}")}
+            conn.rollback()
+            for m in migrations:
+                if m.version in done:
+                    continue
+                try:
+                    with conn.begin():
+                        m.up(conn)
+                        conn.execute(
+                            text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (:v, :n, :at)"),
+                            {"v": m.version, "n": m.name, "at": _now()},
+                        )
+                except SkipMigration as e:
+                    log.warning("migração %s (%s) pendente: %s", m.version, m.name, e)
+                    continue
+                applied.append(m)
+        finally:
+            if postgres:
+                conn.exec_driver_sql(f"SELECT pg_advisory_unlock({ADVISORY_LOCK_KEY})")
+                conn.commit()
+    return applied
+
+
+def _api_upgrade(pool, migrations) -> list:
+    applied = []
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+        try:
+            cursor.execute(_CREATE_MIGRATIONS_TABLE)
+            cursor.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")
+            done = {v for (v,) in cursor.fetchall()}
+            conn.commit()
+            for m in migrations:
+                if m.version in done:
+                    continue
+                try:
+                    m.up(cursor)
+                    cursor.execute(
+                        f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (%s, %s, %s)",
+                        (m.version, m.name, _now()),
+                    )
+                    conn.commit()
+                except SkipMigration as e:
+                    conn.rollback()
+                    log.warning("migração %s (%s) pendente: %s", m.version, m.name, e)
+                    continue
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied.append(m)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+            conn.commit()
+    return applied
+
+
+def upgrade(engine=None, pool=None) -> list:
+    """Aplica as migrações pendentes, na ordem. Devolve as aplicadas agora.
+
+    ``engine`` recebe as "portal"; ``pool`` (com dsn PostgreSQL), as "api".
+    """
+    applied = []
+    if engine is not None:
+        applied += _portal_upgrade(engine, [m for m in MIGRATIONS if m.target == "portal"])
+    if pool is not None and pool.dsn:
+        applied += _api_upgrade(pool, [m for m in MIGRATIONS if m.target == "api"])
+    return sorted(applied, key=lambda m: m.version)
+
+
+def status(engine, pool=None) -> list:
+    """[(migração, aplicada_em ou None)] de todas as migrações do alvo disponível."""
+    def applied_at(rows):
+        return {v: at for v, at in rows}
+
+    with engine.connect() as conn:
+        if inspect(conn).has_table(MIGRATIONS_TABLE):
+            portal = applied_at(conn.exec_driver_sql(f"SELECT version, applied_at FROM {MIGRATIONS_TABLE}"))
+        else:
+            portal = {}
+    api = None
+    if pool is not None and pool.dsn:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT to_regclass(%s)", (MIGRATIONS_TABLE,))
+            if cursor.fetchone()[0]:
+                cursor.execute(f"SELECT version, applied_at FROM {MIGRATIONS_TABLE}")
+                api = applied_at(cursor.fetchall())
+            else:
+                api = {}
+            conn.rollback()
+    return [
+        (m, (portal if m.target == "portal" else api).get(m.version))
+        for m in MIGRATIONS
+        if m.target == "portal" or api is not None
+    ]
@@ -3,6 +3,15 @@ from flask_login import UserMixin
 from datetime import datetime
 
 class User(UserMixin, db.Model):
+    __table_args__ = (
+        # admin.pending_users: pendentes por created_at (parcial: só os PENDING)
+        db.Index(
+            "ix_user_pending_created_at", "created_at",
+            postgresql_where=db.text("status = 'PENDING'"),
+            sqlite_where=db.text("status = 'PENDING'"),
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(160), unique=True, nullable=False)
@@ -16,11 +25,24 @@ class User(UserMixin, db.Model):
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # sobe a cada mudança de status/papel: sessões com a versão antiga caem
+    session_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    def get_id(self):
+        return f"{self.id}:{self.session_version or 1}"
+
     def is_admin(self) -> bool:
         return self.role == "ADMIN"
 
 
 class Client(db.Model):
+    __table_args__ = (
+        # listagem ordenada/paginada por (razao_social, id)
+        db.Index("ix_client_razao_social_id", "razao_social", "id"),
+        # a mesma listagem filtrada por regime (igualdade com o nome canônico)
+        db.Index("ix_client_regime_razao_social_id", "regime_tributario", "razao_social", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     razao_social = db.Column(db.String(200), nullable=False)
     cnpj = db.Column(db.String(14), nullable=False, unique=True)  # só números
@@ -28,5 +50,85 @@ class Client(db.Model):
     responsavel_fiscal = db.Column(db.String(120), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Este é o campo que guardará todo o texto, imagens e GIFs do manual
-    manual_content = db.Column(db.Text, nullable=True)
\ No newline at end of file
+    # Este é o campo que guardará todo o texto, imagens e GIFs do manual.
+    # Pode ter megabytes: fica fora do SELECT padrão (deferred) e só é lido
+    # por quem pede com undefer(Client.manual_content), como o client_detail.
+    manual_content = db.deferred(db.Column(db.Text, nullable=True))
+    # controle de concorrência do editor e detecção de "salvar" sem mudanças
+    manual_revision = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    manual_hash = db.Column(db.String(64), nullable=True)
+    # índice das seções do manual (JSON de manual_sections.build_toc)
+    manual_toc = db.deferred(db.Column(db.Text, nullable=True))
+
+
+class ManualAsset(db.Model):
+    # Imagens/GIFs dos manuais, endereçadas pelo SHA-256 do conteúdo (sem duplicatas)
+    sha256 = db.Column(db.String(64), primary_key=True)
+    mime_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ManualRevision(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint("client_id", "revision", name="uq_manual_revision_client_revision"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+
+    # kind: full (HTML completo) / diff (diferença para a revisão anterior)
+    kind = db.Column(db.String(10), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # tamanho do HTML descompactado
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib
+
+    author_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ImportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    atualizar = db.Column(db.Boolean, nullable=False, default=False)
+
+    # status: QUEUED / RUNNING / DONE / FAILED
+    status = db.Column(db.String(20), nullable=False, default="QUEUED")
+    message = db.Column(db.String(500), nullable=True)
+
+    total_rows = db.Column(db.Integer, nullable=True)  # estimativa pela dimensão da planilha
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # renovado pelo processo dono enquanto o job está na fila ou rodando (import_jobs)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "message": self.message,
+            "total_rows": self.total_rows,
+            "processed_rows": self.processed_rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+
+
+class ImportJobError(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey("import_job.id", ondelete="CASCADE"), nullable=False, index=True)
+    line = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(200), nullable=False)
+    raw_values = db.Column(db.Text, nullable=True)  # JSON com os valores originais da linha
@@ -0,0 +1,263 @@
+import re
+from dataclasses import dataclass, field
+from itertools import compress
+from operator import mul, not_
+
+# Normalização e validação dos dados de clientes, usada pelo cadastro
+# (manual.new_client), pela importação de planilhas (client_import) e por
+# quem mais precisar. A importação trabalha por colunas: cada coluna é
+# tratada de uma vez (normalize_columns), com tabelas de tradução prontas
+# em vez de replace/re.sub por célula.
+
+# ---------- texto ----------
+
+_ACCENTS = str.maketrans(
+    "áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ",
+    "aaaaaeeeeiiiiooooouuuucnAAAAAEEEEIIIIOOOOOUUUUCN",
+)
+_NON_DIGIT_RE = re.compile(r"[^0-9]")
+_SEPARATORS_RE = re.compile(r"[\s/_\-–—.,;:()]+")
+
+
+def fold(s: str) -> str:
+    """Minúsculas sem acento ("São João" -> "sao joao")."""
+    return (s or "").lower().translate(_ACCENTS)
+
+
+def clean_text(value) -> str:
+    """Valor de célula/formulário como texto, sem espaços sobrando."""
+    if value is None:
+        return ""
+    if value.__class__ is not str:
+        value = str(value)
+    value = value.strip()
+    return " ".join(value.split()) if "  " in value else value
+
+
+def only_digits(s) -> str:
+    if not s:
+        return ""
+    # caminho rápido para o CNPJ formatado ("00.000.000/0000-00")
+    s = str(s).strip().replace(".", "").replace("/", "").replace("-", "")
+    if s.isdigit() and s.isascii():
+        return s
+    return _NON_DIGIT_RE.sub("", s)
+
+
+def norm_header(s: str) -> str:
+    """Cabeçalho de planilha comparável aos de COLUMN_ALIASES ("Razão Social" -> "razao_social")."""
+    return "_".join(fold(s).split())
+
+
+# ---------- CNPJ ----------
+
+_CNPJ_WEIGHTS_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_CNPJ_WEIGHTS_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+# os dígitos entram como códigos ASCII (bytes): desconta o "0" de cada um
+_CNPJ_OFFSET_1 = ord("0") * sum(_CNPJ_WEIGHTS_1)
+_CNPJ_OFFSET_2 = ord("0") * sum(_CNPJ_WEIGHTS_2)
+
+
+def _check_digit(weighted_sum: int) -> int:
+    rest = weighted_sum % 11
+    return 0 if rest < 2 else 11 - rest
+
+
+def cnpj_is_valid(cnpj: str) -> bool:
+    """14 dígitos com os dois dígitos verificadores corretos."""
+    if len(cnpj) != 14 or not cnpj.isdigit() or not cnpj.isascii() or cnpj == cnpj[0] * 14:
+        return False
+    b = cnpj.encode("ascii")
+    if _check_digit(sum(map(mul, b, _CNPJ_WEIGHTS_1)) - _CNPJ_OFFSET_1) != b[12] - 48:
+        return False
+    return _check_digit(sum(map(mul, b, _CNPJ_WEIGHTS_2)) - _CNPJ_OFFSET_2) == b[13] - 48
+
+
+def cnpj_digits(value) -> str:
+    """Só os números do CNPJ. Números vindos do Excel recuperam os zeros à esquerda."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:014d}" if value >= 0 else ""
+    if isinstance(value, float) and value.is_integer() and value >= 0:
+        return f"{int(value):014d}"
+    return only_digits(value)
+
+
+def format_cnpj(cnpj: str) -> str:
+    if len(cnpj) != 14:
+        return cnpj
+    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+
+
+# ---------- regime tributário ----------
+
+SIMPLES_NACIONAL = "SIMPLES NACIONAL"
+MEI = "MEI"
+LUCRO_PRESUMIDO = "LUCRO PRESUMIDO"
+LUCRO_REAL = "LUCRO REAL"
+LUCRO_ARBITRADO = "LUCRO ARBITRADO"
+IMUNE_ISENTA = "IMUNE/ISENTA"
+
+REGIMES = (SIMPLES_NACIONAL, MEI, LUCRO_PRESUMIDO, LUCRO_REAL, LUCRO_ARBITRADO, IMUNE_ISENTA)
+
+# grafias aceitas, já em fold() e com separadores trocados por espaço
+_REGIME_ALIASES = {
+    SIMPLES_NACIONAL: {"simples", "simples nacional", "sn", "simples nac", "optante simples",
+                       "optante pelo simples", "optante pelo simples nacional"},
+    MEI: {"mei", "simei", "microempreendedor individual", "micro empreendedor individual", "simples mei"},
+    LUCRO_PRESUMIDO: {"presumido", "lucro presumido", "lp"},
+    LUCRO_REAL: {"real", "lucro real", "lr"},
+    LUCRO_ARBITRADO: {"arbitrado", "lucro arbitrado"},
+    IMUNE_ISENTA: {"imune", "isenta", "isento", "imune isenta", "imune ou isenta", "isenta imune"},
+}
+_REGIME_BY_KEY = {alias: regime for regime, aliases in _REGIME_ALIASES.items() for alias in aliases}
+_REGIME_BY_KEY.update({" ".join(_SEPARATORS_RE.split(fold(r))).strip(): r for r in REGIMES})
+
+# Uma planilha repete poucos textos de regime: o resultado de cada um fica guardado
+_regime_memo = {}
+_REGIME_MEMO_MAX = 4096
+
+
+def canonical_regime(value):
+    """Regime canônico (um de REGIMES) para o texto digitado, ou None se desconhecido."""
+    if value is None:
+        return None
+    hit = _regime_memo.get(value)
+    if hit is not None or value in _regime_memo:
+        return hit
+    key = " ".join(_SEPARATORS_RE.split(fold(str(value)))).strip()
+    regime = _REGIME_BY_KEY.get(key)
+    if len(_regime_memo) >= _REGIME_MEMO_MAX:
+        _regime_memo.clear()
+    _regime_memo[value] = regime
+    return regime
+
+
+def regime_aliases(regime):
+    """Grafias aceitas para o regime canônico, em ordem alfabética (planilha modelo)."""
+    return sorted(_REGIME_ALIASES.get(regime, ()))
+
+
+# ---------- lote de clientes ----------
+
+FIELDS = ("razao_social", "cnpj", "regime_tributario", "responsavel_fiscal")
+
+REASON_UNREADABLE = "linha ilegível"
+REASON_EMPTY = "campo obrigatório vazio"
+REASON_CNPJ_LENGTH = "CNPJ sem 14 números"
+REASON_CNPJ_DIGITS = "CNPJ com dígito verificador inválido"
+REASON_REGIME = "regime tributário desconhecido"
+
+
+@dataclass
+class ClientBatch:
+    # colunas normalizadas, {campo: [valor por posição]} (inclusive das rejeitadas)
+    columns: dict
+    # posições aprovadas, em ordem
+    valid: list = field(default_factory=list)
+    # (posição, motivo) das que não passaram
+    rejected: list = field(default_factory=list)
+
+    def record(self, i: int) -> dict:
+        return {f: self.columns[f][i] for f in FIELDS}
+
+    def records(self):
+        """(posição, {campo: valor}) das linhas aprovadas."""
+        for i in self.valid:
+            yield i, self.record(i)
+
+
+def _text_column(values) -> list:
+    stripped = [v.strip() if v.__class__ is str else clean_text(v) for v in values]
+    return [v if "  " not in v else " ".join(v.split()) for v in stripped]
+
+
+def normalize_columns(columns: dict, unreadable=()) -> ClientBatch:
+    """Normaliza e valida um lote de clientes dado por colunas.
+
+    ``columns``: {campo: [valores]} com as colunas de FIELDS, todas do mesmo
+    tamanho; ``unreadable``: posições que já chegaram ilegíveis. Cada coluna é
+    tratada de uma vez; o motivo de rejeição é o primeiro problema da linha.
+    """
+    razao = _text_column(columns["razao_social"])
+    responsavel = _text_column(columns["responsavel_fiscal"])
+    cnpj = [
+        v if v.__class__ is str and v.isdigit() and v.isascii() else cnpj_digits(v)
+        for v in columns["cnpj"]
+    ]
+    # poucos textos distintos de regime: cada um é resolvido uma vez só
+    regime_column = columns["regime_tributario"]
+    regimes = {}
+    for v in set(regime_column):
+        text = clean_text(v)
+        regimes[v] = (canonical_regime(text) or False) if text else None
+    regime = [regimes[v] for v in regime_column]
+
+    cnpj_ok = [cnpj_is_valid(c) for c in cnpj]
+
+    # caminho comum sem laço Python: aprovada = tudo preenchido, CNPJ e regime válidos
+    approved = list(map(all, zip(razao, responsavel, regime, cnpj_ok)))
+    unreadable = set(unreadable)
+    for i in unreadable:
+        approved[i] = False
+
+    batch = ClientBatch(columns={
+        "razao_social": razao,
+        "cnpj": cnpj,
+        "regime_tributario": regime,
+        "responsavel_fiscal": responsavel,
+    })
+    batch.valid = list(compress(range(len(approved)), approved))
+    if len(batch.valid) < len(approved):
+        batch.rejected = [
+            (i, _reason(i in unreadable, razao[i], cnpj[i], regime[i], responsavel[i]))
+            for i in compress(range(len(approved)), map(not_, approved))
+        ]
+    return batch
+
+
+def _reason(unreadable, razao, cnpj, regime, responsavel) -> str:
+    """Motivo da rejeição: o primeiro problema da linha."""
+    if unreadable:
+        return REASON_UNREADABLE
+    if not (razao and cnpj and responsavel) or regime is None:
+        return REASON_EMPTY
+    if len(cnpj) != 14:
+        return REASON_CNPJ_LENGTH
+    if not cnpj_is_valid(cnpj):
+        return REASON_CNPJ_DIGITS
+    return REASON_REGIME
+
+
+def normalize_client(values: dict):
+    """Um cliente (formulário/API). Devolve (valores_normalizados, motivo_do_erro)."""
+    batch = normalize_columns({f: [values.get(f)] for f in FIELDS})
+    if batch.rejected:
+        return None, batch.rejected[0][1]
+    return batch.record(0), None
+
+
+def columns_from_rows(rows, col: dict):
+    """Transpõe linhas de planilha em colunas de FIELDS.
+
+    ``col``: {campo: índice} (client_import.map_columns). Devolve
+    (colunas, posições_ilegíveis) — linhas curtas demais ou que não são
+    sequências viram ilegíveis, com valores vazios.
+    """
+    width = max(col.values()) + 1
+    unreadable = []
+    try:
+        complete = min(map(len, rows), default=width) >= width
+    except TypeError:
+        complete = False
+    if not complete:
+        for i, r in enumerate(rows):
+            try:
+                if len(r) < width:
+                    unreadable.append(i)
+            except TypeError:
+                unreadable.append(i)
+    if unreadable:
+        blank = (None,) * width
+        bad = set(unreadable)
+        rows = [blank if i in bad else r for i, r in enumerate(rows)]
+    return {f: [r[col[f]] for r in rows] for f in FIELDS}, unreadable
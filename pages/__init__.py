@@ -3,10 +3,13 @@ from .home import bp as home_bp
 from .processos import bp as processos_bp
 from .admin import bp as admin_bp
 from .manual import bp as manual_bp
+import identity  # noqa: F401  (registra o user_loader do login_manager)
 
-def register_blueprints(app):
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(home_bp)
+def register_blueprints(app, web_prefix=""):
+    # web_prefix: auth e home não têm prefixo próprio e, no app completo,
+    # dividiriam "/" e "/login" com a API do software (ver app.create_app)
+    app.register_blueprint(auth_bp, url_prefix=web_prefix or None)
+    app.register_blueprint(home_bp, url_prefix=web_prefix or None)
     app.register_blueprint(processos_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(manual_bp)
\ No newline at end of file
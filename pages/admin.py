@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
 from extensions import db
 from models import User
+import identity
 
 bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -26,7 +27,9 @@ def approve_user(user_id):
         return redirect(url_for("home.index"))
     user = User.query.get_or_404(user_id)
     user.status = "ACTIVE"
+    identity.user_changed(user)
     db.session.commit()
+    identity.publish_user(user)
     flash("Usuário aprovado.", "success")
     return redirect(url_for("admin.pending_users"))
 
@@ -37,6 +40,8 @@ def reject_user(user_id):
         return redirect(url_for("home.index"))
     user = User.query.get_or_404(user_id)
     user.status = "REJECTED"
+    identity.user_changed(user)
     db.session.commit()
+    identity.publish_user(user)
     flash("Usuário rejeitado.", "info")
     return redirect(url_for("admin.pending_users"))
\ No newline at end of file
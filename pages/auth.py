@@ -1,8 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, logout_user
 from extensions import db
 from models import User
+import passwords
 
 bp = Blueprint("auth", __name__, url_prefix="")
 
@@ -20,10 +20,21 @@ def login_post():
         flash("Usuário não encontrado.", "danger")
         return redirect(url_for("auth.login"))
 
-    if not check_password_hash(user.password_hash, password):
+    try:
+        ok, new_hash = passwords.verify(user.password_hash, password)
+    except passwords.PasswordBusy:
+        flash("Servidor ocupado. Tente novamente em instantes.", "warning")
+        return redirect(url_for("auth.login"))
+
+    if not ok:
         flash("Senha inválida.", "danger")
         return redirect(url_for("auth.login"))
 
+    if new_hash:
+        # hash com método/custo antigo: regrava com o atual
+        user.password_hash = new_hash
+        db.session.commit()
+
     if user.status == "PENDING":
         return redirect(url_for("auth.pending"))
 
@@ -52,10 +63,16 @@ def register_post():
         flash("E-mail já cadastrado.", "warning")
         return redirect(url_for("auth.register"))
 
+    try:
+        password_hash = passwords.hash_password(password)
+    except passwords.PasswordBusy:
+        flash("Servidor ocupado. Tente novamente em instantes.", "warning")
+        return redirect(url_for("auth.register"))
+
     user = User(
         nome=nome,
         email=email,
-        password_hash=generate_password_hash(password),
+        password_hash=password_hash,
         status="PENDING",
         role="USER",
     )
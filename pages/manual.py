@@ -1,29 +1,41 @@
-import re
-from io import BytesIO
+import json
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
-from flask_login import login_required
-from openpyxl import load_workbook, Workbook
+import click
+from flask import Blueprint, Response, abort, current_app, render_template, request, redirect, url_for, flash, jsonify, stream_with_context
+from flask_login import current_user, login_required
+from sqlalchemy import update
 
-from models import Client
+from models import Client, ImportJob, ImportJobError, ManualAsset, ManualRevision
 from extensions import db
+from client_search import apply_search
+from pagination import cached_count, invalidate_counts, keyset_paginate
+import client_formats
+import client_template
+import import_jobs
+import manual_assets
+import manual_revisions
+import manual_sections
+import normalization
 
 bp = Blueprint("manual", __name__, url_prefix="/manual")
 
 
-def _only_digits(s: str) -> str:
-    return re.sub(r"\D", "", s or "")
+def _apply_filters(query, q: str, regime: str):
+    """Aplica busca e filtro de regime. Devolve (query, ordem_por_relevância)."""
+    rank = None
+    if q:
+        query, rank = apply_search(query, db.session, q)
 
+    if regime:
+        # Regime conhecido: igualdade com o nome canônico, servida pelo índice
+        # (regime_tributario, razao_social, id); texto livre cai no ILIKE.
+        canonical = normalization.canonical_regime(regime)
+        if canonical:
+            query = query.filter(Client.regime_tributario == canonical)
+        else:
+            query = query.filter(Client.regime_tributario.ilike(f"%{regime}%"))
 
-def _norm_header(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = s.replace("ã", "a").replace("á", "a").replace("à", "a").replace("â", "a")
-    s = s.replace("é", "e").replace("ê", "e")
-    s = s.replace("í", "i")
-    s = s.replace("õ", "o").replace("ó", "o").replace("ô", "o")
-    s = s.replace("ç", "c")
-    s = re.sub(r"\s+", "_", s)
-    return s
+    return query, rank
 
 
 @bp.get("/")
@@ -31,152 +43,162 @@ def _norm_header(s: str) -> str:
 def index():
     q = (request.args.get("q") or "").strip()
     regime = (request.args.get("regime") or "").strip()
+    ordem = (request.args.get("ordem") or "").strip()
 
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
+    cursor = request.args.get("cursor")
 
-    query = Client.query
-
-    if q:
-        q_like = f"%{q}%"
-        query = query.filter(
-            (Client.razao_social.ilike(q_like))
-            | (Client.cnpj.ilike(q_like))
-            | (Client.responsavel_fiscal.ilike(q_like))
-        )
-
-    if regime:
-        regime_like = f"%{regime}%"
-        query = query.filter(Client.regime_tributario.ilike(regime_like))
+    query, rank = _apply_filters(Client.query, q, regime)
+    total, total_is_estimate = cached_count(query, ("clients", q, regime))
 
-    pagination = query.order_by(Client.razao_social.asc()).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
+    # Padrão: paginação por chave (razao_social, id) com cursores. A ordem por
+    # relevância e links antigos com ?page= usam OFFSET.
+    use_offset = (
+        (ordem == "relevancia" and rank is not None)
+        or "page" in request.args
+        or current_app.config.get("CLIENT_LIST_PAGINATION", "keyset") == "offset"
     )
 
+    if use_offset:
+        if ordem == "relevancia" and rank is not None:
+            query = query.order_by(rank, Client.id.asc())
+        else:
+            query = query.order_by(Client.razao_social.asc(), Client.id.asc())
+        pagination = query.paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False,
+            count=False
+        )
+        pagination.total = total
+        pagination.mode = "offset"
+    else:
+        pagination = keyset_paginate(query, (Client.razao_social, Client.id), per_page, cursor)
+        pagination.total = total
+    pagination.total_is_estimate = total_is_estimate
+
     return render_template(
         "manual/index.html",
         clients=pagination.items,
         pagination=pagination,
         q=q,
         regime=regime,
+        ordem=ordem,
         per_page=per_page
     )
 
 
+NEW_CLIENT_ERRORS = {
+    normalization.REASON_EMPTY: "Preencha todos os campos.",
+    normalization.REASON_CNPJ_LENGTH: "CNPJ inválido. Digite um CNPJ com 14 números.",
+    normalization.REASON_CNPJ_DIGITS: "CNPJ inválido: confira os dígitos verificadores.",
+    normalization.REASON_REGIME: "Escolha um dos regimes tributários da lista.",
+}
+
+
 @bp.route("/novo", methods=["GET", "POST"])
 @login_required
 def new_client():
     if request.method == "POST":
-        razao_social = (request.form.get("razao_social") or "").strip()
-        cnpj_raw = (request.form.get("cnpj") or "").strip()
-        regime_tributario = (request.form.get("regime_tributario") or "").strip()
-        responsavel_fiscal = (request.form.get("responsavel_fiscal") or "").strip()
-
-        if not (razao_social and cnpj_raw and regime_tributario and responsavel_fiscal):
-            flash("Preencha todos os campos.", "warning")
-            return redirect(url_for("manual.new_client"))
-
-        cnpj = _only_digits(cnpj_raw)
-
-        if len(cnpj) != 14:
-            flash("CNPJ inválido. Digite um CNPJ com 14 números.", "warning")
+        values, reason = normalization.normalize_client(request.form)
+        if reason:
+            flash(NEW_CLIENT_ERRORS.get(reason, reason), "warning")
             return redirect(url_for("manual.new_client"))
 
-        exists = Client.query.filter_by(cnpj=cnpj).first()
+        exists = Client.query.filter_by(cnpj=values["cnpj"]).first()
         if exists:
             flash("Já existe um cliente cadastrado com esse CNPJ.", "warning")
             return redirect(url_for("manual.new_client"))
 
-        client = Client(
-            razao_social=razao_social,
-            cnpj=cnpj,
-            regime_tributario=regime_tributario,
-            responsavel_fiscal=responsavel_fiscal,
-        )
+        client = Client(**values)
         db.session.add(client)
         db.session.commit()
+        invalidate_counts()
 
         flash("Cliente cadastrado com sucesso!", "success")
         return redirect(url_for("manual.index"))
 
-    return render_template("manual/new_client.html")
+    return render_template("manual/new_client.html", regimes=normalization.REGIMES)
 
 
-# ✅ ROTA ÚNICA: gera e baixa um Excel modelo válido (sem depender de arquivo físico)
+# Planilha modelo de importação: gerada uma vez por versão das colunas do
+# import (client_template) e servida do cache, com ETag.
+# ?exemplo=0 tira a linha de exemplo; ?regime=<regime> restringe a lista
+# suspensa da coluna de regime a ele.
 @bp.get("/modelo-clientes")
 @login_required
 def modelo_clientes():
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "clientes"
-
-    # cabeçalho (colunas que seu import entende)
-    ws.append(["razao_social", "cnpj", "regime_tributario", "responsavel_fiscal"])
-
-    # linha exemplo (opcional)
-    ws.append(["EMPRESA EXEMPLO LTDA", "00.000.000/0000-00", "SIMPLES NACIONAL", "RESPONSÁVEL"])
-
-    bio = BytesIO()
-    wb.save(bio)
-    bio.seek(0)
-
-    return send_file(
-        bio,
-        as_attachment=True,
-        download_name="modelo_clientes.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+    exemplo = request.args.get("exemplo", "1") not in ("0", "false", "nao")
+    regime = (request.args.get("regime") or "").strip()
+    canonical = normalization.canonical_regime(regime) if regime else None
+    if regime and canonical is None:
+        abort(400)
+
+    etag, data = client_template.get(exemplo, canonical)
+    if etag in request.if_none_match:
+        rv = Response(status=304)
+    else:
+        suffix = "" if canonical is None else "_" + normalization.fold(canonical).replace("/", "_").replace(" ", "_")
+        rv = Response(data, mimetype=client_template.MIMETYPE)
+        rv.headers["Content-Disposition"] = f"attachment; filename=modelo_clientes{suffix}.xlsx"
+    rv.set_etag(etag)
+    # privado (exige login), mas revalidado: muda quando o import muda
+    rv.cache_control.private = True
+    rv.cache_control.no_cache = True
+    return rv
+
+
+# ✅ NOVA ROTA: exporta os clientes do banco (respeitando q e regime)
+# Só as colunas necessárias, lidas em lotes (yield_per), e o arquivo
+# (?formato=xlsx|csv|jsonl) sai direto do cursor para a resposta
+# (client_formats): o primeiro byte não espera a tabela inteira e a memória
+# do worker não cresce com o número de clientes.
+EXPORT_BATCH_SIZE = 2000
+EXPORT_HEADER = ["codigo", "razao_social", "cnpj", "regime_tributario", "responsavel_fiscal"]
 
 
-# ✅ NOVA ROTA: exporta os clientes do banco para Excel (respeitando q e regime)
 @bp.get("/exportar")
 @login_required
 def export_xlsx():
     q = (request.args.get("q") or "").strip()
     regime = (request.args.get("regime") or "").strip()
-
-    query = Client.query
-
-    if q:
-        q_like = f"%{q}%"
-        query = query.filter(
-            (Client.razao_social.ilike(q_like))
-            | (Client.cnpj.ilike(q_like))
-            | (Client.responsavel_fiscal.ilike(q_like))
-        )
-
-    if regime:
-        regime_like = f"%{regime}%"
-        query = query.filter(Client.regime_tributario.ilike(regime_like))
-
-    clients = query.order_by(Client.razao_social.asc()).all()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "clientes"
-
-    ws.append(["codigo", "razao_social", "cnpj", "regime_tributario", "responsavel_fiscal"])
-
-    for c in clients:
-        ws.append([
+    formato = (request.args.get("formato") or "xlsx").lower()
+    if formato not in client_formats.FORMATS:
+        abort(400)
+
+    query, _ = _apply_filters(
+        db.session.query(
+            Client.id,
+            Client.razao_social,
+            Client.cnpj,
+            Client.regime_tributario,
+            Client.responsavel_fiscal,
+        ),
+        q,
+        regime,
+    )
+    rows = query.order_by(Client.razao_social.asc(), Client.id.asc()).yield_per(EXPORT_BATCH_SIZE)
+    values = (
+        (
             c.id,
             c.razao_social or "",
             str(c.cnpj or ""),  # força texto (CNPJ não vira número)
             c.regime_tributario or "",
             c.responsavel_fiscal or "",
-        ])
-
-    bio = BytesIO()
-    wb.save(bio)
-    bio.seek(0)
+        )
+        for c in rows
+    )
 
-    return send_file(
-        bio,
-        as_attachment=True,
-        download_name="clientes_export.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    chunks = {
+        "xlsx": client_formats.xlsx_chunks,
+        "csv": client_formats.csv_chunks,
+        "jsonl": client_formats.jsonl_chunks,
+    }[formato](EXPORT_HEADER, values)
+    return Response(
+        stream_with_context(chunks),
+        content_type=client_formats.MIMETYPES[formato],
+        headers={"Content-Disposition": f"attachment; filename=clientes_export.{formato}"},
     )
 
 
@@ -190,111 +212,274 @@ def import_xlsx():
     atualizar = (request.form.get("atualizar") == "1")
 
     if not file or not file.filename:
-        flash("Selecione um arquivo .xlsx para importar.", "warning")
+        flash("Selecione um arquivo .xlsx, .csv ou .jsonl para importar.", "warning")
         return redirect(url_for("manual.import_xlsx"))
 
-    if not (file.filename or "").lower().endswith(".xlsx"):
-        flash("Arquivo inválido. Envie um arquivo .xlsx.", "warning")
+    if not client_formats.format_of(file.filename):
+        flash("Arquivo inválido. Envie um arquivo .xlsx, .csv ou .jsonl.", "warning")
         return redirect(url_for("manual.import_xlsx"))
 
-    try:
-        wb = load_workbook(file.stream, data_only=True, read_only=True)
-        ws = wb.active
-    except Exception:
-        flash("Não consegui ler esse Excel. Confirme se é .xlsx válido.", "danger")
-        return redirect(url_for("manual.import_xlsx"))
+    # O arquivo é gravado em disco e processada em segundo plano (import_jobs);
+    # a página de status acompanha o progresso.
+    job = import_jobs.create_job(file, atualizar)
+    return redirect(url_for("manual.import_status", job_id=job.id))
 
-    rows = list(ws.iter_rows(values_only=True))
-    if not rows:
-        flash("Planilha vazia.", "warning")
-        return redirect(url_for("manual.import_xlsx"))
 
-    header = [_norm_header(str(c or "")) for c in rows[0]]
+@bp.get("/importar/<job_id>")
+@login_required
+def import_status(job_id: str):
+    job = ImportJob.query.get_or_404(job_id)
+    import_jobs.fail_if_stale(job)
+    if request.args.get("formato") == "json" or request.accept_mimetypes.best == "application/json":
+        return jsonify(job.to_dict())
+    return render_template("manual/import_status.html", job=job)
+
 
-    aliases = {
-        "razao_social": {"razao_social", "razao", "razao_social_empresa", "nome", "empresa", "cliente"},
-        "cnpj": {"cnpj", "cnpj_cpf", "documento", "documento_de_identificacao"},
-        "regime_tributario": {"regime_tributario", "regime", "regime_federal", "tributacao"},
-        "responsavel_fiscal": {"responsavel_fiscal", "responsavel", "resp_fiscal", "responsavel_do_fiscal"},
-    }
+@bp.get("/importar/<job_id>/rejeitados")
+@login_required
+def import_rejected(job_id: str):
+    job = ImportJob.query.get_or_404(job_id)
+    rejected = (
+        ImportJobError.query.filter_by(job_id=job.id)
+        .order_by(ImportJobError.line.asc())
+        .yield_per(1000)
+    )
+
+    chunks = client_formats.xlsx_chunks(
+        ["linha", "motivo", "valores_originais"],
+        ([e.line, e.reason, *json.loads(e.raw_values or "[]")] for e in rejected),
+        sheet="rejeitados",
+    )
+    return Response(
+        stream_with_context(chunks),
+        content_type=client_formats.MIMETYPES["xlsx"],
+        headers={"Content-Disposition": f"attachment; filename=rejeitados_{job.id[:8]}.xlsx"},
+    )
 
-    col = {}
-    for idx, h in enumerate(header):
-        for key, opts in aliases.items():
-            if h in opts and key not in col:
-                col[key] = idx
 
-    missing = [k for k in aliases.keys() if k not in col]
-    if missing:
-        flash("Colunas obrigatórias não encontradas: " + ", ".join(missing), "danger")
-        return redirect(url_for("manual.import_xlsx"))
+@bp.get("/cliente/<int:client_id>")
+@login_required
+def client_detail(client_id: int):
+    # O HTML do manual não vai na página: ela traz só a navegação (índice
+    # pré-calculado) e busca as seções pela API abaixo conforme a leitura.
+    client = Client.query.get_or_404(client_id)
+    # a revisão do editor sai da mesma leitura do índice
+    revision, _, toc = manual_sections.read_toc(db.session, client.id)
+    return render_template("manual/client_detail.html", client=client, revisao=revision, secoes=toc["secoes"])
 
-    inserted = 0
-    updated = 0
-    skipped = 0
-    errors = 0
 
-    try:
-        for r in rows[1:]:
-            try:
-                razao_social = str(r[col["razao_social"]] or "").strip()
-                cnpj_raw = str(r[col["cnpj"]] or "").strip()
-                regime_tributario = str(r[col["regime_tributario"]] or "").strip()
-                responsavel_fiscal = str(r[col["responsavel_fiscal"]] or "").strip()
-
-                if not (razao_social and cnpj_raw and regime_tributario and responsavel_fiscal):
-                    errors += 1
-                    continue
-
-                cnpj = _only_digits(cnpj_raw)
-                if len(cnpj) != 14:
-                    errors += 1
-                    continue
-
-                exists = Client.query.filter_by(cnpj=cnpj).first()
-                if exists:
-                    if atualizar:
-                        exists.razao_social = razao_social
-                        exists.regime_tributario = regime_tributario
-                        exists.responsavel_fiscal = responsavel_fiscal
-                        updated += 1
-                    else:
-                        skipped += 1
-                    continue
-
-                client = Client(
-                    razao_social=razao_social,
-                    cnpj=cnpj,
-                    regime_tributario=regime_tributario,
-                    responsavel_fiscal=responsavel_fiscal,
-                )
-                db.session.add(client)
-                inserted += 1
-
-            except Exception:
-                errors += 1
-                continue
+# Seções por requisição na API de leitura do manual
+SECTIONS_PER_REQUEST_MAX = 20
+# releituras do índice quando o manual é salvo entre ele e o trecho
+SECTIONS_READ_ATTEMPTS = 3
+
+
+@bp.get("/cliente/<int:client_id>/secoes")
+@login_required
+def manual_sections_fragment(client_id: int):
+    """Seções de..ate do manual, em JSON ou (?formato=html) como fragmento HTML."""
+    for _ in range(SECTIONS_READ_ATTEMPTS):
+        current = manual_sections.read_toc(db.session, client_id)
+        if current is None:
+            abort(404)
+        revision, manual_hash, toc = current
+        sections = toc["secoes"]
+
+        first = max(request.args.get("de", 0, type=int), 0)
+        last = request.args.get("ate", first, type=int)
+        # ate < de (inclusive negativo) vira só a seção "de"
+        last = max(first, min(last, first + SECTIONS_PER_REQUEST_MAX - 1, len(sections) - 1))
+
+        etag = f"{revision}-{manual_hash or ''}-{first}-{last}"
+        if etag in request.if_none_match:
+            rv = Response(status=304)
+            rv.set_etag(etag)
+            return rv
+
+        items = manual_sections.load_sections(db.session, client_id, revision, sections, first, last)
+        if items is not None:
+            break
+    else:
+        rv = jsonify({"ok": False, "erro": "manual em edição, tente de novo"})
+        rv.status_code = 503
+        rv.headers["Retry-After"] = "1"
+        return rv
+
+    if request.args.get("formato") == "html":
+        rv = Response(
+            "".join(
+                f'<section class="manual-secao" data-secao="{item["indice"]}">{item["html"]}</section>'
+                for item in items
+            ),
+            mimetype="text/html",
+        )
+    else:
+        rv = jsonify({"revision": revision, "total": len(sections), "secoes": items})
+    rv.set_etag(etag)
+    rv.cache_control.private = True
+    rv.cache_control.no_cache = True
+    return rv
+
+
+@bp.get("/cliente/<int:client_id>/conteudo")
+@login_required
+def manual_full_content(client_id: int):
+    """Manual completo, para o modo de edição."""
+    row = db.session.execute(
+        db.select(Client.manual_content, Client.manual_revision).where(Client.id == client_id)
+    ).one_or_none()
+    if row is None:
+        abort(404)
+    return jsonify({"revision": row.manual_revision, "content": row.manual_content or ""})
 
-        db.session.commit()
 
-    except Exception:
+@bp.post("/save_manual/<int:client_id>")
+@login_required
+def save_manual(client_id: int):
+    """Salva o manual do editor.
+
+    JSON: {"base_revision": n, "content": "<html>"} ou, para enviar só o que
+    mudou desde a revisão n, {"base_revision": n, "trecho": {"inicio", "fim", "texto"}}.
+    Se outra pessoa salvou depois da revisão n, responde 409 sem gravar.
+    """
+    payload = request.get_json(silent=True) or {}
+    base_revision = payload.get("base_revision")
+    if not isinstance(base_revision, int):
+        return jsonify({"ok": False, "erro": "base_revision obrigatório"}), 400
+
+    client = Client.query.options(db.undefer(Client.manual_content)).get_or_404(client_id)
+    if client.manual_revision != base_revision:
+        return jsonify({"ok": False, "erro": "conflito", "revision": client.manual_revision}), 409
+
+    try:
+        if "trecho" in payload:
+            submitted = manual_revisions.apply_splice(client.manual_content, payload["trecho"])
+        elif isinstance(payload.get("content"), str):
+            submitted = payload["content"]
+        else:
+            return jsonify({"ok": False, "erro": "content ou trecho obrigatório"}), 400
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"ok": False, "erro": str(e) or "trecho inválido"}), 400
+
+    html, _ = manual_assets.externalize_media(db.session, submitted)
+    new_hash = manual_revisions.content_hash(html)
+    old_hash = client.manual_hash or manual_revisions.content_hash(client.manual_content)
+    body = {"ok": True, "alterado": new_hash != old_hash, "revision": base_revision}
+    if html != submitted:
+        # as imagens coladas viraram URLs: o editor troca o conteúdo pelo salvo
+        body["conteudo"] = html
+    if not body["alterado"]:
+        db.session.commit()
+        return jsonify(body)
+
+    revision = base_revision + 1
+    claimed = db.session.execute(
+        update(Client)
+        .where(Client.id == client.id, Client.manual_revision == base_revision)
+        .values(
+            manual_content=html,
+            manual_hash=new_hash,
+            manual_revision=revision,
+            manual_toc=manual_sections.dump_toc(html),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
         db.session.rollback()
-        flash("Falha ao importar: erro ao gravar no banco de dados.", "danger")
-        return redirect(url_for("manual.import_xlsx"))
+        return jsonify({"ok": False, "erro": "conflito"}), 409
 
-    flash(
-        f"Importação concluída. Inseridos: {inserted} | Atualizados: {updated} | "
-        f"Duplicados ignorados: {skipped} | Linhas com erro: {errors}",
-        "success" if (inserted or updated) else "warning",
-    )
-    return redirect(url_for("manual.index"))
+    if base_revision == 0 and client.manual_content:
+        # conteúdo anterior ao histórico (ex.: importado): vira a revisão 0
+        db.session.add(manual_revisions.build_revision(client.id, 0, None, client.manual_content))
+    db.session.add(manual_revisions.build_revision(
+        client.id,
+        revision,
+        client.manual_content,
+        html,
+        author_id=current_user.id if current_user.is_authenticated else None,
+    ))
+    db.session.commit()
 
+    body["revision"] = revision
+    return jsonify(body)
 
-@bp.get("/cliente/<int:client_id>")
+
+@bp.get("/cliente/<int:client_id>/revisoes")
 @login_required
-def client_detail(client_id: int):
+def manual_revisions_list(client_id: int):
     client = Client.query.get_or_404(client_id)
-    return render_template("manual/client_detail.html", client=client)
+    rows = (
+        db.session.query(
+            ManualRevision.revision,
+            ManualRevision.size,
+            ManualRevision.author_id,
+            ManualRevision.created_at,
+        )
+        .filter(ManualRevision.client_id == client.id)
+        .order_by(ManualRevision.revision.desc())
+        .all()
+    )
+    return jsonify({
+        "revision": client.manual_revision,
+        "revisoes": [
+            {
+                "revision": r.revision,
+                "size": r.size,
+                "author_id": r.author_id,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            }
+            for r in rows
+        ],
+    })
+
+
+@bp.get("/cliente/<int:client_id>/revisoes/<int:revision>")
+@login_required
+def manual_revision_content(client_id: int, revision: int):
+    html = manual_revisions.load_revision(db.session, client_id, revision)
+    if html is None:
+        abort(404)
+    return jsonify({"revision": revision, "content": html})
+
+
+# Mídia dos manuais: o endereço é o hash do conteúdo, então a resposta nunca
+# muda e pode ficar no cache do navegador para sempre (só revalida se sumir).
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+
+def _asset_cache_headers(rv, sha256: str):
+    rv.set_etag(sha256)
+    rv.cache_control.private = True
+    rv.cache_control.max_age = ASSET_MAX_AGE
+    rv.cache_control.immutable = True
+    return rv
+
+
+@bp.get("/assets/<sha256>")
+@login_required
+def asset(sha256: str):
+    if not manual_assets.is_asset_hash(sha256):
+        abort(404)
+    if sha256 in request.if_none_match:
+        return _asset_cache_headers(Response(status=304), sha256)
+
+    item = db.session.get(ManualAsset, sha256)
+    if item is None:
+        abort(404)
+    rv = Response(item.data, mimetype=item.mime_type)
+    rv.headers["X-Content-Type-Options"] = "nosniff"
+    _asset_cache_headers(rv, sha256)
+    return rv.make_conditional(request, accept_ranges=True, complete_length=item.size)
+
+
+@bp.cli.command("migrar-midias")
+@click.option("--lote", default=50, show_default=True, help="Manuais por commit.")
+def migrar_midias(lote: int):
+    """Extrai as imagens embutidas (base64) dos manuais já gravados."""
+    converted, extracted, skipped = manual_assets.migrate_manuals(db.session, batch_size=lote, log=click.echo)
+    click.echo(f"Manuais convertidos: {converted} | Imagens extraídas: {extracted}")
+    if skipped:
+        click.echo(f"Salvos durante a conversão (rode de novo): {skipped}")
 
 
 # --- Fallback de segurança: garante que manual.index exista ---
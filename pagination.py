@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import func, tuple_
+
+from cache import cache
+
+# Contagem da listagem: guardada por filtro durante COUNT_CACHE_TTL segundos.
+# No PostgreSQL, se o planejador estima mais de COUNT_ESTIMATE_THRESHOLD linhas,
+# a estimativa é usada no lugar do COUNT(*) exato.
+# Cada worker guarda as suas contagens, sob a "geração" lida do cache
+# compartilhado (cache.py): invalidate_counts() troca a geração e todos os
+# workers passam a contar de novo, como o invalidar_portal() do app.py.
+COUNT_CACHE_TTL = int(os.getenv("CLIENT_COUNT_CACHE_TTL", 60))
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv("CLIENT_COUNT_ESTIMATE_THRESHOLD", 10000))
+COUNT_CACHE_MAX_ENTRIES = 512
+COUNT_GENERATION_KEY = "clientes:contagem:geracao"
+COUNT_GENERATION_TTL = 30 * 24 * 3600
+
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def encode_cursor(direction: str, values) -> str:
+    raw = json.dumps([direction, list(values)], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, columns):
+    """(direção, valores) de um cursor, ou None se ele for inválido.
+
+    O cursor vem da URL: precisa ter um valor por coluna, cada um do tipo
+    Python da coluna (str para razao_social, int para id...).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, values = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if direction not in (">", "<") or not isinstance(values, list) or len(values) != len(columns):
+        return None
+    # type() e não isinstance(): True passaria por int
+    if any(type(v) is not c.type.python_type for v, c in zip(values, columns)):
+        return None
+    return direction, values
+
+
+class KeysetPage:
+    """Página por chave (keyset), com a mesma cara do Pagination do Flask-SQLAlchemy
+    no que o template usa: items, total, has_next, has_prev."""
+
+    mode = "keyset"
+
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor, prev_cursor,
+                 total=None, total_is_estimate=False):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+
+def keyset_paginate(query, columns, per_page: int, cursor: str = None) -> KeysetPage:
+    """Pagina em ordem crescente de ``columns`` (a última deve ser única, ex.: id)."""
+    decoded = decode_cursor(cursor, columns) if cursor else None
+    key = tuple_(*columns)
+
+    if decoded and decoded[0] == "<":
+        rows = (
+            query.filter(key < tuple(decoded[1]))
+            .order_by(*[c.desc() for c in columns])
+            .limit(per_page + 1)
+            .all()
+        )
+        has_prev, has_next = len(rows) > per_page, True
+        items = list(reversed(rows[:per_page]))
+    else:
+        if decoded:
+            query = query.filter(key > tuple(decoded[1]))
+        rows = query.order_by(*[c.asc() for c in columns]).limit(per_page + 1).all()
+        has_next, has_prev = len(rows) > per_page, decoded is not None
+        items = rows[:per_page]
+
+    def values(item):
+        return [getattr(item, c.key) for c in columns]
+
+    return KeysetPage(
+        items,
+        per_page,
+        has_next=has_next and bool(items),
+        has_prev=has_prev and bool(items),
+        next_cursor=encode_cursor(">", values(items[-1])) if items else None,
+        prev_cursor=encode_cursor("<", values(items[0])) if items else None,
+    )
+
+
+def _planner_estimate(query):
+    compiled = query.statement.compile(dialect=query.session.get_bind().dialect)
+    plan = query.session.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _count_generation():
+    generation = cache.get(COUNT_GENERATION_KEY)
+    if generation is None:
+        generation = time.time()
+        cache.set(COUNT_GENERATION_KEY, generation, ttl=COUNT_GENERATION_TTL)
+    return generation
+
+
+def cached_count(query, key):
+    """(total, é_estimativa) para a consulta, reaproveitando o valor por ``key``."""
+    key = (str(query.session.get_bind().url), _count_generation(), key)
+    now = time.monotonic()
+    with _counts_lock:
+        hit = _counts.get(key)
+        if hit and hit[0] > now:
+            return hit[1], hit[2]
+
+    query = query.order_by(None)
+    total, estimated = None, False
+    if query.session.get_bind().dialect.name == "postgresql":
+        estimate = _planner_estimate(query)
+        if estimate > COUNT_ESTIMATE_THRESHOLD:
+            total, estimated = estimate, True
+    if total is None:
+        # troca só as colunas, mantendo o FROM delas: with_entities(func.count())
+        # perdia o FROM quando não havia filtro ("SELECT count(*)" dava 1), e o
+        # Query.count() faria um subselect com todas as colunas (manual_content)
+        stmt = query.statement.with_only_columns(func.count(), maintain_column_froms=True)
+        total = query.session.execute(stmt).scalar()
+
+    with _counts_lock:
+        if len(_counts) >= COUNT_CACHE_MAX_ENTRIES:
+            _counts.clear()
+        _counts[key] = (now + COUNT_CACHE_TTL, total, estimated)
+    return total, estimated
+
+
+def invalidate_counts():
+    """Chamar depois de inserir ou excluir clientes: vale para todos os workers."""
+    cache.set(COUNT_GENERATION_KEY, time.time(), ttl=COUNT_GENERATION_TTL)
+    with _counts_lock:
+        _counts.clear()
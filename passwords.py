@@ -0,0 +1,121 @@
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Senhas do portal (web) e do /login do software, no mesmo formato do
+# Werkzeug ("método$sal$hash"), então hashes antigos continuam válidos.
+#
+# - PASSWORD_METHOD escolhe o KDF e o custo, ex.: "scrypt:32768:8:1" ou
+#   "pbkdf2:sha256:600000" (use benchmarks/bench_password.py para escolher);
+# - verify() aceita também senhas antigas em texto puro e hashes com outro
+#   método/custo, e devolve o hash novo para ser gravado (rehash no login);
+# - o cálculo roda num pool limitado de threads: no máximo PASSWORD_WORKERS
+#   hashes ao mesmo tempo por processo e PASSWORD_QUEUE_MAX na fila; passou
+#   disso ou de PASSWORD_TIMEOUT segundos, PasswordBusy (o chamador responde
+#   503). O pool só limita a concorrência e descarta o excesso: a requisição
+#   continua esperando o resultado, então num worker síncrono do gunicorn ele
+#   fica ocupado durante o hash do mesmo jeito. Não é um jeito de liberar o
+#   worker; com --threads, ele evita que N threads calculem N hashes juntas.
+
+PASSWORD_METHOD = os.getenv("PASSWORD_METHOD", "scrypt:32768:8:1")
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", os.cpu_count() or 2))
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", 32))
+PASSWORD_TIMEOUT = float(os.getenv("PASSWORD_TIMEOUT", 5))
+
+_KNOWN_METHODS = ("scrypt", "pbkdf2")
+
+
+class PasswordBusy(Exception):
+    """Pool de hash cheio ou lento demais: tente de novo em instantes."""
+
+
+def method_prefix(method: str) -> str:
+    """Método normalizado como aparece no hash (o Werkzeug completa os padrões)."""
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+_configured = {"method": None, "prefix": None}
+
+
+def _current_prefix() -> str:
+    if _configured["method"] != PASSWORD_METHOD:
+        _configured["prefix"] = method_prefix(PASSWORD_METHOD)
+        _configured["method"] = PASSWORD_METHOD
+    return _configured["prefix"]
+
+
+def is_hash(stored: str) -> bool:
+    if not stored or stored.count("$") != 2:
+        return False
+    return stored.split(":", 1)[0].split("$", 1)[0] in _KNOWN_METHODS
+
+
+def needs_rehash(stored: str) -> bool:
+    return not is_hash(stored) or stored.split("$", 1)[0] != _current_prefix()
+
+
+# ---------- pool de hash ----------
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+def _get_executor():
+    # Um pool por processo (workers do gunicorn são forks)
+    global _executor, _executor_pid, _slots
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="senha")
+            _slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_MAX)
+            _executor_pid = os.getpid()
+        return _executor, _slots
+
+
+def _run(fn, *args):
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordBusy("fila de hash cheia")
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=PASSWORD_TIMEOUT)
+    except FutureTimeout:
+        raise PasswordBusy("hash demorou demais")
+
+
+# ---------- API ----------
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored: str, password: str):
+    if is_hash(stored):
+        ok = check_password_hash(stored, password)
+    else:
+        # legado: senha gravada em texto puro
+        ok = stored is not None and hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+    if ok and needs_rehash(stored):
+        return True, _hash(password, PASSWORD_METHOD)
+    return ok, None
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password, PASSWORD_METHOD)
+
+
+def verify(stored: str, password: str):
+    """(senha_confere, hash_novo). hash_novo vem preenchido quando a senha
+    confere mas está em texto puro ou com outro método/custo: grave-o."""
+    if not password:
+        return False, None
+    return _run(_verify, stored, password)
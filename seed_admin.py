@@ -1,7 +1,7 @@
-from werkzeug.security import generate_password_hash
 from app import create_app
 from extensions import db
 from models import User
+import passwords
 
 app = create_app()
 
@@ -11,7 +11,7 @@ with app.app_context():
         u = User(
             nome="Administrador",
             email=email,
-            password_hash=generate_password_hash("Admin@123"),
+            password_hash=passwords.hash_password("Admin@123"),
             status="ACTIVE",
             role="ADMIN"
         )
@@ -0,0 +1,186 @@
+import hashlib
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass, field
+
+import click
+from flask import current_app, request, send_file
+from flask.cli import with_appcontext
+
+import compression
+
+# Arquivos de static/ com o hash do conteúdo no nome (css/theme.css ->
+# css/theme.1a2b3c4d5e6f.css): url_for("static", filename=...) já devolve o
+# nome com hash, a resposta sai com Cache-Control immutable de um ano e um
+# arquivo alterado ganha outro nome (o navegador nunca revalida à toa).
+# As variantes .br/.gz ficam prontas em static/dist/ ("flask build-assets",
+# no build do deploy, com a compressão máxima); sem elas o gzip é feito na
+# primeira requisição e guardado em memória. Nomes sem hash continuam
+# funcionando como antes (revalidação pelo ETag).
+
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DIST_DIR = "dist"
+PRECOMPRESS_MIN_SIZE = 1024
+BUILD_LEVELS = {"br": 11, "gzip": 9}
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+@dataclass
+class Asset:
+    path: str      # arquivo original em static/
+    name: str      # nome com hash, relativo a static/
+    digest: str
+    mimetype: str
+    mtime_ns: int
+    compressible: bool
+    # codificação -> caminho em static/dist/ (pronto) ou os bytes já em memória
+    variants: dict = field(default_factory=dict)
+
+    @property
+    def encodings(self) -> list:
+        if not self.compressible:
+            return []
+        return list(dict.fromkeys([*self.variants, *compression.available_encodings()]))
+
+
+def hashed_name(filename: str, digest: str) -> str:
+    base, ext = os.path.splitext(filename)
+    return f"{base}.{digest}{ext}"
+
+
+class AssetManifest:
+    """Nome lógico -> Asset, lido de static/ uma vez (e a cada mudança, em debug)."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.dist = os.path.join(folder, DIST_DIR)
+        self._lock = threading.Lock()
+        self.by_name = {}
+        self.by_hashed = {}
+        for root, dirs, files in os.walk(folder):
+            if root == folder and DIST_DIR in dirs:
+                dirs.remove(DIST_DIR)
+            for f in files:
+                self._add(os.path.relpath(os.path.join(root, f), folder).replace(os.sep, "/"))
+
+    def _add(self, filename: str) -> Asset:
+        path = os.path.join(self.folder, filename)
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        asset = Asset(
+            path=path,
+            name=hashed_name(filename, digest),
+            digest=digest,
+            mimetype=mimetype,
+            mtime_ns=os.stat(path).st_mtime_ns,
+            compressible=mimetype in compression.COMPRESSIBLE_MIMETYPES and len(data) >= PRECOMPRESS_MIN_SIZE,
+        )
+        for encoding, suffix in SUFFIXES.items():
+            built = os.path.join(self.dist, asset.name + suffix)
+            if asset.compressible and os.path.exists(built):
+                asset.variants[encoding] = built
+        old = self.by_name.get(filename)
+        if old is not None:
+            self.by_hashed.pop(old.name, None)
+        self.by_name[filename] = asset
+        self.by_hashed[asset.name] = asset
+        return asset
+
+    def url_name(self, filename: str) -> str:
+        asset = self.by_name.get(filename)
+        if asset is None:
+            return filename
+        if current_app.debug and os.stat(asset.path).st_mtime_ns != asset.mtime_ns:
+            with self._lock:
+                asset = self._add(filename)
+        return asset.name
+
+    def encoded(self, asset: Asset, encoding: str) -> bytes:
+        variant = asset.variants.get(encoding)
+        if isinstance(variant, bytes):
+            return variant
+        if variant is None:
+            with open(asset.path, "rb") as f:
+                body = compression.compress(f.read(), encoding)
+        else:
+            with open(variant, "rb") as f:
+                body = f.read()
+        # fica em memória: são poucos arquivos e o worker os serve sempre
+        with self._lock:
+            asset.variants[encoding] = body
+        return body
+
+
+def serve(filename: str):
+    """View do endpoint "static": nome com hash -> immutable, com br/gzip negociado."""
+    manifest = current_app.extensions["static_assets"]
+    asset = manifest.by_hashed.get(filename)
+    if asset is None:
+        return current_app.send_static_file(filename)
+
+    encodings = asset.encodings
+    encoding = request.accept_encodings.best_match(encodings) if encodings else None
+    if encoding:
+        rv = current_app.response_class(manifest.encoded(asset, encoding), mimetype=asset.mimetype)
+        rv.headers["Content-Encoding"] = encoding
+        rv.set_etag(f"{asset.digest}-{encoding}")
+    else:
+        rv = send_file(asset.path, mimetype=asset.mimetype, etag=asset.digest, conditional=False)
+    if encodings:
+        rv.vary.add("Accept-Encoding")
+    rv.cache_control.public = True
+    rv.cache_control.max_age = IMMUTABLE_MAX_AGE
+    rv.cache_control.immutable = True
+    return rv.make_conditional(request)
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets_command():
+    """Grava em static/dist/ as variantes .br/.gz dos arquivos de static/."""
+    manifest = current_app.extensions["static_assets"]
+    os.makedirs(manifest.dist, exist_ok=True)
+    keep = set()
+    encodings = [e for e in ("br", "gzip") if e in compression.available_encodings()]
+    for filename, asset in sorted(manifest.by_name.items()):
+        if not asset.compressible:
+            continue
+        with open(asset.path, "rb") as f:
+            data = f.read()
+        sizes = []
+        for encoding in encodings:
+            body = compression.compress(data, encoding, BUILD_LEVELS[encoding])
+            if len(body) >= len(data):
+                continue
+            out = os.path.join(manifest.dist, asset.name + SUFFIXES[encoding])
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            with open(out + ".tmp", "wb") as f:
+                f.write(body)
+            os.replace(out + ".tmp", out)
+            asset.variants[encoding] = out
+            keep.add(os.path.abspath(out))
+            sizes.append(f"{encoding} {len(body)}")
+        click.echo(f"{asset.name}: {len(data)} bytes -> " + (", ".join(sizes) or "sem compressão"))
+    # variantes de versões antigas dos arquivos
+    for root, _, files in os.walk(manifest.dist):
+        for f in files:
+            path = os.path.abspath(os.path.join(root, f))
+            if path not in keep:
+                os.remove(path)
+
+
+def init_app(app):
+    manifest = AssetManifest(app.static_folder)
+    app.extensions["static_assets"] = manifest
+    app.view_functions["static"] = serve
+
+    @app.url_defaults
+    def _fingerprint(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = manifest.url_name(values["filename"])
+
+    app.cli.add_command(build_assets_command)
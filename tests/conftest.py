@@ -0,0 +1,70 @@
+"""Fixtures dos testes: o app completo sobre bancos descartáveis.
+
+Os testes com SQLite rodam sempre. Os que precisam de PostgreSQL (API do
+software, concorrência) usam TEST_DATABASE_URL e são pulados sem ela; o
+banco indicado é recriado do zero (schema public apagado) a cada teste.
+"""
+import os
+import sys
+import tempfile
+
+# antes de importar o app: cache e métricas num diretório só dos testes, e
+# nada do .env (DATABASE_URL de produção) entra no app montado aqui
+_TMP = tempfile.mkdtemp(prefix="portal-fiscal-tests-")
+os.environ.setdefault("CACHE_DIR", os.path.join(_TMP, "cache"))
+os.environ.setdefault("METRICS_DIR", os.path.join(_TMP, "metrics"))
+os.environ.setdefault("PROFILE_DIR", os.path.join(_TMP, "profiles"))
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db, pool  # noqa: E402
+import migrations  # noqa: E402
+
+
+def make_app(uri, **config):
+    app = create_app({
+        "SECRET_KEY": "testes",
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "LOGIN_DISABLED": True,
+        "TESTING": True,
+        **config,
+    })
+    with app.app_context():
+        migrations.upgrade(db.engine, pool if uri.startswith("postgres") else None)
+    return app
+
+
+def _teardown(app):
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    pool.close()
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Portal sobre um SQLite novo (migrações aplicadas)."""
+    app = make_app(f"sqlite:///{tmp_path / 'portal.db'}", IMPORT_UPLOAD_DIR=str(tmp_path))
+    yield app
+    _teardown(app)
+
+
+@pytest.fixture
+def pg_app(tmp_path):
+    """App completo sobre TEST_DATABASE_URL, com o schema recriado."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("defina TEST_DATABASE_URL (PostgreSQL descartável)")
+    import psycopg2
+    from config import libpq_dsn
+
+    conn = psycopg2.connect(libpq_dsn(TEST_DATABASE_URL))
+    conn.autocommit = True
+    conn.cursor().execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+    conn.close()
+    app = make_app(TEST_DATABASE_URL, IMPORT_UPLOAD_DIR=str(tmp_path))
+    yield app
+    _teardown(app)
@@ -0,0 +1,93 @@
+"""FileCache: JSON num diretório privado, com expiração e limite de tamanho."""
+import os
+import pickle
+import stat
+import time
+
+import pytest
+
+from cache import FileCache
+
+
+def test_guarda_os_tipos_do_app(tmp_path):
+    cache = FileCache(str(tmp_path / "c"))
+    valores = {
+        "geracao": 1712345678.25,
+        "versao": 3,
+        "pagina": {"html": "<p>olá</p>", "etag": "abc"},
+        ("gzip", b"\x00\xff"): b"\x1f\x8b\x00",
+        "modelo": ("v1-abc", b"PK\x03\x04"),
+    }
+    for key, value in valores.items():
+        cache.set(key, value)
+    for key, value in valores.items():
+        assert cache.get(key) == value
+    with pytest.raises(TypeError):
+        cache.set("objeto", object())
+
+
+def test_diretorio_so_do_dono(tmp_path):
+    directory = tmp_path / "c"
+    FileCache(str(directory))
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+def test_diretorio_aberto_e_fechado_e_esvaziado(tmp_path):
+    directory = tmp_path / "c"
+    cache = FileCache(str(directory))
+    cache.set("k", "plantado por outro usuário")
+    os.chmod(directory, 0o777)
+    cache = FileCache(str(directory))
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert cache.get("k") is None
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason="precisa de root para trocar o dono")
+def test_diretorio_de_outro_usuario_impede_a_subida(tmp_path):
+    directory = tmp_path / "c"
+    directory.mkdir(mode=0o700)
+    os.chown(directory, 65534, 65534)
+    with pytest.raises(RuntimeError):
+        FileCache(str(directory))
+
+
+def test_arquivo_pickle_nao_e_executado(tmp_path):
+    cache = FileCache(str(tmp_path / "c"))
+    marca = tmp_path / "executou"
+
+    class Payload:
+        def __reduce__(self):
+            return (open, (str(marca), "w"))
+
+    with open(cache._path("k"), "wb") as f:
+        pickle.dump((time.time() + 60, Payload()), f)
+    assert cache.get("k") is None
+    assert not marca.exists()
+
+
+def test_expirado_sai_na_leitura(tmp_path):
+    cache = FileCache(str(tmp_path / "c"))
+    cache.set("k", "v", ttl=-1)
+    assert cache.get("k") is None
+    assert not os.path.exists(cache._path("k"))
+
+
+def test_sweep_apaga_expirados_e_respeita_o_limite(tmp_path):
+    cache = FileCache(str(tmp_path / "c"), max_entries=3, sweep_interval=3600)
+    cache.set("velho", "v", ttl=-1)
+    for i in range(5):
+        cache.set(f"k{i}", "v", ttl=100 + i)
+    assert cache.sweep() == 3
+    assert [cache.get(f"k{i}") for i in range(5)] == [None, None, "v", "v", "v"]
+
+
+def test_sweep_por_bytes_gravados(tmp_path):
+    cache = FileCache(str(tmp_path / "c"), max_bytes=4000, sweep_interval=3600)
+    for i in range(20):
+        cache.set(f"k{i}", "x" * 300, ttl=100 + i)
+    total = sum(os.path.getsize(os.path.join(cache.directory, n)) for n in os.listdir(cache.directory))
+    # entre duas limpezas cabe no máximo mais um quarto do limite
+    assert total <= 4000 + 4000 // 4
+    assert cache.get("k19") == "x" * 300
+    cache.set("grande", "x" * 5000)
+    assert cache.get("grande") is None
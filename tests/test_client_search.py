@@ -0,0 +1,44 @@
+"""Busca de clientes: usa a estrutura da migração e nunca roda DDL numa requisição."""
+from sqlalchemy import event
+
+from extensions import db
+from models import Client
+import client_search
+
+
+def _clientes(app):
+    with app.app_context():
+        db.session.add_all([
+            Client(razao_social="Padaria São João", cnpj="11222333000181", regime_tributario="MEI",
+                   responsavel_fiscal="Ana"),
+            Client(razao_social="Mercado Central", cnpj="22333444000190", regime_tributario="MEI",
+                   responsavel_fiscal="João Silva"),
+        ])
+        db.session.commit()
+
+
+def test_busca_usa_fts_sem_ddl_na_requisicao(app):
+    _clientes(app)
+    comandos = []
+    with app.app_context():
+        client_search._modes.clear()
+        event.listen(db.engine, "before_cursor_execute", lambda *a: comandos.append(a[2]))
+        resp = app.test_client().get("/manual/", query_string={"q": "joao"})
+    assert resp.status_code == 200
+    assert b"Padaria S" in resp.data and b"Mercado Central" in resp.data
+    assert not [sql for sql in comandos if sql.lstrip().upper().startswith(("CREATE", "ALTER", "DROP", "INSERT INTO CLIENT_FTS(CLIENT_FTS)"))]
+    with app.app_context():
+        assert client_search.search_mode(db.session) == "sqlite"
+
+
+def test_sem_a_estrutura_cai_no_ilike(app):
+    _clientes(app)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE client_fts")
+        client_search._modes.clear()
+        assert client_search.search_mode(db.session) == "ilike"
+        query, rank = client_search.apply_search(Client.query, db.session, "Mercado")
+        assert [c.razao_social for c in query] == ["Mercado Central"] and rank is None
+        # e continua sem a tabela: ninguém a recriou
+        assert client_search.detect(db.engine) == "ilike"
@@ -0,0 +1,61 @@
+"""Exportação de clientes: o .xlsx sai em streaming e é lido de volta pelo import."""
+import io
+
+from openpyxl import load_workbook
+
+from client_formats import RowReader, xlsx_chunks
+from extensions import db
+from models import Client
+
+
+def _clientes(app, n):
+    with app.app_context():
+        db.session.add_all(
+            Client(
+                razao_social=f"EMPRESA {i:04d} & FILHOS <LTDA>",
+                cnpj=f"{i:014d}",
+                regime_tributario="SIMPLES NACIONAL",
+                responsavel_fiscal="ANA",
+            )
+            for i in range(n)
+        )
+        db.session.commit()
+
+
+def test_exportar_xlsx_sai_em_blocos_e_abre_no_openpyxl(app):
+    _clientes(app, 2500)
+    resp = app.test_client().get("/manual/exportar", buffered=False)
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.headers["Content-Disposition"] == "attachment; filename=clientes_export.xlsx"
+    chunks = list(resp.response)
+    assert len(chunks) > 2
+    resp.close()
+
+    wb = load_workbook(io.BytesIO(b"".join(chunks)), read_only=True)
+    rows = list(wb["clientes"].iter_rows(values_only=True))
+    assert rows[0] == ("codigo", "razao_social", "cnpj", "regime_tributario", "responsavel_fiscal")
+    assert len(rows) == 2501
+    assert rows[1][1] == "EMPRESA 0000 & FILHOS <LTDA>"
+    assert rows[1][2] == "00000000000000"  # texto: os zeros à esquerda ficam
+    assert isinstance(rows[1][0], int)
+
+
+def test_primeiro_bloco_nao_espera_as_linhas():
+    lidas = []
+
+    def linhas():
+        for i in range(10):
+            lidas.append(i)
+            yield (i, f"linha {i}")
+
+    chunks = xlsx_chunks(["n", "texto"], linhas())
+    assert next(chunks)
+    assert lidas == []
+
+
+def test_xlsx_exportado_volta_pelo_import(tmp_path):
+    path = tmp_path / "ida_e_volta.xlsx"
+    path.write_bytes(b"".join(xlsx_chunks(["a", "b"], [("x\x01y", 1), (None, "  z ")])))
+    with RowReader(str(path)) as reader:
+        assert list(reader) == [("a", "b"), ("xy", 1), (None, "  z ")]
@@ -0,0 +1,75 @@
+"""Jobs de importação: o job de um processo que morreu não fica rodando para sempre."""
+import io
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import ImportJob
+import import_jobs
+
+
+def _job(app, tmp_path, status, heartbeat_age):
+    path = tmp_path / "orfao.csv"
+    path.write_text("razao_social;cnpj\n")
+    with app.app_context():
+        job = ImportJob(
+            id=f"{status.lower()}{heartbeat_age}".ljust(32, "0"),
+            filename="orfao.csv",
+            file_path=str(path),
+            status=status,
+            heartbeat_at=datetime.utcnow() - timedelta(seconds=heartbeat_age),
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job.id, path
+
+
+def _status(app, job_id):
+    return app.test_client().get(f"/manual/importar/{job_id}", query_string={"formato": "json"}).get_json()
+
+
+@pytest.mark.parametrize("status", ["QUEUED", "RUNNING"])
+def test_job_sem_heartbeat_vira_failed_ao_ler_o_status(app, tmp_path, status):
+    job_id, path = _job(app, tmp_path, status, import_jobs.IMPORT_STALE_AFTER + 60)
+    job = _status(app, job_id)
+    assert job["status"] == "FAILED"
+    assert job["message"] == import_jobs.STALE_MESSAGE
+    assert not path.exists()
+
+
+def test_job_com_heartbeat_recente_continua_rodando(app, tmp_path):
+    job_id, path = _job(app, tmp_path, "RUNNING", 5)
+    assert _status(app, job_id)["status"] == "RUNNING"
+    assert path.exists()
+
+
+def test_job_deste_processo_nao_e_marcado(app, tmp_path):
+    job_id, _ = _job(app, tmp_path, "RUNNING", import_jobs.IMPORT_STALE_AFTER + 60)
+    import_jobs._get_executor()
+    import_jobs._active[job_id] = app
+    try:
+        assert _status(app, job_id)["status"] == "RUNNING"
+    finally:
+        import_jobs._active.pop(job_id, None)
+
+
+def test_importacao_normal_termina_e_renova_o_heartbeat(app):
+    csv = "razao_social;cnpj;regime_tributario;responsavel_fiscal\nEMPRESA;11.222.333/0001-81;Simples;ANA\n"
+    client = app.test_client()
+    resp = client.post(
+        "/manual/importar",
+        data={"file": (io.BytesIO(csv.encode()), "clientes.csv")},
+        content_type="multipart/form-data",
+    )
+    status_url = resp.headers["Location"]
+    for _ in range(100):
+        job = client.get(status_url, query_string={"formato": "json"}).get_json()
+        if job["status"] in ("DONE", "FAILED"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "DONE" and job["inserted"] == 1
+    with app.app_context():
+        assert db.session.get(ImportJob, job["id"]).heartbeat_at is not None
+    assert job["id"] not in import_jobs._active
@@ -0,0 +1,58 @@
+"""Retratos dos workers em METRICS_DIR: diretório privado e sem workers mortos na soma."""
+import json
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import instrumentation
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "metrics"
+    monkeypatch.setattr(instrumentation, "METRICS_DIR", str(directory))
+    monkeypatch.setitem(instrumentation._dir_checked, "ok", False)
+    return directory
+
+
+def _pid_morto():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_flush_cria_o_diretorio_so_do_dono(metrics_dir):
+    instrumentation.flush(force=True)
+    assert stat.S_IMODE(os.stat(metrics_dir).st_mode) == 0o700
+    assert (metrics_dir / f"metrics-{os.getpid()}.json").exists()
+
+
+def test_retrato_de_worker_morto_sai_da_soma(metrics_dir):
+    metrics_dir.mkdir(mode=0o700)
+    vivo = metrics_dir / f"metrics-{os.getppid()}.json"
+    morto = metrics_dir / f"metrics-{_pid_morto()}.json"
+    for path in (vivo, morto):
+        path.write_text(json.dumps(instrumentation.registry.snapshot()))
+    assert len(instrumentation.collect_snapshots()) == 2
+    assert vivo.exists() and not morto.exists()
+
+
+def test_diretorio_aberto_e_fechado_e_esvaziado(metrics_dir):
+    metrics_dir.mkdir()
+    os.chmod(metrics_dir, 0o777)
+    plantado = metrics_dir / f"metrics-{os.getppid()}.json"
+    plantado.write_text(json.dumps(instrumentation.registry.snapshot()))
+    assert len(instrumentation.collect_snapshots()) == 1
+    assert stat.S_IMODE(os.stat(metrics_dir).st_mode) == 0o700
+    assert not plantado.exists()
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason="precisa de root para trocar o dono")
+def test_diretorio_de_outro_usuario_e_recusado(metrics_dir):
+    metrics_dir.mkdir(mode=0o700)
+    os.chown(metrics_dir, 65534, 65534)
+    with pytest.raises(RuntimeError):
+        instrumentation.collect_snapshots()
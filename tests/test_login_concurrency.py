@@ -0,0 +1,71 @@
+"""Rajada de logins na mesma conta: só um id_maquina pode ficar com a vaga."""
+import threading
+from collections import Counter
+
+from extensions import pool
+import passwords
+
+SENHA = "rajada123"
+
+
+def _conta(email, senha_gravada):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO usuarios (nome, email, senha, status) VALUES ('Rajada', %s, %s, 'aprovado')",
+            (email, senha_gravada),
+        )
+        conn.commit()
+
+
+def _rajada(app, email, logins=40, threads=16):
+    barreira = threading.Barrier(threads)
+    codigos = Counter()
+    lock = threading.Lock()
+    fila = iter(range(logins))
+
+    def worker():
+        client = app.test_client()
+        barreira.wait()
+        while True:
+            with lock:
+                n = next(fila, None)
+            if n is None:
+                return
+            resp = client.post("/login", json={"email": email, "senha": SENHA, "id_maquina": f"MAQ-{n}"})
+            with lock:
+                codigos[resp.get_json().get("codigo")] += 1
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return codigos
+
+
+def _estado(email):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id_maquina, logado, senha FROM usuarios WHERE email = %s", (email,))
+        return cursor.fetchone()
+
+
+def test_rajada_autoriza_um_unico_login(pg_app):
+    _conta("rajada@teste.local", passwords.hash_password(SENHA))
+    codigos = _rajada(pg_app, "rajada@teste.local")
+
+    assert codigos["LOGIN_AUTORIZADO"] == 1
+    assert sum(codigos.values()) == 40
+    id_maquina, logado, _ = _estado("rajada@teste.local")
+    assert logado == 1 and id_maquina.startswith("MAQ-")
+
+
+def test_rajada_com_senha_legada_regrava_o_hash_uma_vez(pg_app):
+    # senha em texto puro (antes do passwords): o rehash concorre com a vaga
+    _conta("legado@teste.local", SENHA)
+    codigos = _rajada(pg_app, "legado@teste.local")
+
+    assert codigos["LOGIN_AUTORIZADO"] == 1
+    _, _, senha = _estado("legado@teste.local")
+    assert senha != SENHA and passwords.verify(senha, SENHA) == (True, None)
@@ -0,0 +1,65 @@
+"""migrar-midias: a conversão dos manuais antigos é uma revisão como outra qualquer."""
+import base64
+
+from sqlalchemy import update
+
+from extensions import db
+from models import Client, ManualRevision
+import manual_assets
+import manual_revisions
+
+PNG = base64.b64encode(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32).decode()
+MANUAL = f'<h1>Guia</h1><p><img src="data:image/png;base64,{PNG}"></p><p>Fim.</p>'
+
+
+def _cliente(app, revision=0):
+    with app.app_context():
+        client = Client(razao_social="Padaria", cnpj="11222333000181", regime_tributario="MEI",
+                        responsavel_fiscal="Ana", manual_content=MANUAL, manual_revision=revision)
+        db.session.add(client)
+        db.session.commit()
+        return client.id
+
+
+def test_conversao_sobe_a_revisao_e_grava_o_historico(app):
+    client_id = _cliente(app)
+    with app.app_context():
+        assert manual_assets.migrate_manuals(db.session) == (1, 1, 0)
+        client = db.session.get(Client, client_id)
+        assert client.manual_revision == 1
+        assert "data:" not in client.manual_content and manual_assets.ASSET_URL_PREFIX in client.manual_content
+        kinds = dict(db.session.query(ManualRevision.revision, ManualRevision.kind).filter_by(client_id=client_id))
+        assert kinds == {0: "full", 1: "full"}
+        assert manual_revisions.load_revision(db.session, client_id, 0) == MANUAL
+        assert manual_revisions.load_revision(db.session, client_id, 1) == client.manual_content
+
+
+def test_editor_aberto_antes_da_conversao_recebe_conflito(app):
+    client_id = _cliente(app)
+    with app.app_context():
+        manual_assets.migrate_manuals(db.session)
+    resp = app.test_client().post(f"/manual/save_manual/{client_id}", json={
+        "base_revision": 0, "trecho": {"inicio": 4, "fim": 8, "texto": "Roteiro"},
+    })
+    assert resp.status_code == 409
+    with app.app_context():
+        assert "Roteiro" not in db.session.get(Client, client_id).manual_content
+
+
+def test_salvo_durante_a_conversao_nao_e_sobrescrito(app, monkeypatch):
+    client_id = _cliente(app, revision=3)
+    original = manual_assets.externalize_media
+
+    def salva_no_meio(session, html):
+        # o editor salva entre a leitura da conversão e a gravação dela
+        session.execute(update(Client).where(Client.id == client_id).values(
+            manual_content="<p>salvo pelo editor</p>", manual_revision=4,
+        ))
+        return original(session, html)
+
+    monkeypatch.setattr(manual_assets, "externalize_media", salva_no_meio)
+    with app.app_context():
+        assert manual_assets.migrate_manuals(db.session) == (0, 0, 1)
+        client = db.session.get(Client, client_id)
+        assert (client.manual_revision, client.manual_content) == (4, "<p>salvo pelo editor</p>")
+        assert db.session.query(ManualRevision).filter_by(client_id=client_id).count() == 0
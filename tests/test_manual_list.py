@@ -0,0 +1,56 @@
+"""manual_content (megabytes por cliente) fica fora do SELECT de quem não o mostra.
+
+As seções leem só o pedaço delas (substr), nunca a coluna inteira.
+"""
+import re
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from manual_sections import dump_toc
+from models import Client
+
+# a coluna inteira no SELECT; substr(client.manual_content, ?, ?) é o corte das seções
+COLUNA_INTEIRA = re.compile(r"(?<!substr\()client\.manual_content\b")
+
+MANUAL = "<h1>Manual</h1>" + "<h2>Seção</h2><p>Emitir a guia e conferir o vencimento.</p>" * 200
+
+
+@pytest.fixture
+def statements(app):
+    with app.app_context():
+        db.session.add_all(
+            Client(
+                razao_social=f"Padaria Comercio {i}",
+                cnpj=f"{11222333000100 + i:014d}",
+                regime_tributario="MEI",
+                responsavel_fiscal="Ana",
+                manual_content=MANUAL,
+                manual_toc=dump_toc(MANUAL),
+            )
+            for i in range(30)
+        )
+        db.session.commit()
+        captured = []
+        event.listen(db.engine, "before_cursor_execute", lambda conn, cursor, sql, *a: captured.append(sql))
+    return captured
+
+
+@pytest.mark.parametrize("path, selects", [
+    ("/manual/", False),
+    ("/manual/?per_page=20&q=comercio", False),
+    ("/manual/?ordem=relevancia&q=padaria", False),
+    ("/manual/?page=2", False),
+    ("/manual/exportar", False),
+    ("/manual/exportar?formato=csv", False),
+    ("/manual/cliente/1", False),
+    ("/manual/cliente/1/secoes?de=0&ate=4", False),
+    ("/manual/cliente/1/conteudo", True),
+])
+def test_manual_content_so_no_select_de_quem_o_usa(app, statements, path, selects):
+    resp = app.test_client().get(path)
+    assert resp.status_code == 200
+    resp.get_data()  # consome as respostas em streaming
+    selecionou = [s for s in statements if COLUNA_INTEIRA.search(s)]
+    assert bool(selecionou) is selects, selecionou
@@ -0,0 +1,95 @@
+"""Seções do manual: índice gravado com o manual, leituras sem escrita e sem misturar revisões."""
+import json
+
+import pytest
+from sqlalchemy import event, update
+
+from extensions import db
+from models import Client
+import manual_sections
+import migrations
+import pages.manual
+
+MANUAL = "<h1>Introdução</h1><p>Abrir o portal.</p><h2>Guias</h2><p>Emitir a guia.</p>"
+NOVO = "<h1>Capítulo novo</h1><p>Conferir o vencimento.</p><h2>Prazos</h2><p>Dia 20.</p>"
+
+
+def _cliente(app, **valores):
+    with app.app_context():
+        client = Client(razao_social="Padaria", cnpj="11222333000181", regime_tributario="MEI",
+                        responsavel_fiscal="Ana", **valores)
+        db.session.add(client)
+        db.session.commit()
+        return client.id
+
+
+def test_save_manual_grava_o_indice(app):
+    client_id = _cliente(app)
+    resp = app.test_client().post(f"/manual/save_manual/{client_id}", json={"base_revision": 0, "content": MANUAL})
+    assert resp.get_json()["revision"] == 1
+    with app.app_context():
+        toc = manual_sections.load_toc(db.session.get(Client, client_id).manual_toc)
+    assert [s["titulo"] for s in toc["secoes"]] == ["Introdução", "Guias"]
+
+
+def test_leitura_de_manual_sem_indice_nao_escreve(app):
+    client_id = _cliente(app, manual_content=MANUAL)
+    comandos = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *a: comandos.append(a[2]))
+    http = app.test_client()
+    assert b"Introdu" in http.get(f"/manual/cliente/{client_id}").data
+    data = http.get(f"/manual/cliente/{client_id}/secoes", query_string={"de": 0, "ate": 1}).get_json()
+    assert [s["html"] for s in data["secoes"]] == ["<h1>Introdução</h1><p>Abrir o portal.</p>",
+                                                  "<h2>Guias</h2><p>Emitir a guia.</p>"]
+    assert not [sql for sql in comandos if not sql.lstrip().upper().startswith("SELECT")]
+    with app.app_context():
+        assert db.session.get(Client, client_id).manual_toc is None
+
+
+def test_manual_salvo_entre_indice_e_trecho_relê_o_indice(app, monkeypatch):
+    client_id = _cliente(app, manual_content=MANUAL, manual_toc=manual_sections.dump_toc(MANUAL))
+    original = manual_sections.load_sections
+    chamadas = []
+
+    def salva_no_meio(session, *args):
+        if not chamadas:
+            # outra requisição salva o manual depois da leitura do índice
+            session.execute(update(Client).where(Client.id == client_id).values(
+                manual_content=NOVO, manual_revision=1, manual_toc=manual_sections.dump_toc(NOVO),
+            ))
+        chamadas.append(args)
+        return original(session, *args)
+
+    monkeypatch.setattr(manual_sections, "load_sections", salva_no_meio)
+    data = app.test_client().get(f"/manual/cliente/{client_id}/secoes", query_string={"de": 1}).get_json()
+    assert len(chamadas) == 2
+    assert data["revision"] == 1
+    assert data["secoes"] == [{"indice": 1, "html": "<h2>Prazos</h2><p>Dia 20.</p>"}]
+
+
+def test_trecho_de_outra_revisao_e_recusado(app):
+    client_id = _cliente(app, manual_content=NOVO, manual_revision=2)
+    sections = manual_sections.build_toc(MANUAL)["secoes"]
+    with app.app_context():
+        assert manual_sections.load_sections(db.session, client_id, 1, sections, 0, 1) is None
+        assert manual_sections.load_sections(db.session, client_id, 2, sections, 0, 0) is not None
+
+
+def test_migracao_calcula_o_indice_dos_manuais_antigos(app):
+    client_id = _cliente(app, manual_content=MANUAL)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            migrations._manual_tocs(conn)
+        raw = db.session.get(Client, client_id).manual_toc
+    assert json.loads(raw) == manual_sections.build_toc(MANUAL)
+
+
+@pytest.mark.parametrize("ate, esperadas", [(200, 20), (-2, 1), (-100, 1), (3, 4)])
+def test_ate_fora_do_intervalo_respeita_o_limite(app, ate, esperadas):
+    grande = "".join(f"<h2>Seção {i}</h2><p>Texto {i}.</p>" for i in range(60))
+    client_id = _cliente(app, manual_content=grande, manual_toc=manual_sections.dump_toc(grande))
+    data = app.test_client().get(f"/manual/cliente/{client_id}/secoes", query_string={"de": 0, "ate": ate}).get_json()
+    assert data["total"] == 60
+    assert [s["indice"] for s in data["secoes"]] == list(range(esperadas))
+    assert esperadas <= pages.manual.SECTIONS_PER_REQUEST_MAX
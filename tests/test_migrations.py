@@ -0,0 +1,97 @@
+"""Migrações: bancos criados antes delas e migrações que ficam pendentes."""
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect
+
+from conftest import _teardown, make_app
+from extensions import db
+from models import User
+import client_search
+import migrations
+import passwords
+
+# schema do portal como o create_all da primeira versão deixava
+LEGADO = """
+CREATE TABLE user (
+    id INTEGER NOT NULL PRIMARY KEY,
+    nome VARCHAR(120) NOT NULL,
+    email VARCHAR(160) NOT NULL UNIQUE,
+    password_hash VARCHAR(255) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    role VARCHAR(20) NOT NULL,
+    created_at DATETIME
+);
+CREATE TABLE client (
+    id INTEGER NOT NULL PRIMARY KEY,
+    razao_social VARCHAR(200) NOT NULL,
+    cnpj VARCHAR(14) NOT NULL UNIQUE,
+    regime_tributario VARCHAR(60) NOT NULL,
+    responsavel_fiscal VARCHAR(120) NOT NULL,
+    created_at DATETIME,
+    manual_content TEXT
+);
+"""
+
+
+def test_banco_legado_ganha_session_version_e_o_login_funciona(tmp_path):
+    path = tmp_path / "legado.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGADO)
+    conn.execute(
+        "INSERT INTO user (nome, email, password_hash, status, role) VALUES (?, ?, ?, 'ACTIVE', 'USER')",
+        ("Ana", "ana@example.com", passwords.hash_password("segredo")),
+    )
+    conn.commit()
+    conn.close()
+
+    # o portal sob /web: sem prefixo, /login é a rota da API do software
+    app = make_app(f"sqlite:///{path}", LOGIN_DISABLED=False, WEB_URL_PREFIX="/web")
+    try:
+        with app.app_context():
+            assert db.session.get(User, 1).session_version == 1
+            indices = {i["name"] for i in inspect(db.engine).get_indexes("client")}
+        assert {"ix_client_razao_social_id", "ix_client_regime_razao_social_id"} <= indices
+        http = app.test_client()
+        resp = http.post("/web/login", data={"email": "ana@example.com", "password": "segredo"})
+        assert resp.status_code == 302 and resp.location.endswith("/web/home")
+        assert http.get("/web/home").status_code == 200
+        with http.session_transaction() as sessao:
+            # sessão de uma versão anterior do usuário não vale
+            sessao["_user_id"] = "1:0"
+        assert http.get("/web/home").status_code == 302
+    finally:
+        _teardown(app)
+
+
+def _versoes(app):
+    with app.app_context(), db.engine.connect() as conn:
+        return {v for (v,) in conn.exec_driver_sql(f"SELECT version FROM {migrations.MIGRATIONS_TABLE}")}
+
+
+def test_sqlite_sem_fts5_deixa_a_busca_pendente(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrations, "_sqlite_has_fts5", lambda conn: False)
+    app = make_app(f"sqlite:///{tmp_path / 'sem_fts.db'}")
+    try:
+        versoes = _versoes(app)
+        assert 5 not in versoes and {4, 6, 7} <= versoes
+        with app.app_context():
+            assert client_search.detect(db.engine) == "ilike"
+            # com FTS5 disponível, o próximo upgrade aplica a que ficou pendente
+            monkeypatch.undo()
+            assert [m.version for m in migrations.upgrade(db.engine)] == [5]
+            assert client_search.detect(db.engine) == "sqlite"
+    finally:
+        _teardown(app)
+
+
+def test_erro_na_busca_interrompe_o_upgrade_sem_registrar(tmp_path, monkeypatch):
+    def falha(conn):
+        raise RuntimeError("sem permissão")
+
+    monkeypatch.setattr(client_search, "create_structures", falha)
+    with pytest.raises(RuntimeError):
+        make_app(f"sqlite:///{tmp_path / 'erro.db'}")
+    with sqlite3.connect(tmp_path / "erro.db") as conn:
+        versoes = {v for (v,) in conn.execute(f"SELECT version FROM {migrations.MIGRATIONS_TABLE}")}
+    assert 5 not in versoes and 4 in versoes and 6 not in versoes
@@ -0,0 +1,86 @@
+"""Validação de clientes: CNPJ com dígitos verificadores e regime da lista.
+
+Antes da normalização o cadastro aceitava qualquer CNPJ com 14 números e
+qualquer texto de regime, e a importação gravava o que viesse na planilha.
+"""
+import io
+import time
+
+import pytest
+
+from models import Client, ImportJobError
+import normalization
+
+VALIDO = "11222333000181"
+
+
+@pytest.mark.parametrize("cnpj, ok", [
+    (VALIDO, True),
+    ("11444777000161", True),
+    ("11222333000182", False),  # segundo dígito errado
+    ("11222333000191", False),  # primeiro dígito errado
+    ("00000000000000", False),
+    ("1122233300018", False),
+    ("1122233300018a", False),
+    ("１１２２２３３３０００１８１", False),  # dígitos não ASCII
+])
+def test_cnpj_is_valid(cnpj, ok):
+    assert normalization.cnpj_is_valid(cnpj) is ok
+
+
+def test_coluna_usa_a_mesma_regra_por_linha():
+    columns = {
+        "razao_social": ["A", "B", "C", "D"],
+        "cnpj": ["11.222.333/0001-81", "11222333000182", "123", "11444777000161"],
+        "regime_tributario": ["Simples", "MEI", "MEI", "Regime Inventado"],
+        "responsavel_fiscal": ["Ana", "Ana", "Ana", "Ana"],
+    }
+    batch = normalization.normalize_columns(columns)
+    assert batch.valid == [0]
+    assert batch.rejected == [
+        (1, normalization.REASON_CNPJ_DIGITS),
+        (2, normalization.REASON_CNPJ_LENGTH),
+        (3, normalization.REASON_REGIME),
+    ]
+    assert batch.record(0)["regime_tributario"] == normalization.SIMPLES_NACIONAL
+
+
+@pytest.mark.parametrize("cnpj, regime, mensagem", [
+    ("11.222.333/0001-82", "MEI", "confira os dígitos verificadores"),
+    (VALIDO, "Regime Inventado", "Escolha um dos regimes tributários da lista"),
+])
+def test_cadastro_recusa_cnpj_e_regime_que_antes_aceitava(app, cnpj, regime, mensagem):
+    resp = app.test_client().post("/manual/novo", data={
+        "razao_social": "Padaria", "cnpj": cnpj, "regime_tributario": regime, "responsavel_fiscal": "Ana",
+    }, follow_redirects=True)
+    assert mensagem in resp.get_data(as_text=True)
+    with app.app_context():
+        assert Client.query.count() == 0
+
+
+def test_importacao_recusa_cnpj_e_regime_invalidos(app):
+    csv = (
+        "razao_social;cnpj;regime_tributario;responsavel_fiscal\n"
+        "VALIDA;11.222.333/0001-81;Simples;ANA\n"
+        "DIGITO;11.444.777/0001-62;MEI;ANA\n"
+        "REGIME;11.444.777/0001-61;Regime Inventado;ANA\n"
+    )
+    client = app.test_client()
+    resp = client.post(
+        "/manual/importar",
+        data={"file": (io.BytesIO(csv.encode()), "clientes.csv")},
+        content_type="multipart/form-data",
+    )
+    for _ in range(100):
+        job = client.get(resp.headers["Location"], query_string={"formato": "json"}).get_json()
+        if job["status"] in ("DONE", "FAILED"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "DONE" and job["inserted"] == 1
+    with app.app_context():
+        assert [c.cnpj for c in Client.query.all()] == [VALIDO]
+        erros = ImportJobError.query.filter_by(job_id=job["id"]).order_by(ImportJobError.line).all()
+        assert [(e.line, e.reason) for e in erros] == [
+            (3, normalization.REASON_CNPJ_DIGITS),
+            (4, normalization.REASON_REGIME),
+        ]
@@ -0,0 +1,78 @@
+"""Listagem de clientes: contagem compartilhada entre workers e cursor da URL validado."""
+import base64
+import json
+
+import pytest
+
+from extensions import db
+from models import Client
+import pagination
+
+
+def _total(app):
+    with app.app_context():
+        return pagination.cached_count(Client.query, ("clients", "", ""))[0]
+
+
+def _cliente(app, cnpj):
+    with app.app_context():
+        db.session.add(Client(razao_social="X", cnpj=cnpj, regime_tributario="MEI", responsavel_fiscal="Y"))
+        db.session.commit()
+
+
+def test_contagem_fica_guardada_ate_a_invalidacao(app):
+    _cliente(app, "11222333000181")
+    assert _total(app) == 1
+    _cliente(app, "22333444000190")
+    assert _total(app) == 1  # guardada
+
+    pagination.invalidate_counts()
+    assert _total(app) == 2
+
+
+def test_invalidacao_de_outro_worker_chega_por_aqui(app):
+    _cliente(app, "11222333000181")
+    assert _total(app) == 1
+    _cliente(app, "22333444000190")
+
+    # outro worker: troca só a geração no cache compartilhado, sem mexer nas contagens deste
+    pagination.cache.set(pagination.COUNT_GENERATION_KEY, "outro-worker", ttl=60)
+    assert _total(app) == 2
+
+
+def test_listagem_sem_filtro_mostra_o_total(app):
+    for cnpj in ("11222333000181", "22333444000190", "33444555000109"):
+        _cliente(app, cnpj)
+    pagination.invalidate_counts()
+    resp = app.test_client().get("/manual/")
+    assert resp.status_code == 200
+    assert b"3 Clientes" in resp.data
+
+
+@pytest.mark.parametrize("valores", [
+    [">", ["a"]],                      # menos valores que colunas
+    [">", ["a", 1, 2]],                # mais valores
+    [">", [1, "a"]],                   # tipos trocados
+    ["<", ["a", True]],                # bool não é id
+    [">", [None, 1]],
+    [">", [["a"], 1]],
+    ["?", ["a", 1]],
+    [">", "a"],
+])
+def test_cursor_adulterado_vale_como_sem_cursor(app, valores):
+    _cliente(app, "11222333000181")
+    token = base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+    resp = app.test_client().get("/manual/", query_string={"cursor": token})
+    assert resp.status_code == 200
+    assert b"1 Cliente" in resp.data
+
+
+def test_cursor_valido_continua_a_pagina(app):
+    _cliente(app, "11222333000181")
+    _cliente(app, "22333444000190")
+    with app.app_context():
+        primeira = pagination.keyset_paginate(Client.query, (Client.razao_social, Client.id), 1)
+        seguinte = pagination.keyset_paginate(
+            Client.query, (Client.razao_social, Client.id), 1, primeira.next_cursor
+        )
+        assert [c.cnpj for c in primeira.items + seguinte.items] == ["11222333000181", "22333444000190"]
@@ -0,0 +1,18 @@
+"""Painel de usuários do software (/): lista as contas sem expor a senha."""
+from extensions import pool
+import passwords
+
+
+def test_painel_nao_mostra_o_hash_da_senha(pg_app):
+    senha = passwords.hash_password("segredo123")
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO usuarios (nome, email, senha, status) VALUES ('Ana', 'ana@example.com', %s, 'aprovado')",
+            (senha,),
+        )
+        conn.commit()
+    html = pg_app.test_client().get("/").get_data(as_text=True)
+    assert "ana@example.com" in html
+    assert senha not in html and senha.split("$")[-1] not in html
+    assert "<th>Senha</th>" not in html
@@ -0,0 +1,99 @@
+"""Planos (EXPLAIN) das consultas quentes: usam os índices das migrações.
+
+O tempo com e sem cada índice fica em benchmarks/bench_query_plans.py.
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from extensions import db, pool
+from models import Client, User
+from pages.manual import _apply_filters
+import normalization
+
+USUARIOS = 2000
+CLIENTES = 2000
+
+
+def _indices(conn, sql):
+    """Nomes dos índices que aparecem no plano de ``sql``."""
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        names, stack = [], [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if "Index Name" in node:
+                names.append(node["Index Name"])
+            stack.extend(node.get("Plans", []))
+        return names
+    details = [r[-1] for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).all()]
+    return [d.split(" INDEX ", 1)[1].split()[0] for d in details if " INDEX " in d]
+
+
+def _sql(query):
+    return str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _popular(app):
+    with app.app_context():
+        inicio = datetime(2024, 1, 1)
+        db.session.execute(insert(User), [
+            {"nome": f"Usuário {i}", "email": f"u{i}@example.com", "password_hash": "x",
+             "status": "PENDING" if i % 100 == 0 else "ACTIVE", "role": "USER",
+             "created_at": inicio + timedelta(minutes=i)}
+            for i in range(USUARIOS)
+        ])
+        regimes = normalization.REGIMES
+        db.session.execute(insert(Client), [
+            {"razao_social": f"Empresa {i:05d}", "cnpj": f"{i:014d}", "regime_tributario": regimes[i % len(regimes)],
+             "responsavel_fiscal": "Ana"}
+            for i in range(CLIENTES)
+        ])
+        db.session.commit()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+
+def _confere_portal(app):
+    _popular(app)
+    with app.app_context():
+        pendentes = User.query.filter_by(status="PENDING").order_by(User.created_at.desc())
+        listagem, _ = _apply_filters(Client.query, "", "Simples")
+        listagem = listagem.order_by(Client.razao_social.asc(), Client.id.asc()).limit(21)
+        with db.engine.connect() as conn:
+            assert "ix_user_pending_created_at" in _indices(conn, _sql(pendentes))
+            assert "ix_client_regime_razao_social_id" in _indices(conn, _sql(listagem))
+
+
+def test_planos_do_portal_sqlite(app):
+    _confere_portal(app)
+
+
+def test_planos_do_portal_postgres(pg_app):
+    _confere_portal(pg_app)
+
+
+def test_login_da_api_busca_por_email_no_indice(pg_app):
+    from app import SQL_LOGIN_BUSCA
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO usuarios (nome, email, senha, status) VALUES (%s, %s, 'x', 'aprovado')",
+            [(f"Usuário {i}", f"u{i}@example.com") for i in range(USUARIOS)],
+        )
+        cursor.execute("ANALYZE usuarios")
+        conn.commit()
+    with pg_app.app_context(), db.engine.connect() as conn:
+        sql = SQL_LOGIN_BUSCA.replace("%(email)s", "'u7@example.com'")
+        assert "usuarios_email_key" in _indices(conn, sql)
+
+
+@pytest.mark.parametrize("regime", ["Simples", "simples nacional", "SN"])
+def test_filtro_de_regime_vira_igualdade_com_o_nome_canonico(app, regime):
+    with app.app_context():
+        listagem, _ = _apply_filters(Client.query, "", regime)
+        assert f"client.regime_tributario = '{normalization.SIMPLES_NACIONAL}'" in _sql(listagem)
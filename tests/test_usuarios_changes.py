@@ -0,0 +1,120 @@
+"""Revisões de usuarios (migração 8): sem linha global travada e feed sem buracos."""
+import psycopg2
+import pytest
+
+from config import libpq_dsn
+from conftest import TEST_DATABASE_URL
+from extensions import pool
+import app as api
+
+TOKEN = {"Authorization": "Bearer " + api.API_KEY_ESPERADA}
+
+
+@pytest.fixture
+def conectar(pg_app):
+    abertas = []
+
+    def conectar():
+        conn = psycopg2.connect(libpq_dsn(TEST_DATABASE_URL))
+        abertas.append(conn)
+        return conn
+
+    yield conectar
+    for conn in abertas:
+        conn.close()
+
+
+def _usuarios(n):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO usuarios (nome, email, status) VALUES (%s, %s, 'pendente')",
+            [(f"U{i}", f"u{i}@teste.local") for i in range(n)],
+        )
+        cursor.execute("SELECT id FROM usuarios ORDER BY id")
+        ids = [r[0] for r in cursor.fetchall()]
+        conn.commit()
+    return ids
+
+
+def _changes(client, **params):
+    resp = client.get("/usuarios/changes", query_string=params, headers=TOKEN)
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def test_escritas_em_linhas_diferentes_nao_esperam_umas_pelas_outras(pg_app, conectar):
+    a_id, b_id = _usuarios(2)
+    a, b = conectar(), conectar()
+    a.cursor().execute("UPDATE usuarios SET logado = 1 WHERE id = %s", (a_id,))
+    cursor = b.cursor()
+    cursor.execute("SET lock_timeout = '1s'")
+    # com o contador da migração 3 esta espera estourava o lock_timeout
+    cursor.execute("UPDATE usuarios SET logado = 1 WHERE id = %s", (b_id,))
+    b.commit()
+    a.commit()
+
+
+def test_lote_e_login_simultaneos_nao_travam(pg_app, conectar):
+    ids = _usuarios(3)
+    lote, login = conectar(), conectar()
+    lote.cursor().execute("SET lock_timeout = '2s'")
+    login.cursor().execute("SET lock_timeout = '2s'")
+    login.cursor().execute(
+        "UPDATE usuarios SET id_maquina = 'MAQ', logado = 1 WHERE id = %s", (ids[2],),
+    )
+    lote.cursor().execute("UPDATE usuarios SET status = 'aprovado' WHERE id = ANY(%s)", (ids[:2],))
+    lote.commit()
+    login.commit()
+
+
+def test_feed_segura_revisoes_depois_de_uma_escrita_em_andamento(pg_app, conectar):
+    a_id, b_id = _usuarios(2)
+    client = pg_app.test_client()
+    inicio = _changes(client)["revisao"]
+
+    lenta, rapida = conectar(), conectar()
+    lenta.cursor().execute("UPDATE usuarios SET plano = 'lenta' WHERE id = %s", (a_id,))
+    rapida.cursor().execute("UPDATE usuarios SET plano = 'rapida' WHERE id = %s", (b_id,))
+    rapida.commit()
+
+    # a rápida tem revisão maior e já está gravada, mas sai só depois da lenta
+    parcial = _changes(client, since=inicio)
+    assert parcial["alterados"] == []
+    assert parcial["revisao"] == inicio
+
+    lenta.commit()
+    final = _changes(client, since=parcial["revisao"], campos="id,plano")
+    assert {u["id"]: u["plano"] for u in final["alterados"]} == {a_id: "lenta", b_id: "rapida"}
+
+
+def test_feed_nao_divide_uma_transacao_entre_paginas(pg_app):
+    ids = _usuarios(5)  # uma transação: a mesma revisão para as cinco linhas
+    client = pg_app.test_client()
+    primeira = _changes(client, limit=2)
+    assert sorted(u["id"] for u in primeira["alterados"]) == ids
+    assert _changes(client, since=primeira["revisao"])["alterados"] == []
+
+
+def test_feed_entrega_exclusoes(pg_app):
+    ids = _usuarios(2)
+    client = pg_app.test_client()
+    inicio = _changes(client)["revisao"]
+    with pool.connection() as conn:
+        conn.cursor().execute("DELETE FROM usuarios WHERE id = %s", (ids[0],))
+        conn.commit()
+    assert _changes(client, since=inicio)["excluidos"] == [ids[0]]
+
+
+def test_etag_muda_quando_uma_escrita_antiga_termina(pg_app, conectar):
+    a_id, b_id = _usuarios(2)
+    client = pg_app.test_client()
+    lenta, rapida = conectar(), conectar()
+    lenta.cursor().execute("UPDATE usuarios SET plano = 'lenta' WHERE id = %s", (a_id,))
+    rapida.cursor().execute("UPDATE usuarios SET plano = 'rapida' WHERE id = %s", (b_id,))
+    rapida.commit()
+    etag = client.get("/usuarios", headers=TOKEN).headers["ETag"]
+
+    lenta.commit()
+    resp = client.get("/usuarios", headers={**TOKEN, "If-None-Match": etag})
+    assert resp.status_code == 200